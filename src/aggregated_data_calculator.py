@@ -1,8 +1,13 @@
+import logging
 import numpy as np
 import pandas as pd
-from forex_python.converter import CurrencyRates
 from pypfopt import expected_returns
 
+from src.market_data.market_data_source import MarketDataSource
+from src.resample_rules import YEAR_END_RULE
+
+logger = logging.getLogger(__name__)
+
 class AggregatedDataCalculator:
     BASE_CURRENCY = "USD"
 
@@ -63,7 +68,7 @@ class AggregatedDataCalculator:
         return df * avg_rate
 
     def get_average_exchange_rate(self, start_date, end_date, from_currency):
-        currency_converter = CurrencyRates()
+        market_data_source = MarketDataSource.get_default()
         rates = []
 
         # Ensure the index is a DateTimeIndex
@@ -71,13 +76,13 @@ class AggregatedDataCalculator:
         end_date = pd.to_datetime(end_date)
 
         # Iterate over the date range and collect rates
-        date_range = pd.date_range(start=start_date, end=end_date, freq='Y')
+        date_range = pd.date_range(start=start_date, end=end_date, freq=YEAR_END_RULE)
         for date in date_range:
             try:
-                rate = currency_converter.get_rate(from_currency, AggregatedDataCalculator.BASE_CURRENCY, date)
+                rate = market_data_source.exchange_rate(from_currency, AggregatedDataCalculator.BASE_CURRENCY, date)
                 rates.append(rate)
             except Exception as e:
-                print(f"Error on date {date}: {e}")
+                logger.warning("Error on date %s: %s", date, e)
 
         # Calculate the average rate
         average_rate = sum(rates) / len(rates) if rates else None
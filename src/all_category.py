@@ -1,27 +1,67 @@
+import logging
 import pandas as pd
 
 from categories.category import Category
 import numpy as np
 
-from global_settings import CATEGORY_CONSTRAINTS
+from global_settings import CATEGORY_CONSTRAINTS, DIVIDEND_TYPE, TOP_LEVEL_OPTIMIZER, DATA_QUALITY_ACTION, \
+    DEFAULT_LOOKBACK, ANALYTICS_LOOKBACKS, SUB_CATEGORY_CONSTRAINTS
 from fill_nan_dataframe_knn import fill_nan_dataframe_knn
-from pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
-from riskfolio_optimizer.mean_risk_optimizer import MeanRiskOptimizer
+from src.data_quality.data_quality_validator import DataQualityValidator
+from src.discrete_allocation.discrete_allocator import DiscreteAllocator
+from src.dividends.dividend_yield_calculator import DividendYieldCalculator
+from src.hierarchical_allocator import HierarchicalAllocator
+from src.hierarchy_matrices import HierarchyMatrices
+from src.lookback_window import LookbackWindow
+from src.optimizer_engines.optimizer_engine_registry import get_optimizer_engine
+from src.performance_metrics import PerformanceMetrics
 from src.categories.sub_categories.securities.security import Security
 
+logger = logging.getLogger(__name__)
+
 
 class AllCategory:
-    def __init__(self):
+    # security_store: shared by the portfolios of a batch run so each ticker is fetched and computed once
+    def __init__(self, security_store=None):
         self.categories = []
+        self.security_store = security_store
         self.__category_df = None
+        self.__cleaned_weights = None
+        self.__validated_tickers = set()
+        self.data_quality_report = None
+        self.portfolio_metrics = None  # Of the top-level optimization
+        self.leftover_cash = None
+        self.tracking_error = None  # Of the whole shares against the final weights
+
+    def find_category(self, category_name):
+        return next((cat for cat in self.categories if cat.name == category_name), None)
 
     def find_or_create_category(self, category_name):
-        category = next((cat for cat in self.categories if cat.name == category_name), None)
+        category = self.find_category(category_name)
         if not category:
             category = Category(category_name)
+            category.parent = self
             self.categories.append(category)
+            self.invalidate()
         return category
 
+    def find_security(self, ticker):
+        for category in self.categories:
+            for subcategory in category.subcategories:
+                security = subcategory.find_security(ticker)
+                if security is not None:
+                    return category, subcategory, security
+        return None
+
+    def invalidate(self):
+        # A category's aggregated returns changed: the category panel and the top-level weights are stale
+        self.__category_df = None
+        self.__cleaned_weights = None
+
+    @property
+    def is_dirty(self):
+        return self.__category_df is None or self.__cleaned_weights is None
+
     def add_security(self, security):
         category = self.find_or_create_category(type(security).__name__)
         subcategory = category.find_or_create_subcategory(security.sub_category)
@@ -29,13 +69,38 @@ class AllCategory:
 
     def add_securities(self, securities):
         for ticker, subcategory_name, category_name, sub_category_weight in securities:
+            location = self.find_security(ticker)
+            if location is not None:
+                category, subcategory, security = location
+                if category.name == category_name and subcategory.name == subcategory_name:
+                    # Already known: only a weight change needs to be propagated
+                    security.sub_asset_weight = sub_category_weight / 100
+                    continue
+                # The security moved to another sub-category or sheet
+                self.remove_securities([ticker])
+
             category = self.find_or_create_category(category_name)
-            subcategory = category.find_or_create_subcategory(subcategory_name)
-            category.add_security_to_subcategory(Security(ticker, subcategory_name, sub_category_weight),
+            category.add_security_to_subcategory(Security(ticker, subcategory_name, sub_category_weight,
+                                                          store=self.security_store),
                                                  subcategory_name)
 
     def remove_securities(self, tickers_to_remove):
-        pass
+        for ticker in tickers_to_remove:
+            location = self.find_security(ticker)
+            if location is None:
+                continue
+
+            category, subcategory, security = location
+            subcategory.remove_security(ticker)
+            security.release()
+
+            # Drop nodes left empty so they don't end up as all-NaN columns in the returns panels
+            if not subcategory.securities:
+                category.remove_subcategory(subcategory.name)
+            if not category.subcategories:
+                self.categories.remove(category)
+                category.parent = None
+                self.invalidate()
 
     def check_subcategory_weights(self):
         for category in self.categories:
@@ -100,8 +165,51 @@ class AllCategory:
             print(f"Category: {category.name}")
             category.optimize()
 
+    def aggregate_sub_category_returns(self):
+        # The returns of every sub-category not computed yet, from one sparse product. Each sub-category's panel is
+        # imputed on its own first, as SubCategory.calculate_aggregated_returns does, so the results are the same.
+        subcategories = [(category, subcategory) for category in self.categories
+                         for subcategory in category.subcategories if subcategory.is_dirty]
+        if not subcategories:
+            return
+        hierarchy, panels = {}, []
+        for category, subcategory in subcategories:
+            returns_df = subcategory.create_returns_dataframe()
+            securities = [security for security in subcategory.securities if security.ticker in returns_df.columns]
+            hierarchy.setdefault(category.name, {})[subcategory.name] = {security.ticker: security.sub_asset_weight
+                                                                         for security in securities}
+            panels.append(returns_df[[security.ticker for security in securities]])
+        hierarchy_matrices = HierarchyMatrices(hierarchy)
+        for (_, subcategory), aggregated_returns in zip(
+                subcategories, HierarchyMatrices.aggregate_panels(panels, hierarchy_matrices.security_to_sub_category)):
+            subcategory.aggregated_returns = pd.DataFrame({subcategory.name: aggregated_returns})
+
+    def aggregate_category_returns(self):
+        # The same for the categories: each is optimized on its own imputed sub-category panel, then all of them
+        # are aggregated with one sparse product
+        self.aggregate_sub_category_returns()
+        categories = [category for category in self.categories if category.is_dirty]
+        if not categories:
+            return
+        hierarchy, sub_category_weights, panels = {}, {}, []
+        for category in categories:
+            if category.cleaned_weights is None:
+                category.optimize()
+            returns_df = category.sub_category_df
+            subcategories = [subcategory for subcategory in category.subcategories
+                             if subcategory.name in returns_df.columns]
+            hierarchy[category.name] = {subcategory.name: {} for subcategory in subcategories}
+            sub_category_weights[category.name] = {subcategory.name: subcategory.sub_category_weight
+                                                   for subcategory in subcategories}
+            panels.append(returns_df[[subcategory.name for subcategory in subcategories]])
+        hierarchy_matrices = HierarchyMatrices(hierarchy, sub_category_weights)
+        for category, aggregated_returns in zip(
+                categories, HierarchyMatrices.aggregate_panels(panels, hierarchy_matrices.sub_category_to_category)):
+            category.aggregated_returns = pd.DataFrame({category.name: aggregated_returns})
+
     def create_returns_dataframe(self):
         returns_df = pd.DataFrame()
+        self.aggregate_category_returns()
 
         for category in self.categories:
             if category.aggregated_returns is not None:
@@ -113,17 +221,129 @@ class AllCategory:
 
         return rounded_dataframe
 
-    def optimize(self):
-        returns_df = self.category_df
+    def create_security_returns_dataframe(self, dividend_type=DIVIDEND_TYPE, lookback=DEFAULT_LOOKBACK, impute=True):
+        # impute = False -> Dates before a security's history stay NaN instead of being KNN-imputed
+        returns_df = pd.DataFrame()
 
-        mvo = MeanVarianceOptimizer()
-        expected_returns = mvo.mean_historical_returns_by_returns(returns_df)
-        covariance, correlation = mvo.covariance_correlation_matrix_by_returns(returns_df)
+        for category in self.categories:
+            for subcategory in category.subcategories:
+                for security in subcategory.securities:
+                    adjusted_returns = security.adjusted_returns_in_series(lookback, dividend_type)
+                    if adjusted_returns is not None:
+                        returns_df[security.ticker] = adjusted_returns
 
-        cleaned_weights, portfolio_metrics = mvo.optimize_max_sharpe_ratio(expected_returns, covariance, risk_free_rate=Security.get_risk_free_rate(), constraints_dict=CATEGORY_CONSTRAINTS)
+        filled_dataframe = fill_nan_dataframe_knn(returns_df) if impute else returns_df
 
-        # mro = MeanRiskOptimizer()
-        # mro.optimize(returns_df, risk_free_rate=0, plot=True)
+        rounded_dataframe = filled_dataframe.round(5)
+
+        return rounded_dataframe
+
+    def security_performance_metrics(self, dividend_type=DIVIDEND_TYPE):
+        # Daily-returns Sharpe / Sortino / downside deviation of every security in one vectorized pass
+        returns_df = self.create_security_returns_dataframe(dividend_type)
+        return PerformanceMetrics.summary(returns_df, Security.get_optimizer_risk_free_rate())
+
+    def horizon_metrics(self, lookbacks=ANALYTICS_LOOKBACKS, dividend_type=DIVIDEND_TYPE):
+        # Security metrics for several horizons from one returns panel: each horizon is a zero-copy window of the
+        # longest one, so only the metrics are computed again
+        returns_df = self.create_security_returns_dataframe(dividend_type, LookbackWindow.longest(lookbacks))
+        risk_free_rate = Security.get_optimizer_risk_free_rate()
+        return pd.concat({lookback: PerformanceMetrics.summary(LookbackWindow.slice(returns_df, lookback),
+                                                               risk_free_rate)
+                          for lookback in lookbacks}, axis=1)
+
+    def horizon_weights(self, lookbacks=ANALYTICS_LOOKBACKS, dividend_type=DIVIDEND_TYPE):
+        # Final security weights of the two-level allocation for several horizons, from the same windows
+        returns_df = self.create_security_returns_dataframe(dividend_type, LookbackWindow.longest(lookbacks))
+        allocator = HierarchicalAllocator.from_all_category(self, sub_category_constraints=SUB_CATEGORY_CONSTRAINTS,
+                                                            category_constraints=CATEGORY_CONSTRAINTS,
+                                                            risk_free_rate=Security.get_optimizer_risk_free_rate())
+        returns = returns_df[allocator.tickers].to_numpy(dtype=float)
+        weights = {}
+        for lookback in lookbacks:
+            allocation = allocator.allocate(returns, index=returns_df.index, lookback=lookback)
+            weights[lookback] = pd.Series(allocation["security_weights"], index=allocator.tickers)
+        return pd.DataFrame(weights)
+
+    def get_hierarchy(self):
+        return {category.name: {subcategory.name: {security.ticker: security.sub_asset_weight
+                                                   for security in subcategory.securities}
+                                for subcategory in category.subcategories}
+                for category in self.categories}
+
+    @staticmethod
+    def __has_historical_data(security):
+        try:
+            return security.historical_data is not None and not security.historical_data.empty
+        except Exception:
+            return False  # Left to the per-security path, which reports the fetch error
+
+    def fetch_dividend_yields(self):
+        # One batched dividend fetch and one grouped yield computation for every security still missing its yields,
+        # instead of a request and a groupby per security when the returns are first built
+        self.fetch_dividend_yields_for([security for category in self.categories
+                                        for subcategory in category.subcategories
+                                        for security in subcategory.securities])
+
+    @staticmethod
+    def fetch_dividend_yields_for(securities):
+        # Neither the ones already computed nor the ones whose computation recently failed
+        securities = [security for security in securities
+                      if not security.has_avg_dividend_yield and not security.is_missing("avg_dividend_yield")]
+        securities = [security for security in securities if AllCategory.__has_historical_data(security)]
+        if not securities:
+            return
+        dividend_yields = DividendYieldCalculator().calculate_for_securities(securities)
+        for security in securities:
+            security.avg_dividend_yield = dividend_yields.at[security.ticker,
+                                                             DividendYieldCalculator.AVERAGE_DIVIDEND_YIELD]
+            security.trailing_dividend_yield = dividend_yields.at[security.ticker,
+                                                                  DividendYieldCalculator.TRAILING_DIVIDEND_YIELD]
+
+    @staticmethod
+    def validate_close_prices(securities):
+        close_prices = {}
+        for security in securities:
+            try:
+                # The window the optimization uses, not the whole fetched history
+                close_prices[security.ticker] = LookbackWindow.slice(security.close_prices, DEFAULT_LOOKBACK)
+            except Exception:
+                close_prices[security.ticker] = pd.Series(dtype=float)  # Reported as missing data below
+        return DataQualityValidator().validate_series(close_prices)
+
+    # report: a precomputed report covering these securities, e.g. one validation of a batch's shared universe
+    def validate_data_quality(self, action=DATA_QUALITY_ACTION, report=None):
+        # Validates the close prices of securities not validated yet, as one panel, before any imputation
+        securities = [security for category in self.categories for subcategory in category.subcategories
+                      for security in subcategory.securities if security.ticker not in self.__validated_tickers]
+        if action is None or not securities:
+            return self.data_quality_report
+
+        if report is None:
+            report = self.validate_close_prices(securities)
+        else:
+            report = report.loc[[security.ticker for security in securities]]
+        self.__validated_tickers.update(report.index)
+        self.data_quality_report = report if self.data_quality_report is None else pd.concat(
+            [self.data_quality_report.drop(report.index, errors='ignore'), report])
+
+        failed_tickers = DataQualityValidator.failed_tickers(report)
+        for ticker in failed_tickers:
+            logger.warning("Data quality check failed for %s: %s", ticker, report.at[ticker, DataQualityValidator.ISSUES])
+        if action == "exclude" and failed_tickers:
+            logger.warning("Excluding %s from the optimization", ', '.join(failed_tickers))
+            self.remove_securities(failed_tickers)
+        return self.data_quality_report
+
+    def optimize(self):
+        self.validate_data_quality()
+        if DIVIDEND_TYPE == "avg":
+            self.fetch_dividend_yields()
+        returns_df = self.category_df
+
+        engine = get_optimizer_engine(TOP_LEVEL_OPTIMIZER)
+        cleaned_weights, portfolio_metrics = engine.optimize(returns_df, constraints_dict=CATEGORY_CONSTRAINTS, risk_free_rate=Security.get_optimizer_risk_free_rate())
+        self.portfolio_metrics = portfolio_metrics
 
         for category in self.categories:
             try:
@@ -137,17 +357,24 @@ class AllCategory:
 
                 category.category_weight = weight
             except KeyError as e:
-                print(f"KeyError: {e}")
+                logger.error("KeyError: %s", e)
                 raise
             except ValueError as e:
-                print(f"Error setting weight for {category.name}: {e}")
+                logger.error("Error setting weight for %s: %s", category.name, e)
                 raise
             except Exception as e:
-                print(f"Unexpected error occurred while setting weight for {category.name}: {e}")
+                logger.error("Unexpected error occurred while setting weight for %s: %s", category.name, e)
                 raise
 
+        self.__cleaned_weights = cleaned_weights
         return cleaned_weights
 
+    def update(self):
+        # Recompute only what was invalidated since the last run; clean categories reuse their cached results
+        if self.__cleaned_weights is None:
+            self.optimize()
+        return self.__cleaned_weights
+
     def optimize_with_subcategory(self):
         returns_df = pd.DataFrame()
 
@@ -160,23 +387,64 @@ class AllCategory:
         # Round all numbers in the DataFrame to 5 decimal places
         rounded_dataframe = filled_dataframe.round(5)
 
-        mvo = MeanVarianceOptimizer()
-        expected_returns = mvo.mean_historical_returns_by_returns(rounded_dataframe)
-        covariance, correlation = mvo.covariance_correlation_matrix_by_returns(rounded_dataframe)
-
-        cleaned_weights, portfolio_metrics = mvo.optimize_max_sharpe_ratio(expected_returns, covariance, risk_free_rate=Security.get_risk_free_rate())
+        engine = get_optimizer_engine(TOP_LEVEL_OPTIMIZER)
+        cleaned_weights, portfolio_metrics = engine.optimize(rounded_dataframe, risk_free_rate=Security.get_optimizer_risk_free_rate())
 
 
         return cleaned_weights
 
+    def hierarchy_matrices(self):
+        return HierarchyMatrices.from_all_category(self)
+
+    def aggregate_returns(self, returns_df=None):
+        # Sub-category, category and portfolio returns from one security panel, one sparse product per level
+        if returns_df is None:
+            returns_df = self.create_security_returns_dataframe()
+        return self.hierarchy_matrices().aggregate_returns(returns_df)
+
     def assign_final_asset_weights(self):
-        for category in self.categories:
-            for subcategory in category.subcategories:
-                for security in subcategory.securities:
-                    final_weight = (security.sub_asset_weight *
-                                    subcategory.sub_category_weight *
-                                    category.category_weight)
-                    security.portfolio_asset_weight = final_weight
+        final_weights = self.hierarchy_matrices().final_weights()
+        securities = [security for category in self.categories for subcategory in category.subcategories
+                      for security in subcategory.securities]
+        for security, final_weight in zip(securities, final_weights.tolist()):
+            security.portfolio_asset_weight = final_weight
+        self.assign_number_of_shares(securities)
+
+    def assign_number_of_shares(self, securities=None, discrete_allocator=None):
+        # Whole shares for the final weights of the whole portfolio, solved together so the leftover cash is spent
+        # where it brings the portfolio closest to the target weights
+        if securities is None:
+            securities = [security for category in self.categories for subcategory in category.subcategories
+                          for security in subcategory.securities]
+        last_prices = pd.Series([AllCategory.__last_price(security) for security in securities],
+                                index=[security.ticker for security in securities], dtype=float)
+        # Holdings without a price (e.g. a failed fetch left in the tree by DATA_QUALITY_ACTION = "flag") get no
+        # shares; their target value stays in the leftover cash
+        unpriced = [security for security in securities if not last_prices[security.ticker] > 0]
+        if unpriced:
+            logger.warning("No last price for %s; no shares allocated to them",
+                           ", ".join(security.ticker for security in unpriced))
+        for security in unpriced:
+            security.number_of_shares = None
+        securities = [security for security in securities if last_prices[security.ticker] > 0]
+
+        tickers = [security.ticker for security in securities]
+        weights = pd.Series([security.portfolio_asset_weight for security in securities], index=tickers, dtype=float)
+        discrete_allocator = discrete_allocator or DiscreteAllocator()
+        shares, self.leftover_cash = discrete_allocator.allocate(weights, last_prices[tickers])
+        self.tracking_error = DiscreteAllocator.tracking_error(weights, last_prices[tickers], shares,
+                                                               discrete_allocator.total_portfolio_value)
+        logger.info("Leftover cash: %.2f, tracking error of the whole shares: %.4f%%", self.leftover_cash,
+                    self.tracking_error * 100)
+        for security, number_of_shares in zip(securities, shares.tolist()):
+            security.number_of_shares = number_of_shares
+        return shares
+
+    @staticmethod
+    def __last_price(security):
+        if not AllCategory.__has_historical_data(security):
+            return np.nan
+        return security.historical_data.iloc[-1]
 
     @property
     def category_df(self):
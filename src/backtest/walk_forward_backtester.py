@@ -0,0 +1,128 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.global_settings import SUB_CATEGORY_CONSTRAINTS, CATEGORY_CONSTRAINTS
+from src.hierarchical_allocator import HierarchicalAllocator
+
+
+def allocate_window_chunk(allocator, returns, index, positions, window):
+    # Walks contiguous rebalance dates and keeps running sums of x and x x^T, so each window only adds the
+    # days that entered and subtracts the days that left instead of re-estimating from scratch
+    weights = []
+    first_moment = None
+    second_moment = None
+    previous_position = None
+    for position in positions:
+        if previous_position is None or position - previous_position >= window:
+            window_returns = returns[position - window:position]
+            first_moment = window_returns.sum(axis=0)
+            second_moment = window_returns.T @ window_returns
+        else:
+            entering = returns[previous_position:position]
+            leaving = returns[previous_position - window:position - window]
+            first_moment = first_moment + entering.sum(axis=0) - leaving.sum(axis=0)
+            second_moment = second_moment + entering.T @ entering - leaving.T @ leaving
+        previous_position = position
+
+        mean = first_moment / window
+        empirical_covariance = second_moment / window - np.outer(mean, mean)
+        try:
+            allocation = allocator.allocate(returns[position - window:position], empirical_covariance,
+                                            index[position - window:position])
+            weights.append(allocation["security_weights"])
+        except Exception:
+            # e.g. no asset beats the risk-free rate in this window: keep the previous allocation
+            weights.append(None)
+    return weights
+
+
+class WalkForwardBacktester:
+    def __init__(self, hierarchy, sub_category_constraints=SUB_CATEGORY_CONSTRAINTS,
+                 category_constraints=CATEGORY_CONSTRAINTS, risk_free_rate=0.02, window=252,
+                 rebalance_frequency='Q', max_workers=None, **optimizers):
+        # optimizers: top_level_optimizer / category_optimizers / default_category_optimizer overrides
+        self.allocator = HierarchicalAllocator(hierarchy, sub_category_constraints, category_constraints,
+                                               risk_free_rate, **optimizers)
+        self.window = window
+        self.rebalance_frequency = rebalance_frequency
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    @classmethod
+    def from_all_category(cls, all_category, **kwargs):
+        return cls(all_category.get_hierarchy(), **kwargs)
+
+    def rebalance_positions(self, index):
+        # First trading day of every period, once a full trailing window is available
+        if isinstance(self.rebalance_frequency, int):
+            positions = np.arange(self.window, len(index), self.rebalance_frequency)
+        else:
+            periods = index.to_period(self.rebalance_frequency)
+            period_starts = np.flatnonzero(np.concatenate(([True], periods[1:] != periods[:-1])))
+            positions = period_starts[period_starts >= self.window]
+        return positions
+
+    def calculate_rebalance_weights(self, returns, index, positions):
+        chunks = [chunk for chunk in np.array_split(positions, min(self.max_workers, len(positions))) if len(chunk)]
+        if len(chunks) <= 1:
+            chunk_weights = [allocate_window_chunk(self.allocator, returns, index, chunk, self.window)
+                             for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                futures = [executor.submit(allocate_window_chunk, self.allocator, returns, index, chunk, self.window)
+                           for chunk in chunks]
+                chunk_weights = [future.result() for future in futures]
+
+        rebalance_weights = [weights for chunk in chunk_weights for weights in chunk]
+        if rebalance_weights[0] is None:
+            raise ValueError("The first rebalance window could not be optimized.")
+        for i in range(1, len(rebalance_weights)):
+            if rebalance_weights[i] is None:
+                rebalance_weights[i] = rebalance_weights[i - 1]
+        return np.array(rebalance_weights)
+
+    @staticmethod
+    def simulate(returns, positions, rebalance_weights):
+        # Buy-and-hold between rebalances: holdings drift with cumulative asset growth inside each period
+        growth = np.cumprod(1 + returns, axis=0)
+        growth_before = np.vstack((np.ones(returns.shape[1]), growth))
+
+        held_days = np.arange(positions[0], len(returns))
+        period = np.searchsorted(positions, held_days, side='right') - 1
+        period_start_growth = growth_before[positions]
+        period_value = (rebalance_weights[period] * growth[held_days] / period_start_growth[period]).sum(axis=1)
+
+        # Chain the periods: equity at the start of each period is the product of previous period-end values
+        period_end = np.concatenate((positions[1:] - 1, [len(returns) - 1])) - positions[0]
+        period_start_equity = np.concatenate(([1.0], np.cumprod(period_value[period_end])[:-1]))
+        equity = period_start_equity[period] * period_value
+
+        # One-way turnover: half the absolute change from the drifted weights to the new targets
+        drifted = rebalance_weights[:-1] * growth_before[positions[1:]] / period_start_growth[:-1]
+        drifted = drifted / drifted.sum(axis=1, keepdims=True)
+        turnover = 0.5 * np.abs(rebalance_weights[1:] - drifted).sum(axis=1)
+        return held_days, equity, turnover
+
+    def run(self, returns_df):
+        returns_df = returns_df[self.allocator.tickers]
+        if returns_df.isna().any().any():
+            raise ValueError("Returns panel contains NaN values; fill it before backtesting.")
+
+        returns = returns_df.to_numpy(dtype=float)
+        positions = self.rebalance_positions(returns_df.index)
+        if len(positions) == 0:
+            raise ValueError(f"Not enough history for a {self.window}-day window.")
+
+        rebalance_weights = self.calculate_rebalance_weights(returns, returns_df.index, positions)
+        held_days, equity, turnover = self.simulate(returns, positions, rebalance_weights)
+
+        equity_curve = pd.Series(equity, index=returns_df.index[held_days], name="Equity")
+        return {
+            "weights": pd.DataFrame(rebalance_weights, index=returns_df.index[positions],
+                                    columns=self.allocator.tickers),
+            "equity_curve": equity_curve,
+            "portfolio_returns": equity_curve.pct_change().fillna(equity_curve.iloc[0] - 1),
+            "turnover": pd.Series(turnover, index=returns_df.index[positions[1:]], name="Turnover"),
+        }
@@ -0,0 +1,169 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.all_category import AllCategory
+from src.categories.sub_categories.securities.security import Security
+from src.categories.sub_categories.securities.security_store import SecurityStore
+from src.excel.excel_reader import ExcelReader
+from src.excel.excel_writer import ExcelWriter
+from src.global_settings import DIVIDEND_TYPE, DATA_QUALITY_ACTION, SNAPSHOT_STORE_PATH
+from src.reporting.report_renderer import ReportRenderer
+from src.snapshots.snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+_worker_store = None
+
+
+def _initialize_worker(security_store):
+    # The shared store, with every ticker already fetched and its returns computed, is shipped to each worker once
+    global _worker_store
+    _worker_store = security_store
+
+
+def optimize_portfolio(all_category):
+    # The allocation of a single-workbook run: Category.optimize for each category, then AllCategory.optimize
+    try:
+        category_weights = all_category.update()
+    except Exception as e:
+        return {"error": str(e)}
+    return {"category_weights": dict(category_weights),
+            "sub_category_weights": {category.name: dict(category.cleaned_weights or {})
+                                     for category in all_category.categories},
+            "portfolio_metrics": all_category.portfolio_metrics or {}}
+
+
+def optimize_holdings(holdings):
+    # In a worker: the portfolio's tree rebuilt over the worker's copy of the store, which holds all its data
+    all_category = AllCategory(security_store=_worker_store)
+    all_category.add_securities([(ticker, subcategory_name, category_name, 100)
+                                 for ticker, subcategory_name, category_name, _ in holdings])
+    for ticker, _, _, sub_asset_weight in holdings:
+        all_category.find_security(ticker)[2].sub_asset_weight = sub_asset_weight
+    return optimize_portfolio(all_category)
+
+
+# Runs many client workbooks (each its own ETF.xlsx) as one batch. The portfolios share one SecurityStore, so
+# prices, dividend yields, data quality checks and returns are fetched and computed once per unique ticker; only
+# the allocation itself runs once per portfolio (in parallel with max_workers > 1). Each portfolio is optimized
+# by its own tree, imputed per sub-category and category panel as in a single-workbook run, so its weights do not
+# depend on the other workbooks of the batch.
+class PortfolioBatchRunner:
+    def __init__(self, file_paths, max_workers=None, security_store=None):
+        self.file_paths = list(file_paths)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.security_store = security_store if security_store is not None else SecurityStore()
+        self.portfolios = {}
+
+    def load(self):
+        for file_path in self.file_paths:
+            if file_path not in self.portfolios:
+                self.portfolios[file_path] = AllCategory(security_store=self.security_store)
+            ExcelReader(file_path, self.portfolios[file_path]).read_and_update_securities()
+        return self.portfolios
+
+    def universe(self):
+        # One Security per unique ticker; every holding of a ticker is a view of the same store row
+        securities = {}
+        for all_category in self.portfolios.values():
+            for category in all_category.categories:
+                for subcategory in category.subcategories:
+                    for security in subcategory.securities:
+                        securities.setdefault(security.ticker, security)
+        return securities
+
+    def holdings(self):
+        return sum(len(subcategory.securities) for all_category in self.portfolios.values()
+                   for category in all_category.categories for subcategory in category.subcategories)
+
+    def __prepare_universe(self):
+        universe = list(self.universe().values())
+        logger.info("Batch of %s portfolios: %s holdings, %s unique tickers", len(self.portfolios),
+                    self.holdings(), len(universe))
+
+        if DATA_QUALITY_ACTION is not None:
+            report = AllCategory.validate_close_prices(universe)
+            for all_category in self.portfolios.values():
+                all_category.validate_data_quality(report=report)
+            universe = list(self.universe().values())  # Without the securities the checks excluded
+        if DIVIDEND_TYPE == "avg":
+            AllCategory.fetch_dividend_yields_for(universe)
+        for security in universe:
+            security.adjusted_returns_in_series()
+        # Fetched here so that the workers inherit them
+        Security.get_optimizer_risk_free_rate()
+        self.security_store.compact()
+
+    @staticmethod
+    def __holdings(all_category):
+        return [(security.ticker, subcategory.name, category.name, security.sub_asset_weight)
+                for category in all_category.categories for subcategory in category.subcategories
+                for security in subcategory.securities]
+
+    @staticmethod
+    def __apply(all_category, allocation):
+        # The weights a worker found for its copy of the tree (already set when optimized in this process)
+        for category in all_category.categories:
+            category.category_weight = allocation["category_weights"].get(category.name, 0.0)
+            sub_category_weights = allocation["sub_category_weights"].get(category.name, {})
+            for subcategory in category.subcategories:
+                subcategory.sub_category_weight = sub_category_weights.get(subcategory.name, 0.0)
+        all_category.assign_final_asset_weights()
+
+    # report: renders every portfolio's charts (one pool for all the pages), off by default in batch runs
+    def run(self, write=True, report=False):
+        if not self.portfolios:
+            self.load()
+        self.__prepare_universe()
+        risk_free_rate = Security.get_risk_free_rate()
+        portfolios = list(self.portfolios.values())
+
+        if self.max_workers == 1 or len(portfolios) == 1:
+            results = [optimize_portfolio(all_category) for all_category in portfolios]
+        else:
+            tasks = [self.__holdings(all_category) for all_category in portfolios]
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks)), initializer=_initialize_worker,
+                                     initargs=(self.security_store,)) as executor:
+                results = list(executor.map(optimize_holdings, tasks,
+                                            chunksize=max(1, len(tasks) // (4 * self.max_workers))))
+
+        for (file_path, all_category), result in zip(self.portfolios.items(), results):
+            if "error" in result:
+                logger.error("Allocation failed for %s: %s", file_path, result["error"])
+                continue
+            self.__apply(all_category, result)
+            if SNAPSHOT_STORE_PATH is not None:
+                SnapshotStore.get_default().append(all_category, workbook=file_path, risk_free_rate=risk_free_rate)
+            if write:
+                ExcelWriter(file_path, all_category).update_excel()
+
+        if report:
+            renderer = ReportRenderer()
+            jobs = []
+            for (file_path, all_category), result in zip(self.portfolios.items(), results):
+                if "error" not in result:
+                    jobs.extend(renderer.portfolio_jobs(all_category,
+                                                        prefix=os.path.splitext(os.path.basename(file_path))[0]))
+            renderer.render(jobs)
+
+        return self.summary_table(results)
+
+    def summary_table(self, results):
+        rows = []
+        for all_category, result in zip(self.portfolios.values(), results):
+            row = {("Portfolio", "Holdings"): sum(len(subcategory.securities) for category in all_category.categories
+                                                  for subcategory in category.subcategories),
+                   ("Portfolio", "Leftover Cash"): all_category.leftover_cash,
+                   ("Metrics", "Error"): result.get("error")}
+            for metric, value in result.get("portfolio_metrics", {}).items():
+                row[("Metrics", metric)] = value
+            for category_name, weight in result.get("category_weights", {}).items():
+                row[("Category Weights", category_name)] = weight
+            rows.append(row)
+
+        table = pd.DataFrame(rows, index=pd.Index(list(self.portfolios), name="Workbook"))
+        table.columns = pd.MultiIndex.from_tuples(table.columns)
+        return table
@@ -0,0 +1,60 @@
+import time
+
+import numpy as np
+import pandas as pd
+from pypfopt import risk_models
+
+from src.covariance.covariance_estimator import CovarianceEstimator
+
+
+def synthetic_returns(n_days=1260, n_assets=1000, seed=0):
+    # Factor returns, roughly the shape of five years of daily security-level data
+    rng = np.random.default_rng(seed)
+    factors = rng.standard_t(df=4, size=(n_days, 5)) * 0.006
+    loadings = rng.uniform(0.2, 1.2, size=(5, n_assets))
+    noise = rng.standard_t(df=4, size=(n_days, n_assets)) * 0.004
+    index = pd.bdate_range(end="2024-06-28", periods=n_days)
+    return pd.DataFrame(factors @ loadings + noise, index=index, columns=[f"Asset {i + 1}" for i in range(n_assets)])
+
+
+def best_time(function, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run_benchmark(returns_df, methods=CovarianceEstimator.METHODS, block_size=None, repeats=3):
+    results = []
+    for method in methods:
+        # pypfopt's exp_cov is a Python double loop over asset pairs, so it is only timed once
+        pypfopt_repeats = 1 if method == "exp_cov" else repeats
+        pypfopt_time, (pypfopt_covariance, pypfopt_correlation) = best_time(
+            lambda: (lambda covariance: (covariance, risk_models.cov_to_corr(covariance)))(
+                risk_models.risk_matrix(returns_df, returns_data=True, method=method)), pypfopt_repeats)
+
+        estimator = CovarianceEstimator(method, block_size=block_size)
+        native_time, (native_covariance, native_correlation) = best_time(lambda: estimator.estimate(returns_df),
+                                                                         repeats)
+        results.append({
+            "Method": method,
+            "pypfopt (s)": pypfopt_time,
+            "Native (s)": native_time,
+            "Speed-up": pypfopt_time / native_time,
+            "Max Covariance Difference": np.abs(native_covariance.to_numpy() - pypfopt_covariance.to_numpy()).max(),
+            "Max Correlation Difference": np.abs(native_correlation.to_numpy()
+                                                 - pypfopt_correlation.to_numpy()).max(),
+        })
+    return pd.DataFrame(results).set_index("Method")
+
+
+if __name__ == '__main__':
+    pd.set_option('display.width', 200)
+    print(run_benchmark(synthetic_returns(n_assets=60)).to_string())
+    # exp_cov in pypfopt needs n_assets ** 2 / 2 pandas ewm calls, so the wide panel skips it
+    wide_returns_df = synthetic_returns(n_assets=2000)
+    wide_methods = ("sample_cov", "ledoit_wolf", "oracle_approximating")
+    print(run_benchmark(wide_returns_df, methods=wide_methods).to_string())
+    print(run_benchmark(wide_returns_df, methods=wide_methods, block_size=256).to_string())
@@ -0,0 +1,95 @@
+import gc
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.categories.sub_categories.securities.security import Security
+from src.categories.sub_categories.securities.security_store import SecurityStore
+
+
+class PerObjectSecurity:
+    # The layout Security had before the store: every field an instance attribute, every series its own object
+    def __init__(self, ticker, close_prices, dividend_yield):
+        self.ticker = ticker
+        self.sub_category = "Benchmark"
+        self.sub_asset_weight = 0.01
+        self.parent = None
+        self.name = f"{ticker} Fund"
+        self.category_name = "Benchmark Category"
+        self.exchange_name = "NYSE"
+        self.traded_currency = "USD"
+        self.expense_ratio = 0.001
+        self.dividend_yield = dividend_yield
+        self.avg_dividend_yield = dividend_yield
+        self.trailing_dividend_yield = dividend_yield
+        self.close_prices = close_prices.copy()  # Each security fetched and kept its own prices
+        self.historical_data = self.close_prices.resample('D').last().interpolate(method='pchip').dropna()
+        self.geometric_mean_5y = None
+        self.adjusted_geometric_mean_5y = None
+        self.adjusted_returns_in_series_5y = round(
+            self.historical_data.resample('D').last().pct_change().dropna() + dividend_yield / 252, 5)
+        self.standard_deviation_5y = None
+        self.downside_deviation_5y = None
+        self.var_95 = None
+        self.sharpe_ratio = None
+        self.portfolio_asset_weight = None
+        self.portfolio_asset_allocation = None
+        self.number_of_shares = None
+
+
+def synthetic_close_prices(n_tickers=1000, n_days=1260, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2024-06-28", periods=n_days)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, size=(n_days, n_tickers)), axis=0))
+    return {f"T{i:04d}": pd.Series(prices[:, i], index=index, name='close') for i in range(n_tickers)}
+
+
+def build_per_object(close_prices):
+    return [PerObjectSecurity(ticker, prices, 0.02) for ticker, prices in close_prices.items()]
+
+
+def build_store(close_prices):
+    store = SecurityStore()
+    securities = []
+    for ticker, prices in close_prices.items():
+        security = Security(ticker, "Benchmark", 1, store=store)
+        row = store.row(ticker)
+        # Prices and scalars as the fetchers would store them; the series below are derived by Security itself
+        store.set(row, "close_prices", prices)
+        for field, value in (("name", f"{ticker} Fund"), ("category_name", "Benchmark Category"),
+                             ("exchange_name", "NYSE"), ("traded_currency", "USD"), ("expense_ratio", 0.001),
+                             ("dividend_yield", 0.02), ("avg_dividend_yield", 0.02),
+                             ("trailing_dividend_yield", 0.02)):
+            store.set(row, field, value)
+        security.historical_data
+        security.adjusted_returns_in_series_5y
+        securities.append(security)
+    store.compact()
+    return store, securities
+
+
+def retained_bytes(build, close_prices):
+    # Bytes still allocated after the build, i.e. what the securities keep alive (the input prices excluded)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    result = build(close_prices)
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return after - before
+
+
+if __name__ == '__main__':
+    n_tickers = 1000
+    close_prices = synthetic_close_prices(n_tickers=n_tickers)
+    per_object = retained_bytes(build_per_object, close_prices)
+    store = retained_bytes(build_store, close_prices)
+    results = pd.DataFrame({"Retained (MB)": [per_object / 2 ** 20, store / 2 ** 20],
+                            "Per Ticker (KB)": [per_object / n_tickers / 2 ** 10, store / n_tickers / 2 ** 10]},
+                           index=["Per-object attributes", "SecurityStore"])
+    print(f"Memory per {n_tickers} tickers")
+    print(results.to_string())
+    print(f"Reduction: {1 - store / per_object:.1%}")
@@ -1,30 +1,63 @@
+import logging
+import numpy as np
 import pandas as pd
 
 from src.categories.sub_categories.securities.security import Security
 from src.categories.sub_categories.sub_category import SubCategory
 from src.fill_nan_dataframe_knn import fill_nan_dataframe_knn
-from src.global_settings import SUB_CATEGORY_CONSTRAINTS
-from src.pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
+from src.global_settings import SUB_CATEGORY_CONSTRAINTS, CATEGORY_OPTIMIZERS, DEFAULT_CATEGORY_OPTIMIZER
+from src.memo import Memo
+from src.optimizer_engines.optimizer_engine_registry import get_optimizer_engine
+from src.screening.correlation_screener import CorrelationScreener
+
+logger = logging.getLogger(__name__)
 
 
 class Category:
     def __init__(self, name):
         self.name = name
         self.subcategories = []
-        self.__sub_category_df = None
-        self.__aggregated_returns = None
+        self.parent = None
+        self.__memo = Memo()
         self.__category_weight = None
 
     def add_subcategory(self, subcategory):
-        pass
+        self.subcategories.append(subcategory)
+        subcategory.parent = self
+        self.invalidate()
+
+    def find_subcategory(self, subcategory_name):
+        return next((sc for sc in self.subcategories if sc.name == subcategory_name), None)
 
     def find_or_create_subcategory(self, subcategory_name):
-        subcategory = next((sc for sc in self.subcategories if sc.name == subcategory_name), None)
+        subcategory = self.find_subcategory(subcategory_name)
         if not subcategory:
             subcategory = SubCategory(subcategory_name)
-            self.subcategories.append(subcategory)
+            self.add_subcategory(subcategory)
+        return subcategory
+
+    def remove_subcategory(self, subcategory_name):
+        subcategory = self.find_subcategory(subcategory_name)
+        if subcategory is not None:
+            self.subcategories.remove(subcategory)
+            subcategory.parent = None
+            self.invalidate()
         return subcategory
 
+    def invalidate(self):
+        # A sub-category's returns changed: the returns panel and the optimized weights are stale
+        self.__memo.invalidate("sub_category_df", "cleaned_weights")
+        self.invalidate_aggregated_returns()
+
+    def invalidate_aggregated_returns(self):
+        self.__memo.invalidate("aggregated_returns")
+        if self.parent is not None:
+            self.parent.invalidate()
+
+    @property
+    def is_dirty(self):
+        return not self.__memo.is_set("aggregated_returns") or not self.__memo.is_set("cleaned_weights")
+
     def add_security_to_subcategory(self, security, subcategory_name):
         subcategory = self.find_or_create_subcategory(subcategory_name)
         subcategory.add_security(security)
@@ -45,11 +78,19 @@ class Category:
     def optimize(self):
         returns_df = self.sub_category_df
 
-        mvo = MeanVarianceOptimizer()
-        expected_returns = mvo.mean_historical_returns_by_returns(returns_df)
-        covariance, correlation = mvo.covariance_correlation_matrix_by_returns(returns_df)
-
-        cleaned_weights, portfolio_metrics = mvo.optimize_max_sharpe_ratio(expected_returns, covariance, risk_free_rate=Security.get_risk_free_rate(), constraints_dict=SUB_CATEGORY_CONSTRAINTS.get(self.name))
+        engine = get_optimizer_engine(CATEGORY_OPTIMIZERS.get(self.name, DEFAULT_CATEGORY_OPTIMIZER))
+        constraints_dict = SUB_CATEGORY_CONSTRAINTS.get(self.name)
+        # Near-duplicate sub-categories are optimized as one composite and split back down afterwards
+        screen = CorrelationScreener.get_default().screen_returns(returns_df, constraints_dict)
+        if screen.is_reduced:
+            logger.info("Optimizing %s over %s composites of %s sub-categories", self.name,
+                        len(screen.composite_names), len(screen.names))
+            cleaned_weights, portfolio_metrics = engine.optimize(
+                screen.composite_returns(returns_df), constraints_dict=screen.composite_constraints(constraints_dict),
+                risk_free_rate=Security.get_optimizer_risk_free_rate())
+            cleaned_weights = screen.expand(cleaned_weights)
+        else:
+            cleaned_weights, portfolio_metrics = engine.optimize(returns_df, constraints_dict=constraints_dict, risk_free_rate=Security.get_optimizer_risk_free_rate())
 
         for subcategory in self.subcategories:
             try:
@@ -63,44 +104,49 @@ class Category:
 
                 subcategory.sub_category_weight = weight
             except KeyError as e:
-                print(f"KeyError: {e}")
+                logger.error("KeyError: %s", e)
                 raise
             except ValueError as e:
-                print(f"Error setting weight for {subcategory.name}: {e}")
+                logger.error("Error setting weight for %s: %s", subcategory.name, e)
                 raise
             except Exception as e:
-                print(f"Unexpected error occurred while setting weight for {subcategory.name}: {e}")
+                logger.error("Unexpected error occurred while setting weight for %s: %s", subcategory.name, e)
                 raise
 
+        self.__memo.set("cleaned_weights", cleaned_weights)
         return cleaned_weights
 
     def calculate_aggregated_returns(self):
-        self.optimize()
+        if not self.__memo.is_set("cleaned_weights"):
+            self.optimize()
         filled_returns_df = self.sub_category_df
 
-        # Initialize an empty Series to store aggregated returns
-        aggregated_returns = pd.Series(index=filled_returns_df.index, dtype=float)
-
-        for subcategory in self.subcategories:
-            if subcategory.name in filled_returns_df.columns:
-                # Multiply the returns by the security's sub-asset weight
-                weighted_returns = filled_returns_df[subcategory.name] * subcategory.sub_category_weight
-                # Sum the weighted returns to the aggregated returns
-                aggregated_returns = aggregated_returns.add(weighted_returns, fill_value=0)
+        # One matrix-vector product instead of accumulating a new Series per sub-category
+        subcategories = [subcategory for subcategory in self.subcategories
+                         if subcategory.name in filled_returns_df.columns]
+        weights = np.array([subcategory.sub_category_weight for subcategory in subcategories], dtype=float)
+        aggregated_returns = pd.Series(
+            filled_returns_df[[subcategory.name for subcategory in subcategories]].to_numpy(dtype=float) @ weights,
+            index=filled_returns_df.index)
 
         return pd.DataFrame({self.name: aggregated_returns})
 
     @property
     def sub_category_df(self):
-        if self.__sub_category_df is None:
-            self.__sub_category_df = self.create_returns_dataframe()
-        return self.__sub_category_df
+        return self.__memo.get("sub_category_df", self.create_returns_dataframe)
+
+    @property
+    def cleaned_weights(self):
+        return self.__memo.peek("cleaned_weights")
 
     @property
     def aggregated_returns(self):
-        if self.__aggregated_returns is None:
-            self.__aggregated_returns = self.calculate_aggregated_returns()
-        return self.__aggregated_returns
+        return self.__memo.get("aggregated_returns", self.calculate_aggregated_returns)
+
+    @aggregated_returns.setter
+    def aggregated_returns(self, aggregated_returns):
+        # Set in bulk by AllCategory.aggregate_category_returns
+        self.__memo.set("aggregated_returns", aggregated_returns)
 
     @property
     def category_weight(self):
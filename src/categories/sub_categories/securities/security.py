@@ -1,123 +1,170 @@
-import yahooquery as yq
+import logging
 import pandas as pd
 import numpy as np
-from functools import lru_cache
-from retrying import retry
 
-from src.global_settings import RISK_FREE_RATE, TOTAL_PORTFOLIO_VALUE, DIVIDEND_TYPE
+from src.dividends.dividend_yield_calculator import DividendYieldCalculator
+from src.global_settings import RISK_FREE_RATE, TOTAL_PORTFOLIO_VALUE, DIVIDEND_TYPE, TIME_VARYING_RISK_FREE_RATE, \
+    HISTORY_PERIOD, DEFAULT_LOOKBACK, MEMO_FAILURE_TTL_SECONDS
+from src.lookback_window import LookbackWindow
+from src.market_data.market_data_source import MarketDataSource
+from src.market_data.risk_free_rate_series import RiskFreeRateSeries
+from src.memo import Memo
+from src.resample_rules import YEAR_END_RULE
+from src.categories.sub_categories.securities.security_store import SecurityStore
 
-
-class DataFetchError(Exception):
-    """ Custom exception for data fetch errors """
-    pass
-
-
-class NaNDataError(DataFetchError):
-    """ Exception raised when data has too many NaN values """
-    pass
-
-
-class DuplicatedDataError(DataFetchError):
-    """ Exception raised when data has too many duplicated values """
-    pass
+logger = logging.getLogger(__name__)
 
 
 class Security:
+    # A lightweight view over the ticker's row in a SecurityStore, which holds the market data and metrics
+    __slots__ = ("__ticker", "__sub_category", "__parent", "__store", "__row", "__sub_asset_weight",
+                 "__portfolio_asset_weight", "__memo")
+
     TBILL_3MONTHS = "^IRX"
-    NAN_THRESHOLD = 0.1
-    DUPLICATED_THRESHOLD = 0.1
+    FIVE_YEARS = "5y"  # Horizon of the cached _5y metrics
+    # The cached fields computed from each field, unset with it by invalidate
+    DERIVED_FIELDS = {
+        "close_prices": ("historical_data",),
+        "historical_data": ("geometric_mean_5y", "adjusted_geometric_mean_5y", "adjusted_returns_in_series",
+                            "standard_deviation_5y", "downside_deviation_5y", "avg_dividend_yield"),
+        "dividend_yield": ("adjusted_geometric_mean_5y", "adjusted_returns_in_series"),
+        "avg_dividend_yield": ("trailing_dividend_yield", "adjusted_returns_in_series"),
+        "trailing_dividend_yield": ("avg_dividend_yield",),
+        "adjusted_geometric_mean_5y": ("var_95", "sharpe_ratio"),
+        "standard_deviation_5y": ("var_95", "sharpe_ratio"),
+    }
     _risk_free_rate = None
 
     @classmethod
     def get_risk_free_rate(cls):
         if cls._risk_free_rate is None:
             if RISK_FREE_RATE is None:
-                cls._risk_free_rate = cls.__fetch_risk_free_rate(cls.TBILL_3MONTHS)
+                cls._risk_free_rate = cls.fetch_risk_free_rate()
             else:
                 cls._risk_free_rate = RISK_FREE_RATE
         return cls._risk_free_rate
 
     @classmethod
-    def __fetch_risk_free_rate(cls, ticker):
-        try:
-            treasury = yq.Ticker(ticker)
-            data = treasury.history(period='1y')
+    def refresh_risk_free_rate(cls):
+        # Drops the cached rate so that a long-running process picks up the latest one
+        cls._risk_free_rate = None
+        return cls.get_risk_free_rate()
 
-            if not data.empty and 'close' in data.columns:
-                return round(data['close'].iloc[-1] / 100, 5)
-            else:
-                raise ValueError("Data not available or invalid format")
+    @classmethod
+    def fetch_risk_free_rate(cls):
+        try:
+            return RiskFreeRateSeries.get_default().latest()
         except Exception as e:
-            print(f"Error fetching risk-free rate: {e}")
+            logger.warning("Error fetching risk-free rate: %s", e)
             return None
 
-    def __init__(self, ticker, sub_category, sub_asset_weight):
+    @classmethod
+    def get_risk_free_rate_series(cls):
+        # The daily annual T-Bill series when TIME_VARYING_RISK_FREE_RATE is on, otherwise None
+        if RISK_FREE_RATE is None and TIME_VARYING_RISK_FREE_RATE:
+            return RiskFreeRateSeries.get_default().series()
+        return None
+
+    @classmethod
+    def get_optimizer_risk_free_rate(cls):
+        # OptimizerEngine.optimize takes either the scalar fast path or the series, which it turns into excess returns
+        risk_free_rate_series = cls.get_risk_free_rate_series()
+        return cls.get_risk_free_rate() if risk_free_rate_series is None else risk_free_rate_series
+
+    @classmethod
+    def get_yearly_risk_free_rates(cls, index):
+        # Annual rate for each year of a year-end returns index: that year's average with the series,
+        # the scalar rate for every year otherwise
+        risk_free_rate_series = cls.get_risk_free_rate_series()
+        if risk_free_rate_series is None:
+            risk_free_rate = cls.get_risk_free_rate()
+            return None if risk_free_rate is None else pd.Series(risk_free_rate, index=index)
+        return RiskFreeRateSeries.yearly_rates(risk_free_rate_series, index)
+
+    def __init__(self, ticker, sub_category, sub_asset_weight, store=None):
         self.__ticker = ticker
         self.__sub_category = sub_category
+        self.__parent = None
+        self.__store = store if store is not None else SecurityStore.get_default()
+        self.__row = self.__store.add(ticker)
+        # The holding itself, specific to this portfolio; everything about the ticker lives in the store row
         self.__sub_asset_weight = sub_asset_weight / 100
-        self.__etf = yq.Ticker(self.__ticker)
-        self.__name = None
-        self.__category_name = None
-        self.__exchange_name = None
-        self.__traded_currency = None
-        self.__expense_ratio = None
-        self.__dividend_yield = None
-        self.__avg_dividend_yield = None
-        self.__historical_data = None
-        self.__geometric_mean_5y = None
-        self.__adjusted_geometric_mean_5y = None
-        self.__adjusted_returns_in_series_5y = None
-        self.__standard_deviation_5y = None
-        self.__downside_deviation_5y = None
-        self.__var_95 = None
-        self.__sharpe_ratio = None
         self.__portfolio_asset_weight = None
-        self.__portfolio_asset_allocation = None
-        self.__number_of_shares = None
+        self.__memo = Memo()  # The holding's allocation and shares, which follow from its weight
+
+    def release(self):
+        # Releases the row once the security has left the tree; the view must not be used afterwards
+        self.__store.remove(self.__ticker)
+
+    def __cached(self, field, calculate):
+        # A calculation that came back None is stored as missing and not run again until the TTL has passed
+        value = self.__store.get(self.__row, field)
+        if value is None and not self.is_missing(field):
+            value = calculate()
+            self.__store.set(self.__row, field, value)
+        return value
+
+    def is_missing(self, field):
+        return self.__store.is_missing(self.__row, field, MEMO_FAILURE_TTL_SECONDS)
+
+    def invalidate(self, *fields):
+        # Unsets the fields (no fields -> All of them) and everything computed from them, so that the next access
+        # fetches or calculates them again. The row is shared by every portfolio holding the ticker; only this
+        # holding's sub-category is told that its returns are stale.
+        pending = list(fields or SecurityStore.FIELDS)
+        invalidated = set()
+        while pending:
+            field = pending.pop()
+            if field not in invalidated:
+                invalidated.add(field)
+                self.__store.unset(self.__row, field)
+                pending.extend(Security.DERIVED_FIELDS.get(field, ()))
+        if "adjusted_returns_in_series" in invalidated and self.__parent is not None:
+            self.__parent.invalidate()
 
     def __fetch_name(self):
         try:
-            ticker_quote_type = self.__etf.quote_type.get(self.__ticker, {})
+            ticker_quote_type = MarketDataSource.get_default().module(self.__ticker, 'quote_type').get(self.__ticker, {})
             if isinstance(ticker_quote_type, dict):
                 return ticker_quote_type.get('longName', "Unknown")
             return "Unknown"
         except Exception as e:
-            print(f"Error fetching name for {self.__ticker}: {e}")
+            logger.warning("Error fetching name for %s: %s", self.__ticker, e)
             return None
 
     def __fetch_category_name(self):
         try:
-            ticker_fund_profile = self.__etf.fund_profile.get(self.__ticker, {})
+            ticker_fund_profile = MarketDataSource.get_default().module(self.__ticker, 'fund_profile').get(self.__ticker, {})
             if isinstance(ticker_fund_profile, dict):
                 return ticker_fund_profile.get('categoryName', "Unknown")
             return "Unknown"
         except Exception as e:
-            print(f"Error fetching category name for {self.__ticker}: {e}")
+            logger.warning("Error fetching category name for %s: %s", self.__ticker, e)
             return None
 
     def __fetch_exchange_name(self):
         try:
-            ticker_price = self.__etf.price.get(self.__ticker, {})
+            ticker_price = MarketDataSource.get_default().module(self.__ticker, 'price').get(self.__ticker, {})
             if isinstance(ticker_price, dict):
                 return ticker_price.get('exchangeName', "Unknown")
             return "Unknown"
         except Exception as e:
-            print(f"Error fetching exchange name for {self.__ticker}: {e}")
+            logger.warning("Error fetching exchange name for %s: %s", self.__ticker, e)
             return None
 
     def __fetch_traded_currency(self):
         try:
-            ticker_price = self.__etf.price.get(self.__ticker, {})
+            ticker_price = MarketDataSource.get_default().module(self.__ticker, 'price').get(self.__ticker, {})
             if isinstance(ticker_price, dict):
                 return ticker_price.get('currency', "Unknown")
             return "Unknown"
         except Exception as e:
-            print(f"Error fetching traded currency for {self.__ticker}: {e}")
+            logger.warning("Error fetching traded currency for %s: %s", self.__ticker, e)
             return None
 
     def __fetch_expense_ratio(self):
         try:
-            ticker_fund_profile = self.__etf.fund_profile.get(self.__ticker, {})
+            ticker_fund_profile = MarketDataSource.get_default().module(self.__ticker, 'fund_profile').get(self.__ticker, {})
             if isinstance(ticker_fund_profile, dict):
                 expense_ratio = (ticker_fund_profile.get("feesExpensesInvestment", {})
                                  .get("annualReportExpenseRatio"))
@@ -125,16 +172,16 @@ class Security:
                     try:
                         return round(float(expense_ratio), 5)
                     except (TypeError, ValueError):
-                        print(f"Expense ratio value for {self.__ticker} is not a valid number.")
+                        logger.warning("Expense ratio value for %s is not a valid number.", self.__ticker)
                         return None
             return None
         except Exception as e:
-            print(f"Error fetching expense ratio for {self.__ticker}: {e}")
+            logger.warning("Error fetching expense ratio for %s: %s", self.__ticker, e)
             return None
 
     def __fetch_dividend_yield(self):
         try:
-            summary_detail = self.__etf.summary_detail.get(self.__ticker, {})
+            summary_detail = MarketDataSource.get_default().module(self.__ticker, 'summary_detail').get(self.__ticker, {})
             # print(f"{self.__ticker}: {summary_detail}")
             if isinstance(summary_detail, dict):
                 dividend_yield = summary_detail.get("dividendYield")
@@ -146,110 +193,56 @@ class Security:
                         # print(f"Fetched dividend yield for {self.__ticker}: {dividend_yield}")
                         return dividend_yield
                     except (TypeError, ValueError):
-                        print(f"Dividend yield value for {self.__ticker} is not a valid number.")
+                        logger.warning("Dividend yield value for %s is not a valid number.", self.__ticker)
                         return None
                 else:
                     return 0
             return None
         except Exception as e:
-            print(f"Error fetching dividend yield for {self.__ticker}: {e}")
+            logger.warning("Error fetching dividend yield for %s: %s", self.__ticker, e)
             return None
 
     def __fetch_dividends_history(self):
         try:
-            historical_data = self.__check_historical_data()
-            # Extract the first date from the historical_data DataFrame
-            start_date = historical_data.index.min()
-
-            # Convert the date to the required format (yyyy-mm-dd)
-            start_date_str = start_date.strftime('%Y-%m-%d')
-
-            # Use this date to obtain the dividend history
-            dividends_history = self.__etf.dividend_history(start_date_str)
-
-            # Check if dividends_history is empty
-            if dividends_history.empty:
-                return 0.0
-
-            # Reset the index of dividends_history to make 'date' a column
-            dividends_history.reset_index(inplace=True)
-
-            # Ensure 'date' column is in the correct format
-            dividends_history['date'] = pd.to_datetime(dividends_history['date'])
-            # print(dividends_history)
-
-            # Resample the historical data to get the year-end prices
-            yearly_prices = historical_data.resample('Y').last()
-            # print(yearly_prices)
-
-            # Calculate the total annual dividends
-            dividends_history['year'] = pd.to_datetime(dividends_history['date']).dt.year
-            total_dividends_per_year = dividends_history.groupby('year')['dividends'].sum()
-            # print(total_dividends_per_year)
-
-            # Convert the index of yearly_prices to just the year (as integers)
-            yearly_prices.index = yearly_prices.index.year
-
-            # Ensure both series are aligned by year
-            aligned_years = set(total_dividends_per_year.index).intersection(set(yearly_prices.index))
-            total_dividends_per_year = total_dividends_per_year[total_dividends_per_year.index.isin(aligned_years)]
-            yearly_prices = yearly_prices[yearly_prices.index.isin(aligned_years)]
-
-            # Calculate the dividend yields
-            dividend_yields = total_dividends_per_year / yearly_prices
-
-            # Calculate the average dividend yield
-            average_dividend_yield = dividend_yields.mean()
-
-            return round(average_dividend_yield, 5)
+            self.__check_historical_data()
+            dividend_yields = DividendYieldCalculator().calculate_for_securities([self]).loc[self.__ticker]
+            self.trailing_dividend_yield = float(dividend_yields[DividendYieldCalculator.TRAILING_DIVIDEND_YIELD])
+            return float(dividend_yields[DividendYieldCalculator.AVERAGE_DIVIDEND_YIELD])
         except Exception as e:
-            print(f"Error in calculating average dividend yield for {self.__ticker}: {e}")
+            logger.warning("Error in calculating average dividend yield for %s: %s", self.__ticker, e)
             return None
 
+    def __fetch_trailing_dividend_yield(self):
+        # The trailing yield comes with the average one
+        self.avg_dividend_yield = self.__fetch_dividends_history()
+        return self.__store.get(self.__row, "trailing_dividend_yield")
 
-    def __is_data_valid(self, data, ticker):
-        # Check for a significant amount of NaN values
-        if data.isna().sum() / len(data) > Security.NAN_THRESHOLD:  # Example threshold for NaN values
-            raise NaNDataError(f"{ticker} contains too many NaN values: {data.isna().sum()} out of {len(data)}")
-
-        # Check for duplicated values
-        if data.duplicated().sum() / len(data) > Security.DUPLICATED_THRESHOLD:
-            raise DuplicatedDataError(
-                f"{ticker} contains too many duplicated values: {data.duplicated().sum()} out of {len(data)}")
-
-        return True
-
-    @lru_cache(maxsize=None)
-    @retry(stop_max_attempt_number=3, wait_fixed=1000, retry_on_exception=lambda e: isinstance(e, DataFetchError))
-    def __fetch_historical_data(self):
+    def __fetch_close_prices(self):
         try:
-            historical_data = self.__etf.history(period="5y").xs(self.__ticker, level='symbol')
+            historical_data = MarketDataSource.get_default().history(self.__ticker, period=HISTORY_PERIOD).xs(self.__ticker, level='symbol')
             historical_data.index = pd.to_datetime(historical_data.index)  # Convert index to DatetimeIndex
-            resample_historical_data = historical_data['close'].resample('D').last()
-            resample_historical_data.interpolate(method='pchip', inplace=True)
-
-            # This will now raise specific exceptions if the data is invalid
-            # self.__is_data_valid(resample_historical_data, self.__ticker)
-
-            return resample_historical_data.dropna()
-        except (NaNDataError, DuplicatedDataError) as e:
-            print(f"Validation failed for {self.__ticker}: {e}")
-            raise  # Reraise the specific validation exception to trigger a retry
+            # Validation runs once on the whole price panel (DataQualityValidator), not per fetch
+            return historical_data['close']
         except Exception as e:
-            print(f"Error fetching historical data for {self.__ticker}: {e}")
+            logger.warning("Error fetching historical data for %s: %s", self.__ticker, e)
             raise  # Reraise any other exceptions
 
-    def __check_historical_data(self):
-        historical_data = self.historical_data
+    def __resample_historical_data(self):
+        resample_historical_data = self.close_prices.resample('D').last()
+        resample_historical_data.interpolate(method='pchip', inplace=True)
+        return resample_historical_data.dropna()
+
+    def __check_historical_data(self, lookback=FIVE_YEARS):
+        historical_data = LookbackWindow.slice(self.historical_data, lookback)
         if historical_data is None or historical_data.empty:
             raise ValueError("Historical data is missing or empty")
         return historical_data
 
-    def __calculate_geometric_mean_5y(self):
+    def __calculate_geometric_mean(self, lookback=FIVE_YEARS):
         try:
-            historical_data = self.__check_historical_data()
+            historical_data = self.__check_historical_data(lookback)
 
-            yearly_prices = historical_data.resample('Y').last()
+            yearly_prices = historical_data.resample(YEAR_END_RULE).last()
             yearly_returns = yearly_prices.pct_change().dropna()
 
             if len(yearly_returns) == 0:
@@ -258,14 +251,14 @@ class Security:
             geometric_mean = (yearly_returns + 1).prod() ** (1 / len(yearly_returns)) - 1
             return round(geometric_mean, 5)
         except Exception as e:
-            print(f"Error in calculating geometric mean for {self.__ticker}: {e}")
+            logger.warning("Error in calculating geometric mean for %s: %s", self.__ticker, e)
             return None
 
-    def __calculate_adjusted_geometric_mean_5y(self):
+    def __calculate_adjusted_geometric_mean(self, lookback=FIVE_YEARS):
         try:
-            historical_data = self.__check_historical_data()
+            historical_data = self.__check_historical_data(lookback)
 
-            yearly_prices = historical_data.resample('Y').last()
+            yearly_prices = historical_data.resample(YEAR_END_RULE).last()
             yearly_returns = yearly_prices.pct_change().dropna()
 
             if len(yearly_returns) == 0:
@@ -279,12 +272,13 @@ class Security:
             geometric_mean = (adjusted_yearly_returns + 1).prod() ** (1 / len(adjusted_yearly_returns)) - 1
             return round(geometric_mean, 5)
         except Exception as e:
-            print(f"Error in calculating adjusted geometric mean for {self.__ticker}: {e}")
+            logger.warning("Error in calculating adjusted geometric mean for %s: %s", self.__ticker, e)
             return None
 
-    def __calculate_adjusted_returns_in_series_5y(self):
+    def __calculate_adjusted_returns_in_series(self, dividend_type=DIVIDEND_TYPE):
+        # Over the whole fetched history; the windows are views of it
         try:
-            historical_data = self.__check_historical_data()
+            historical_data = self.__check_historical_data(LookbackWindow.MAX)
 
             daily_prices = historical_data.resample('D').last()
             daily_returns = daily_prices.pct_change().dropna()
@@ -292,7 +286,7 @@ class Security:
             if len(daily_returns) == 0:
                 raise ValueError("No daily returns data available for calculation")
 
-            dividend_yield = self.avg_dividend_yield if DIVIDEND_TYPE == "avg" else self.dividend_yield
+            dividend_yield = self.avg_dividend_yield if dividend_type == "avg" else self.dividend_yield
             if dividend_yield is None:
                 raise ValueError("Dividend yield data is missing")
 
@@ -300,14 +294,14 @@ class Security:
             adjusted_daily_returns = daily_returns + (dividend_yield / 252)
             return round(adjusted_daily_returns, 5)
         except Exception as e:
-            print(f"Error in calculating adjusted returns in series for {self.__ticker}: {e}")
+            logger.warning("Error in calculating adjusted returns in series for %s: %s", self.__ticker, e)
             return None
 
-    def __calculate_std_5y(self):
+    def __calculate_std(self, lookback=FIVE_YEARS):
         try:
-            historical_data = self.__check_historical_data()
+            historical_data = self.__check_historical_data(lookback)
 
-            yearly_prices = historical_data.resample('Y').last()
+            yearly_prices = historical_data.resample(YEAR_END_RULE).last()
             yearly_returns = yearly_prices.pct_change().dropna()
 
             if len(yearly_returns) == 0:
@@ -315,28 +309,29 @@ class Security:
 
             return round(yearly_returns.std(), 5)
         except Exception as e:
-            print(f"Error in calculating standard deviation for {self.__ticker}: {e}")
+            logger.warning("Error in calculating standard deviation for %s: %s", self.__ticker, e)
             return None
 
-    def __calculate_downside_deviation_5y(self):
+    def __calculate_downside_deviation(self, lookback=FIVE_YEARS):
         try:
-            historical_data = self.__check_historical_data()
+            historical_data = self.__check_historical_data(lookback)
 
-            yearly_prices = historical_data.resample('Y').last()
+            yearly_prices = historical_data.resample(YEAR_END_RULE).last()
             yearly_returns = yearly_prices.pct_change().dropna()
 
             if len(yearly_returns) == 0:
                 raise ValueError("No yearly returns data available for calculation")
 
-            mar = Security.get_risk_free_rate()
+            mar = Security.get_yearly_risk_free_rates(yearly_returns.index)
             if mar is None:
                 raise ValueError("Risk-free rate is missing")
 
-            excess_returns = np.minimum(0, yearly_returns - mar)
+            # Years before the rate series starts have no rate and are left out
+            excess_returns = np.minimum(0, (yearly_returns - mar).dropna())
             downside_risk = np.sqrt(np.mean(excess_returns ** 2))
             return downside_risk
         except Exception as e:
-            print(f"Error in calculating downside deviation for {self.__ticker}: {e}")
+            logger.warning("Error in calculating downside deviation for %s: %s", self.__ticker, e)
             return None
 
     def __calculate_var_monte_carlo(self, n_simulations=10000, confidence_level=0.95):
@@ -357,14 +352,16 @@ class Security:
             var_percent = (var_absolute - last_price) / last_price
             return round(var_percent, 5)
         except Exception as e:
-            print(f"Error in calculating VaR for {self.__ticker}: {e}")
+            logger.warning("Error in calculating VaR for %s: %s", self.__ticker, e)
             return None
 
     def __calculate_sharpe_ratio(self):
         try:
             investment_return = self.adjusted_geometric_mean_5y
             standard_deviation = self.standard_deviation_5y
-            risk_free_rate = Security.get_risk_free_rate()
+            yearly_prices = self.__check_historical_data().resample(YEAR_END_RULE).last()
+            yearly_risk_free_rates = Security.get_yearly_risk_free_rates(yearly_prices.pct_change().dropna().index)
+            risk_free_rate = None if yearly_risk_free_rates is None else yearly_risk_free_rates.mean()
 
             if investment_return is None or standard_deviation is None or risk_free_rate is None:
                 raise ValueError("Required data for Sharpe ratio calculation is missing")
@@ -372,16 +369,18 @@ class Security:
             sharpe_ratio = (investment_return - risk_free_rate) / standard_deviation
             return round(sharpe_ratio, 2)
         except Exception as e:
-            print(f"Error in calculating Sharpe ratio for {self.__ticker}: {e}")
+            logger.warning("Error in calculating Sharpe ratio for %s: %s", self.__ticker, e)
             return None
 
     def __calculate_number_of_shares(self):
+        # Fallback for a security read on its own; AllCategory.assign_number_of_shares allocates whole shares for
+        # the whole portfolio at once
         try:
             historical_data = self.__check_historical_data()
             last_price = historical_data.iloc[-1]
-            return round(self.portfolio_asset_allocation / last_price, 2)
+            return int(self.portfolio_asset_allocation // last_price)
         except Exception as e:
-            print(f"Error in calculating number of shares for {self.__ticker}: {e}")
+            logger.warning("Error in calculating number of shares for %s: %s", self.__ticker, e)
             return None
 
     @property
@@ -396,95 +395,141 @@ class Security:
     def sub_asset_weight(self):
         return self.__sub_asset_weight
 
+    @sub_asset_weight.setter
+    def sub_asset_weight(self, weight):
+        if weight < 0 or weight > 1:
+            raise ValueError("Sub-category asset weight must be between 0 and 1")
+        if weight != self.__sub_asset_weight:
+            self.__sub_asset_weight = weight
+            # The owning sub-category's aggregated returns depend on this weight
+            if self.__parent is not None:
+                self.__parent.invalidate()
+
+    @property
+    def parent(self):
+        return self.__parent
+
+    @parent.setter
+    def parent(self, sub_category):
+        self.__parent = sub_category
+
     @property
     def name(self):
-        if self.__name is None:
-            self.__name = self.__fetch_name()
-        return self.__name
+        return self.__cached("name", self.__fetch_name)
 
     @property
     def category_name(self):
-        if self.__category_name is None:
-            self.__category_name = self.__fetch_category_name()
-        return self.__category_name
+        return self.__cached("category_name", self.__fetch_category_name)
 
     @property
     def exchange_name(self):
-        if self.__exchange_name is None:
-            self.__exchange_name = self.__fetch_exchange_name()
-        return self.__exchange_name
+        return self.__cached("exchange_name", self.__fetch_exchange_name)
 
     @property
     def traded_currency(self):
-        if self.__traded_currency is None:
-            self.__traded_currency = self.__fetch_traded_currency()
-        return self.__traded_currency
+        return self.__cached("traded_currency", self.__fetch_traded_currency)
 
     @property
     def expense_ratio(self):
-        if self.__expense_ratio is None:
-            self.__expense_ratio = self.__fetch_expense_ratio()
-        return self.__expense_ratio
+        return self.__cached("expense_ratio", self.__fetch_expense_ratio)
 
     @property
     def dividend_yield(self):
-        if self.__dividend_yield is None:
-            self.__dividend_yield = self.__fetch_dividend_yield()
-        return self.__dividend_yield
+        return self.__cached("dividend_yield", self.__fetch_dividend_yield)
 
     @property
     def avg_dividend_yield(self):
-        if self.__avg_dividend_yield is None:
-            self.__avg_dividend_yield = self.__fetch_dividends_history()
-        return self.__avg_dividend_yield
+        return self.__cached("avg_dividend_yield", self.__fetch_dividends_history)
+
+    @avg_dividend_yield.setter
+    def avg_dividend_yield(self, dividend_yield):
+        # Set in bulk by AllCategory.fetch_dividend_yields
+        self.__store.set(self.__row, "avg_dividend_yield", dividend_yield)
+
+    @property
+    def has_avg_dividend_yield(self):
+        return self.__store.get(self.__row, "avg_dividend_yield") is not None
+
+    @property
+    def trailing_dividend_yield(self):
+        return self.__cached("trailing_dividend_yield", self.__fetch_trailing_dividend_yield)
+
+    @trailing_dividend_yield.setter
+    def trailing_dividend_yield(self, dividend_yield):
+        self.__store.set(self.__row, "trailing_dividend_yield", dividend_yield)
+
+    @property
+    def close_prices(self):
+        # Raw closes on trading days, as fetched
+        return self.__cached("close_prices", self.__fetch_close_prices)
 
     @property
     def historical_data(self):
-        if self.__historical_data is None:
-            self.__historical_data = self.__fetch_historical_data()
-        return self.__historical_data
+        # Daily closes with non-trading days interpolated
+        return self.__cached("historical_data", self.__resample_historical_data)
+
+    def historical_data_window(self, lookback=DEFAULT_LOOKBACK):
+        return LookbackWindow.slice(self.historical_data, lookback)
 
     @property
     def geometric_mean_5y(self):
-        if self.__geometric_mean_5y is None:
-            self.__geometric_mean_5y = self.__calculate_geometric_mean_5y()
-        return self.__geometric_mean_5y
+        return self.__cached("geometric_mean_5y", self.__calculate_geometric_mean)
+
+    def geometric_mean(self, lookback=DEFAULT_LOOKBACK):
+        # Any horizon of the one fetched history; only the 5y values are cached
+        if lookback == Security.FIVE_YEARS:
+            return self.geometric_mean_5y
+        return self.__calculate_geometric_mean(lookback)
 
     @property
     def adjusted_geometric_mean_5y(self):
-        if self.__adjusted_geometric_mean_5y is None:
-            self.__adjusted_geometric_mean_5y = self.__calculate_adjusted_geometric_mean_5y()
-        return self.__adjusted_geometric_mean_5y
+        return self.__cached("adjusted_geometric_mean_5y", self.__calculate_adjusted_geometric_mean)
+
+    def adjusted_geometric_mean(self, lookback=DEFAULT_LOOKBACK):
+        if lookback == Security.FIVE_YEARS:
+            return self.adjusted_geometric_mean_5y
+        return self.__calculate_adjusted_geometric_mean(lookback)
 
     @property
     def adjusted_returns_in_series_5y(self):
-        if self.__adjusted_returns_in_series_5y is None:
-            self.__adjusted_returns_in_series_5y = self.__calculate_adjusted_returns_in_series_5y()
-        return self.__adjusted_returns_in_series_5y
+        return self.adjusted_returns_in_series(Security.FIVE_YEARS)
+
+    def adjusted_returns_in_series(self, lookback=DEFAULT_LOOKBACK, dividend_type=DIVIDEND_TYPE):
+        # A zero-copy window of the full-history returns
+        if dividend_type == DIVIDEND_TYPE:
+            adjusted_returns = self.__cached("adjusted_returns_in_series", self.__calculate_adjusted_returns_in_series)
+        else:
+            adjusted_returns = self.__calculate_adjusted_returns_in_series(dividend_type)
+        return LookbackWindow.slice(adjusted_returns, lookback)
+
+    def adjusted_returns_in_series_by_dividend_type(self, dividend_type):
+        return self.adjusted_returns_in_series(DEFAULT_LOOKBACK, dividend_type)
 
     @property
     def standard_deviation_5y(self):
-        if self.__standard_deviation_5y is None:
-            self.__standard_deviation_5y = self.__calculate_std_5y()
-        return self.__standard_deviation_5y
+        return self.__cached("standard_deviation_5y", self.__calculate_std)
+
+    def standard_deviation(self, lookback=DEFAULT_LOOKBACK):
+        if lookback == Security.FIVE_YEARS:
+            return self.standard_deviation_5y
+        return self.__calculate_std(lookback)
 
     @property
     def downside_deviation_5y(self):
-        if self.__downside_deviation_5y is None:
-            self.__downside_deviation_5y = self.__calculate_downside_deviation_5y()
-        return self.__downside_deviation_5y
+        return self.__cached("downside_deviation_5y", self.__calculate_downside_deviation)
+
+    def downside_deviation(self, lookback=DEFAULT_LOOKBACK):
+        if lookback == Security.FIVE_YEARS:
+            return self.downside_deviation_5y
+        return self.__calculate_downside_deviation(lookback)
 
     @property
     def var_95(self):
-        if self.__var_95 is None:
-            self.__var_95 = self.__calculate_var_monte_carlo()
-        return self.__var_95
+        return self.__cached("var_95", self.__calculate_var_monte_carlo)
 
     @property
     def sharpe_ratio(self):
-        if self.__sharpe_ratio is None:
-            self.__sharpe_ratio = self.__calculate_sharpe_ratio()
-        return self.__sharpe_ratio
+        return self.__cached("sharpe_ratio", self.__calculate_sharpe_ratio)
 
     @property
     def portfolio_asset_weight(self):
@@ -492,19 +537,25 @@ class Security:
 
     @property
     def portfolio_asset_allocation(self):
-        if self.__portfolio_asset_allocation is None:
-            if self.portfolio_asset_weight is not None:
-                self.__portfolio_asset_allocation = TOTAL_PORTFOLIO_VALUE * self.portfolio_asset_weight
-        return self.__portfolio_asset_allocation
+        if self.portfolio_asset_weight is None:
+            return None  # Not allocated yet
+        return self.__memo.get("portfolio_asset_allocation",
+                               lambda: TOTAL_PORTFOLIO_VALUE * self.portfolio_asset_weight)
 
     @property
     def number_of_shares(self):
-        if self.__number_of_shares is None:
-            self.__number_of_shares = self.__calculate_number_of_shares()
-        return self.__number_of_shares
+        return self.__memo.get("number_of_shares", self.__calculate_number_of_shares)
+
+    @number_of_shares.setter
+    def number_of_shares(self, shares):
+        # Set in bulk by AllCategory.assign_number_of_shares; None -> No shares could be allocated
+        self.__memo.set("number_of_shares", shares)
 
     @portfolio_asset_weight.setter
     def portfolio_asset_weight(self, weight):
         if weight < 0 or weight > 1:
             raise ValueError("Portfolio asset weight must be between 0 and 1")
-        self.__portfolio_asset_weight = weight
+        if weight != self.__portfolio_asset_weight:
+            self.__portfolio_asset_weight = weight
+            # Both follow from the weight
+            self.__memo.invalidate("portfolio_asset_allocation", "number_of_shares")
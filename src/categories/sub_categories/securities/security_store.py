@@ -0,0 +1,264 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class _RaggedSeriesBuffer:
+    # Values of every row's series packed end to end in one contiguous float64 buffer, located by an offset /
+    # length per row. Date indexes are interned: the securities of a portfolio mostly share one trading calendar,
+    # so a calendar is kept once however many rows use it. A replaced or removed series leaves a gap in the
+    # buffer that is compacted away on the next growth.
+    GROWTH_FACTOR = 1.5
+
+    def __init__(self, capacity, calendars):
+        self.__values = np.empty(capacity, dtype=np.float64)
+        self.__used = 0
+        self.__wasted = 0
+        self.__offsets = np.zeros(0, dtype=np.int64)
+        self.__lengths = np.zeros(0, dtype=np.int64)
+        self.__indexes = np.empty(0, dtype=object)
+        self.__names = np.empty(0, dtype=object)
+        self.__calendars = calendars
+
+    def resize_rows(self, rows):
+        grown = rows - len(self.__offsets)
+        self.__offsets = np.concatenate([self.__offsets, np.zeros(grown, dtype=np.int64)])
+        self.__lengths = np.concatenate([self.__lengths, np.full(grown, -1, dtype=np.int64)])
+        self.__indexes = np.concatenate([self.__indexes, np.empty(grown, dtype=object)])
+        self.__names = np.concatenate([self.__names, np.empty(grown, dtype=object)])
+
+    def compact(self, capacity=None):
+        live_rows = np.flatnonzero(self.__lengths > 0)
+        live = int(self.__lengths[live_rows].sum())
+        values = np.empty(live if capacity is None else max(capacity, live), dtype=np.float64)
+        used = 0
+        for row in live_rows:
+            start, length = self.__offsets[row], self.__lengths[row]
+            values[used:used + length] = self.__values[start:start + length]
+            self.__offsets[row] = used
+            used += length
+        # Series handed out earlier keep the old buffer alive until they are released
+        self.__values, self.__used, self.__wasted = values, used, 0
+
+    def __reserve(self, length):
+        if self.__used + length <= len(self.__values):
+            return
+        # Compact into the same capacity when that frees enough room, otherwise grow geometrically
+        needed = self.__used - self.__wasted + length
+        capacity = len(self.__values)
+        if needed * _RaggedSeriesBuffer.GROWTH_FACTOR > capacity:
+            capacity = int(max(capacity, needed) * _RaggedSeriesBuffer.GROWTH_FACTOR)
+        self.compact(capacity)
+
+    def get(self, row):
+        length = self.__lengths[row]
+        if length < 0:
+            return None
+        start = self.__offsets[row]
+        # copy=False: a view over the buffer, not a per-security copy
+        return pd.Series(self.__values[start:start + length], index=self.__indexes[row], name=self.__names[row],
+                         copy=False)
+
+    def set(self, row, series):
+        self.clear(row)
+        if series is None:
+            return
+        length = len(series)
+        self.__reserve(length)
+        start = self.__used
+        self.__values[start:start + length] = series.to_numpy(dtype=np.float64)
+        self.__offsets[row], self.__lengths[row] = start, length
+        self.__indexes[row], self.__names[row] = self.__calendars.intern(series.index), series.name
+        self.__used += length
+
+    def indexes(self):
+        return [index for index in self.__indexes if index is not None]
+
+    def clear(self, row):
+        if self.__lengths[row] > 0:
+            self.__wasted += self.__lengths[row]
+        self.__lengths[row] = -1
+        self.__indexes[row] = self.__names[row] = None
+
+    def nbytes(self):
+        return (self.__values.nbytes + self.__offsets.nbytes + self.__lengths.nbytes + self.__indexes.nbytes
+                + self.__names.nbytes)
+
+
+class _CalendarPool:
+    # One shared DatetimeIndex per distinct calendar, looked up by its length and end points
+    def __init__(self):
+        self.__calendars = {}
+
+    def intern(self, index):
+        index = pd.DatetimeIndex(index)
+        if len(index) == 0:
+            return index
+        candidates = self.__calendars.setdefault((len(index), index[0], index[-1], str(index.tz)), [])
+        for calendar in candidates:
+            if calendar.equals(index):
+                return calendar
+        candidates.append(index)
+        return index
+
+    def prune(self, indexes_in_use):
+        # Drops the calendars no row refers to any more
+        in_use = {id(index) for index in indexes_in_use}
+        for key in list(self.__calendars):
+            self.__calendars[key] = [calendar for calendar in self.__calendars[key] if id(calendar) in in_use]
+            if not self.__calendars[key]:
+                del self.__calendars[key]
+
+    def nbytes(self):
+        return sum(calendar.nbytes for candidates in self.__calendars.values() for calendar in candidates)
+
+
+# Market data and metrics of every security in one place: scalar metrics in a (ticker x field) float array,
+# text fields in an object array and the price / returns series in ragged contiguous buffers, all indexed by
+# the ticker's row. Security is a view over one row.
+# Rows only hold what depends on the ticker alone, so portfolios sharing a store share one row per ticker (the
+# weights and share counts of a holding stay on its Security). A row is freed when its last Security releases it.
+# A field is unset (NaN / None, never computed) or set; setting it to None / NaN records it as computed-missing,
+# with the time, so that a failed fetch or calculation is not retried until its TTL has passed (is_missing) or
+# the field is unset again.
+class SecurityStore:
+    SCALAR_FIELDS = ("expense_ratio", "dividend_yield", "avg_dividend_yield", "trailing_dividend_yield",
+                     "geometric_mean_5y", "adjusted_geometric_mean_5y", "standard_deviation_5y",
+                     "downside_deviation_5y", "var_95", "sharpe_ratio")
+    TEXT_FIELDS = ("name", "category_name", "exchange_name", "traded_currency")
+    SERIES_FIELDS = ("close_prices", "historical_data", "adjusted_returns_in_series")
+    FIELDS = SCALAR_FIELDS + TEXT_FIELDS + SERIES_FIELDS
+    INITIAL_ROWS = 64
+    INITIAL_SERIES_CAPACITY = 16384  # Points per series buffer before the first growth
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def set_default(cls, store):
+        cls._default = store
+
+    def __init__(self, initial_rows=INITIAL_ROWS, initial_series_capacity=INITIAL_SERIES_CAPACITY):
+        self.__rows = {}
+        self.__references = {}
+        self.__tickers = np.empty(0, dtype=object)
+        self.__free_rows = []
+        self.__scalars = np.empty((0, len(SecurityStore.SCALAR_FIELDS)), dtype=np.float64)
+        self.__texts = np.empty((0, len(SecurityStore.TEXT_FIELDS)), dtype=object)
+        # When each field was found missing (monotonic clock), NaN while it is unset or has a value
+        self.__missing_since = np.empty((0, len(SecurityStore.FIELDS)), dtype=np.float64)
+        self.__calendars = _CalendarPool()
+        self.__series = {field: _RaggedSeriesBuffer(initial_series_capacity, self.__calendars)
+                         for field in SecurityStore.SERIES_FIELDS}
+        self.__scalar_columns = {field: column for column, field in enumerate(SecurityStore.SCALAR_FIELDS)}
+        self.__text_columns = {field: column for column, field in enumerate(SecurityStore.TEXT_FIELDS)}
+        self.__field_columns = {field: column for column, field in enumerate(SecurityStore.FIELDS)}
+        self.__resize_rows(initial_rows)
+
+    def __resize_rows(self, rows):
+        grown = rows - len(self.__tickers)
+        self.__tickers = np.concatenate([self.__tickers, np.empty(grown, dtype=object)])
+        self.__scalars = np.vstack([self.__scalars, np.full((grown, self.__scalars.shape[1]), np.nan)])
+        self.__texts = np.vstack([self.__texts, np.empty((grown, self.__texts.shape[1]), dtype=object)])
+        self.__missing_since = np.vstack([self.__missing_since,
+                                          np.full((grown, self.__missing_since.shape[1]), np.nan)])
+        for buffer in self.__series.values():
+            buffer.resize_rows(rows)
+        self.__free_rows.extend(range(rows - 1, rows - grown - 1, -1))
+
+    def add(self, ticker):
+        if ticker in self.__rows:
+            self.__references[ticker] += 1
+            return self.__rows[ticker]
+        if not self.__free_rows:
+            self.__resize_rows(max(2 * len(self.__tickers), 1))
+        row = self.__free_rows.pop()
+        self.__rows[ticker] = row
+        self.__references[ticker] = 1
+        self.__tickers[row] = ticker
+        return row
+
+    def remove(self, ticker):
+        if ticker not in self.__rows:
+            return
+        self.__references[ticker] -= 1
+        if self.__references[ticker] == 0:
+            row = self.__rows.pop(ticker)
+            del self.__references[ticker]
+            self.__clear_row(row)
+            self.__tickers[row] = None
+            self.__free_rows.append(row)
+
+    def __clear_row(self, row):
+        self.__scalars[row] = np.nan
+        self.__texts[row] = None
+        self.__missing_since[row] = np.nan
+        for buffer in self.__series.values():
+            buffer.clear(row)
+
+    def row(self, ticker):
+        return self.__rows[ticker]
+
+    def __contains__(self, ticker):
+        return ticker in self.__rows
+
+    def __len__(self):
+        return len(self.__rows)
+
+    @property
+    def tickers(self):
+        return list(self.__rows)
+
+    def get(self, row, field):
+        if field in self.__scalar_columns:
+            value = self.__scalars[row, self.__scalar_columns[field]]
+            return None if np.isnan(value) else float(value)
+        if field in self.__text_columns:
+            return self.__texts[row, self.__text_columns[field]]
+        return self.__series[field].get(row)
+
+    def set(self, row, field, value):
+        if field in self.__scalar_columns:
+            column = self.__scalar_columns[field]
+            self.__scalars[row, column] = np.nan if value is None else value
+            missing = np.isnan(self.__scalars[row, column])
+        elif field in self.__text_columns:
+            self.__texts[row, self.__text_columns[field]] = value
+            missing = value is None
+        else:
+            self.__series[field].set(row, value)
+            missing = value is None
+        self.__missing_since[row, self.__field_columns[field]] = time.monotonic() if missing else np.nan
+
+    def unset(self, row, field):
+        # Back to never computed: the next access computes the field again
+        self.set(row, field, None)
+        self.__missing_since[row, self.__field_columns[field]] = np.nan
+
+    def is_missing(self, row, field, ttl=None):
+        # Computed as missing less than ttl seconds ago (ttl = None -> Until unset)
+        missing_since = self.__missing_since[row, self.__field_columns[field]]
+        if np.isnan(missing_since):
+            return False
+        return ttl is None or time.monotonic() - missing_since < ttl
+
+    def scalar_frame(self, fields=SCALAR_FIELDS):
+        # Scalar metrics of all tickers at once, e.g. for vectorised reports
+        rows = list(self.__rows.values())
+        columns = [self.__scalar_columns[field] for field in fields]
+        return pd.DataFrame(self.__scalars[np.ix_(rows, columns)], index=list(self.__rows), columns=list(fields))
+
+    def compact(self):
+        # Trims the series buffers to their live data, e.g. after loading a whole portfolio
+        for buffer in self.__series.values():
+            buffer.compact()
+        self.__calendars.prune([index for buffer in self.__series.values() for index in buffer.indexes()])
+
+    def nbytes(self):
+        return (self.__tickers.nbytes + self.__scalars.nbytes + self.__texts.nbytes + self.__missing_since.nbytes
+                + sum(buffer.nbytes() for buffer in self.__series.values()) + self.__calendars.nbytes())
@@ -1,22 +1,48 @@
+import numpy as np
 import pandas as pd
 
 from src.categories.sub_categories.securities.security import Security
 from src.fill_nan_dataframe_knn import fill_nan_dataframe_knn
+from src.memo import Memo
 
 
 class SubCategory:
     def __init__(self, name):
         self.name = name
         self.securities = []
-        self.__aggregated_returns = None
+        self.parent = None
+        self.__memo = Memo()
         self.__sub_category_weight = None
 
     def add_security(self, security):
         if isinstance(security, Security):
             self.securities.append(security)
+            security.parent = self
+            self.invalidate()
         else:
             raise TypeError("Only Security instances can be added")
 
+    def find_security(self, ticker):
+        return next((security for security in self.securities if security.ticker == ticker), None)
+
+    def remove_security(self, ticker):
+        security = self.find_security(ticker)
+        if security is not None:
+            self.securities.remove(security)
+            security.parent = None
+            self.invalidate()
+        return security
+
+    def invalidate(self):
+        # Mark the aggregated returns dirty and propagate to the owning category
+        self.__memo.invalidate("aggregated_returns")
+        if self.parent is not None:
+            self.parent.invalidate()
+
+    @property
+    def is_dirty(self):
+        return not self.__memo.is_set("aggregated_returns")
+
     def calculate_asset_weights(self):
         total_inverse_risk = sum(
             1 / security.standard_deviation_5y for security in self.securities if security.standard_deviation_5y > 0)
@@ -35,8 +61,9 @@ class SubCategory:
         returns_df = pd.DataFrame()
 
         for security in self.securities:
-            if security.adjusted_returns_in_series_5y is not None:
-                returns_df[security.ticker] = security.adjusted_returns_in_series_5y
+            adjusted_returns = security.adjusted_returns_in_series()
+            if adjusted_returns is not None:
+                returns_df[security.ticker] = adjusted_returns
 
         filled_dataframe = fill_nan_dataframe_knn(returns_df)
 
@@ -49,24 +76,24 @@ class SubCategory:
     def calculate_aggregated_returns(self):
         filled_returns_df = self.create_returns_dataframe()
 
-        # Initialize an empty Series to store aggregated returns
-        aggregated_returns = pd.Series(index=filled_returns_df.index, dtype=float)
-
-        for security in self.securities:
-            if security.ticker in filled_returns_df.columns:
-                # Multiply the returns by the security's sub-asset weight
-                weighted_returns = filled_returns_df[security.ticker] * security.sub_asset_weight
-                # Sum the weighted returns to the aggregated returns
-                aggregated_returns = aggregated_returns.add(weighted_returns, fill_value=0)
+        # One matrix-vector product instead of accumulating a new Series per security
+        securities = [security for security in self.securities if security.ticker in filled_returns_df.columns]
+        weights = np.array([security.sub_asset_weight for security in securities], dtype=float)
+        aggregated_returns = pd.Series(
+            filled_returns_df[[security.ticker for security in securities]].to_numpy(dtype=float) @ weights,
+            index=filled_returns_df.index)
 
         # Return the aggregated returns as a DataFrame with the sub-category name as the column name
         return pd.DataFrame({self.name: aggregated_returns})
 
     @property
     def aggregated_returns(self):
-        if self.__aggregated_returns is None:
-            self.__aggregated_returns = self.calculate_aggregated_returns()
-        return self.__aggregated_returns
+        return self.__memo.get("aggregated_returns", self.calculate_aggregated_returns)
+
+    @aggregated_returns.setter
+    def aggregated_returns(self, aggregated_returns):
+        # Set in bulk by AllCategory.aggregate_sub_category_returns
+        self.__memo.set("aggregated_returns", aggregated_returns)
 
     @property
     def sub_category_weight(self):
@@ -76,4 +103,8 @@ class SubCategory:
     def sub_category_weight(self, weight):
         if weight < 0 or weight > 1:
             raise ValueError("Sub-category weight must be between 0 and 1")
-        self.__sub_category_weight = weight
\ No newline at end of file
+        if weight != self.__sub_category_weight:
+            self.__sub_category_weight = weight
+            # Only the category's aggregated returns depend on this weight, not its optimization inputs
+            if self.parent is not None:
+                self.parent.invalidate_aggregated_returns()
\ No newline at end of file
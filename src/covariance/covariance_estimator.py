@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+
+# NumPy versions of the pypfopt risk models used by the optimizers, working directly on a (days x assets) returns
+# array. Each estimator returns a daily (not annualised) covariance; estimate() annualises and labels the result.
+# block_size = None -> One BLAS call per product; block_size = n -> Products are built n assets at a time, which
+# bounds the temporaries for very wide panels (e.g. the flattened security-level universe)
+class CovarianceEstimator:
+    FREQUENCY = 252
+    METHODS = ("sample_cov", "ledoit_wolf", "oracle_approximating", "exp_cov")
+
+    def __init__(self, method="oracle_approximating", frequency=FREQUENCY, span=180, block_size=None):
+        if method not in CovarianceEstimator.METHODS:
+            raise ValueError(f"Unknown covariance method '{method}'. Expected one of {', '.join(self.METHODS)}.")
+        self.method = method
+        self.frequency = frequency
+        self.span = span
+        self.block_size = block_size
+
+    @staticmethod
+    def __blocks(n_features, block_size):
+        block_size = block_size or n_features
+        return [slice(start, min(start + block_size, n_features)) for start in range(0, n_features, block_size)]
+
+    @staticmethod
+    def empirical_covariance(returns, block_size=None, ddof=0):
+        centered = returns - returns.mean(axis=0)
+        n_features = centered.shape[1]
+        covariance = np.empty((n_features, n_features))
+        for block in CovarianceEstimator.__blocks(n_features, block_size):
+            covariance[block] = centered[:, block].T @ centered
+        covariance /= len(returns) - ddof
+        return covariance
+
+    @staticmethod
+    def sample_covariance(returns, block_size=None):
+        # Unbiased, like DataFrame.cov()
+        return CovarianceEstimator.empirical_covariance(returns, block_size, ddof=1)
+
+    @staticmethod
+    def oracle_approximating(empirical_covariance, n_samples):
+        # Same estimator as sklearn.covariance.oas, but from a precomputed empirical covariance so it can be fed
+        # with covariances of linear combinations and with rolling moments
+        n_features = len(empirical_covariance)
+        if n_features == 1:
+            return empirical_covariance.copy()
+        alpha = np.mean(empirical_covariance ** 2)
+        mu = np.trace(empirical_covariance) / n_features
+        mu_squared = mu ** 2
+        num = alpha + mu_squared
+        den = (n_samples + 1) * (alpha - mu_squared / n_features)
+        shrinkage = 1.0 if den == 0 else min(num / den, 1.0)
+        shrunk_covariance = (1.0 - shrinkage) * empirical_covariance
+        shrunk_covariance.flat[::n_features + 1] += shrinkage * mu
+        return shrunk_covariance
+
+    @staticmethod
+    def ledoit_wolf(returns, block_size=None):
+        # Same estimator as sklearn.covariance.ledoit_wolf (constant variance target)
+        n_samples, n_features = returns.shape
+        centered = returns - returns.mean(axis=0)
+        empirical_covariance = CovarianceEstimator.empirical_covariance(centered, block_size)
+        if n_features == 1:
+            return empirical_covariance
+
+        squared = centered ** 2
+        variances = squared.sum(axis=0) / n_samples
+        mu = variances.sum() / n_features
+        # sum(X2.T @ X2) == sum over days of (sum over assets of X2) ** 2, without the (assets x assets) product
+        beta_ = np.sum(squared.sum(axis=1) ** 2)
+        delta_ = np.sum(empirical_covariance ** 2)
+        beta = (beta_ / n_samples - delta_) / (n_features * n_samples)
+        delta = (delta_ - 2.0 * mu * variances.sum() + n_features * mu ** 2) / n_features
+        beta = min(beta, delta)
+        shrinkage = 0.0 if beta == 0 else beta / delta
+
+        shrunk_covariance = (1.0 - shrinkage) * empirical_covariance
+        shrunk_covariance.flat[::n_features + 1] += shrinkage * mu
+        return shrunk_covariance
+
+    @staticmethod
+    def exponential_covariance(returns, span=180, block_size=None):
+        # Same as pypfopt.risk_models.exp_cov: the covariations around the plain mean, averaged with the
+        # DataFrame.ewm(span).mean() weights and read at the last day
+        n_samples = len(returns)
+        decay = 1.0 - 2.0 / (span + 1.0)
+        weights = decay ** np.arange(n_samples - 1, -1, -1)
+        centered = returns - returns.mean(axis=0)
+        weighted = centered * (weights / weights.sum())[:, np.newaxis]
+        n_features = centered.shape[1]
+        covariance = np.empty((n_features, n_features))
+        for block in CovarianceEstimator.__blocks(n_features, block_size):
+            covariance[block] = weighted[:, block].T @ centered
+        return covariance
+
+    @staticmethod
+    def cov_to_corr(covariance):
+        standard_deviations = np.sqrt(np.diag(covariance))
+        return covariance / np.outer(standard_deviations, standard_deviations)
+
+    def daily_covariance(self, returns):
+        if self.method == "sample_cov":
+            return self.sample_covariance(returns, self.block_size)
+        if self.method == "ledoit_wolf":
+            return self.ledoit_wolf(returns, self.block_size)
+        if self.method == "oracle_approximating":
+            return self.oracle_approximating(self.empirical_covariance(returns, self.block_size), len(returns))
+        return self.exponential_covariance(returns, self.span, self.block_size)
+
+    # returns_df: (days x assets) DataFrame without NaN -> annualised covariance and correlation DataFrames
+    def estimate(self, returns_df):
+        covariance = self.daily_covariance(returns_df.to_numpy(dtype=float)) * self.frequency
+        correlation = self.cov_to_corr(covariance)
+        columns = returns_df.columns
+        return (pd.DataFrame(covariance, index=columns, columns=columns),
+                pd.DataFrame(correlation, index=columns, columns=columns))
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+
+# Validates the raw close-price panel (trading days x tickers) in one pass of column statistics, before the
+# KNN imputation and the optimizers see the data
+class DataQualityValidator:
+    NAN_THRESHOLD = 0.1  # Missing closes over the ticker's own history
+    DUPLICATED_THRESHOLD = 0.1  # Rows repeating an earlier row's date
+    STALE_RUN_THRESHOLD = 10  # Consecutive unchanged closes
+    JUMP_THRESHOLD = 0.25  # Absolute daily log return counted as an outlier jump
+
+    NAN_RATIO = "NaN Ratio"
+    DUPLICATED_RATIO = "Duplicated Date Ratio"
+    LONGEST_STALE_RUN = "Longest Stale Run"
+    OUTLIER_JUMPS = "Outlier Jumps"
+    MAX_JUMP = "Max Jump"
+    PASSED = "Passed"
+    ISSUES = "Issues"
+
+    def __init__(self, nan_threshold=NAN_THRESHOLD, duplicated_threshold=DUPLICATED_THRESHOLD,
+                 stale_run_threshold=STALE_RUN_THRESHOLD, jump_threshold=JUMP_THRESHOLD):
+        self.nan_threshold = nan_threshold
+        self.duplicated_threshold = duplicated_threshold
+        self.stale_run_threshold = stale_run_threshold
+        self.jump_threshold = jump_threshold
+
+    @staticmethod
+    def nan_ratios(prices):
+        # Only the span from each ticker's first close to the end of the panel counts, so a later listing is not
+        # missing data but a ticker that stopped trading is
+        in_span = np.maximum.accumulate(~np.isnan(prices), axis=0)
+        span_lengths = in_span.sum(axis=0)
+        missing = (np.isnan(prices) & in_span).sum(axis=0)
+        return np.divide(missing, span_lengths, out=np.ones(prices.shape[1]), where=span_lengths > 0)
+
+    @staticmethod
+    def duplicated_date_ratios(close_prices):
+        # Rows of each ticker's fetched closes whose date repeats an earlier row's, e.g. a day the feed returned
+        # twice. Repeated close values are not counted: a low-volatility fund quoted to the cent repeats them often
+        return pd.Series({ticker: float(series.index.duplicated().mean()) if len(series) else 0.0
+                          for ticker, series in close_prices.items()}, dtype=float)
+
+    def validate_series(self, close_prices):
+        # close_prices: {ticker: close Series}, possibly with repeated dates, of which the panel keeps the last
+        duplicated_date_ratios = self.duplicated_date_ratios(close_prices)
+        price_panel = pd.concat({ticker: series[~series.index.duplicated(keep='last')]
+                                 for ticker, series in close_prices.items()}, axis=1)
+        return self.validate(price_panel, duplicated_date_ratios)
+
+    @staticmethod
+    def longest_stale_runs(filled_prices):
+        # Length of the longest streak of unchanged closes: days since the last change, maximised per column
+        positions = np.arange(len(filled_prices))[:, np.newaxis]
+        changed = np.ones(filled_prices.shape, dtype=bool)
+        changed[1:] = ~(filled_prices[1:] == filled_prices[:-1])
+        last_change = np.maximum.accumulate(np.where(changed, positions, 0), axis=0)
+        return (positions - last_change).max(axis=0, initial=0)
+
+    # duplicated_date_ratios: by ticker, from validate_series; a panel has one row per date, so none by default
+    def validate(self, price_panel, duplicated_date_ratios=None):
+        prices = price_panel.to_numpy(dtype=float)
+        filled_prices = price_panel.ffill().to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_returns = np.abs(np.diff(np.log(filled_prices), axis=0))
+        log_returns = np.where(np.isfinite(log_returns), log_returns, 0.0)
+
+        report = pd.DataFrame({
+            DataQualityValidator.NAN_RATIO: self.nan_ratios(prices),
+            DataQualityValidator.DUPLICATED_RATIO: 0.0 if duplicated_date_ratios is None
+            else duplicated_date_ratios.reindex(price_panel.columns).fillna(0.0).to_numpy(),
+            DataQualityValidator.LONGEST_STALE_RUN: self.longest_stale_runs(filled_prices),
+            DataQualityValidator.OUTLIER_JUMPS: (log_returns > self.jump_threshold).sum(axis=0),
+            DataQualityValidator.MAX_JUMP: log_returns.max(axis=0, initial=0.0),
+        }, index=price_panel.columns)
+
+        failures = pd.DataFrame({
+            "too many NaN values": report[DataQualityValidator.NAN_RATIO] > self.nan_threshold,
+            "too many duplicated dates": report[DataQualityValidator.DUPLICATED_RATIO] > self.duplicated_threshold,
+            "stale prices": report[DataQualityValidator.LONGEST_STALE_RUN] > self.stale_run_threshold,
+            "outlier jumps": report[DataQualityValidator.OUTLIER_JUMPS] > 0,
+        })
+        report[DataQualityValidator.PASSED] = ~failures.any(axis=1)
+        report[DataQualityValidator.ISSUES] = [", ".join(failures.columns[row]) for row in failures.to_numpy()]
+        return report
+
+    @staticmethod
+    def failed_tickers(report):
+        return report.index[~report[DataQualityValidator.PASSED]].tolist()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from src.global_settings import TOTAL_PORTFOLIO_VALUE, DISCRETE_ALLOCATION_INTEGER_PROGRAM
+
+
+# Whole shares for the final portfolio weights, all securities at once.
+# Tracking error is measured as the sum of absolute deviations from the target values plus the leftover cash.
+# Rounding a security below floor(target / price) or buying it above floor + 1 never lowers that error, so the
+# whole problem is which securities get their extra share: a 0/1 knapsack (gain = value still missing, cost =
+# price) over the cash left after flooring. A vectorised greedy pass solves it by gain per unit of cash, then an
+# optional small integer program over the same 0/1 choices solves it exactly.
+class DiscreteAllocator:
+    TIME_LIMIT_SECONDS = 10
+
+    def __init__(self, total_portfolio_value=TOTAL_PORTFOLIO_VALUE,
+                 use_integer_program=DISCRETE_ALLOCATION_INTEGER_PROGRAM, time_limit=TIME_LIMIT_SECONDS):
+        self.total_portfolio_value = total_portfolio_value
+        self.use_integer_program = use_integer_program
+        self.time_limit = time_limit
+
+    @staticmethod
+    def greedy_round_up(deficits, prices, cash):
+        # Buys one extra share of the securities with the largest missing value per unit of price while the cash
+        # lasts. Each round takes the longest affordable prefix of the remaining candidates at once.
+        round_up = np.zeros(len(prices), dtype=bool)
+        order = np.argsort(-(deficits / prices), kind='stable')
+        order = order[deficits[order] > 0]
+        while len(order):
+            order = order[prices[order] <= cash]
+            if not len(order):
+                break
+            affordable = np.cumsum(prices[order]) <= cash
+            bought = order[affordable]
+            round_up[bought] = True
+            cash -= prices[bought].sum()
+            order = order[~affordable]
+        return round_up
+
+    def integer_program_round_up(self, deficits, prices, cash, round_up):
+        # Exact 0/1 knapsack over the securities that can still take a share; keeps the greedy answer if the
+        # solver stops without a better one
+        candidates = np.flatnonzero((deficits > 0) & (prices <= cash))
+        if len(candidates) < 2:
+            return round_up
+        result = milp(c=-deficits[candidates],
+                      constraints=LinearConstraint(prices[candidates][np.newaxis, :], -np.inf, cash),
+                      integrality=np.ones(len(candidates)), bounds=Bounds(0, 1),
+                      options={"time_limit": self.time_limit})
+        if result.x is None:
+            return round_up
+        solution = np.zeros(len(prices), dtype=bool)
+        solution[candidates] = np.round(result.x).astype(bool)
+        if prices[solution].sum() > cash or deficits[solution].sum() <= deficits[round_up].sum():
+            return round_up
+        return solution
+
+    def allocate(self, weights, last_prices):
+        # weights, last_prices: Series by ticker. Returns the shares (int Series by ticker) and the leftover cash.
+        last_prices = last_prices.reindex(weights.index)
+        if last_prices.isna().any() or (last_prices <= 0).any():
+            raise ValueError(f"Missing or invalid last prices for {last_prices.index[~(last_prices > 0)].tolist()}")
+
+        prices = last_prices.to_numpy(dtype=float)
+        weights_array = weights.to_numpy(dtype=float)
+        # Rounded final weights can add up to slightly more than 1, which would overspend the portfolio value
+        weights_array = weights_array / max(weights_array.sum(), 1.0)
+        target_values = weights_array * self.total_portfolio_value
+        shares = np.floor(target_values / prices)
+        cash = self.total_portfolio_value - shares @ prices
+        deficits = target_values - shares * prices
+
+        round_up = self.greedy_round_up(deficits, prices, cash)
+        if self.use_integer_program:
+            round_up = self.integer_program_round_up(deficits, prices, cash, round_up)
+        shares += round_up
+        return pd.Series(shares.astype(np.int64), index=weights.index), float(cash - prices[round_up].sum())
+
+    @staticmethod
+    def tracking_error(weights, last_prices, shares, total_portfolio_value=TOTAL_PORTFOLIO_VALUE):
+        # The objective above, as a fraction of the portfolio value: absolute deviations from the target values
+        # plus the leftover cash
+        values = shares * last_prices.reindex(shares.index)
+        deviations = (weights * total_portfolio_value - values).abs().sum()
+        return float((deviations + total_portfolio_value - values.sum()) / total_portfolio_value)
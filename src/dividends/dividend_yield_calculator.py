@@ -0,0 +1,72 @@
+import pandas as pd
+
+from src.market_data.market_data_source import MarketDataSource
+from src.resample_rules import YEAR_END_RULE
+
+
+# Average and trailing dividend yields for a whole universe at once: the dividend histories are fetched in batches
+# (archived per ticker by MarketDataSource) and the yields come from one grouped computation on the price panel
+class DividendYieldCalculator:
+    TRAILING_PERIOD = pd.Timedelta(days=365)
+    AVERAGE_DIVIDEND_YIELD = "Average Dividend Yield"
+    TRAILING_DIVIDEND_YIELD = "Trailing Dividend Yield"
+
+    def __init__(self, market_data_source=None):
+        self.market_data_source = market_data_source or MarketDataSource.get_default()
+
+    def fetch_dividends(self, start_dates):
+        # start_dates: {ticker: 'yyyy-mm-dd'}, one batched request per distinct start date
+        # -> long DataFrame with one row per (ticker, payment date)
+        tickers_by_start_date = {}
+        for ticker, start_date in start_dates.items():
+            tickers_by_start_date.setdefault(start_date, []).append(ticker)
+
+        frames = []
+        for start_date, tickers in tickers_by_start_date.items():
+            for ticker, history in self.market_data_source.dividend_histories(tickers, start_date).items():
+                if not isinstance(history, pd.DataFrame) or history.empty:
+                    continue
+                history = history.reset_index()
+                frames.append(pd.DataFrame({"ticker": ticker,
+                                            "date": pd.to_datetime(history["date"]),
+                                            "dividends": history["dividends"].to_numpy(dtype=float)}))
+        if not frames:
+            return pd.DataFrame({"ticker": pd.Series(dtype=object), "date": pd.Series(dtype="datetime64[ns]"),
+                                 "dividends": pd.Series(dtype=float)})
+        return pd.concat(frames, ignore_index=True)
+
+    # price_panel: daily close prices (dates x tickers), NaN outside each ticker's history
+    def calculate(self, price_panel):
+        tickers = price_panel.columns
+        start_dates = {ticker: price_panel[ticker].first_valid_index().strftime('%Y-%m-%d') for ticker in tickers}
+        dividends = self.fetch_dividends(start_dates)
+
+        # Average yield: total dividends of each calendar year over that year's last price, averaged over the
+        # years with both dividends and a price
+        yearly_prices = price_panel.resample(YEAR_END_RULE).last()
+        yearly_prices.index = yearly_prices.index.year
+        yearly_dividends = (dividends.groupby([dividends["date"].dt.year, "ticker"])["dividends"].sum()
+                            .unstack("ticker").reindex(columns=tickers))
+        yearly_dividend_yields = yearly_dividends / yearly_prices.reindex(yearly_dividends.index)
+        average_dividend_yields = yearly_dividend_yields.mean(axis=0)
+
+        # Trailing yield: dividends paid in the year before each ticker's last price, over that price
+        last_dates = price_panel.apply(pd.Series.last_valid_index)
+        last_prices = price_panel.ffill().iloc[-1]
+        recent = dividends["date"] > dividends["ticker"].map(last_dates) - DividendYieldCalculator.TRAILING_PERIOD
+        trailing_dividends = dividends[recent].groupby("ticker")["dividends"].sum().reindex(tickers, fill_value=0.0)
+        trailing_dividend_yields = trailing_dividends / last_prices
+
+        # Securities that never paid a dividend yield 0, like an empty dividend history did before
+        paid_dividends = tickers.isin(dividends["ticker"].unique())
+        average_dividend_yields[~paid_dividends] = 0.0
+
+        return pd.DataFrame({
+            DividendYieldCalculator.AVERAGE_DIVIDEND_YIELD: average_dividend_yields,
+            DividendYieldCalculator.TRAILING_DIVIDEND_YIELD: trailing_dividend_yields,
+        }).round(5)
+
+    def calculate_for_securities(self, securities):
+        # Over the optimization window, like the returns the yields are added to
+        price_panel = pd.concat({security.ticker: security.historical_data_window() for security in securities}, axis=1)
+        return self.calculate(price_panel)
@@ -1,5 +1,8 @@
+import logging
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 
 class ExcelReader:
     def __init__(self, file_path, all_category):
@@ -15,7 +18,7 @@ class ExcelReader:
             df = df.dropna(subset=['Ticker'])
 
             if df.empty:
-                print(f"Warning: Sheet '{sheet_name}' is empty or does not have the expected format.")
+                logger.warning("Sheet '%s' is empty or does not have the expected format.", sheet_name)
                 continue
 
             securities = df.apply(
@@ -1,9 +1,32 @@
+import logging
 import pandas as pd
 
+from src.snapshots.snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+# Writes a portfolio's holdings back to its workbook, either from the live AllCategory or from a run stored in a
+# SnapshotStore (run_id, by default the workbook's latest run), which needs no market data or recomputation.
 class ExcelWriter:
-    def __init__(self, file_path, all_category):
+    def __init__(self, file_path, all_category=None, snapshot_store=None, run_id=None):
         self.file_path = file_path
         self.all_category = all_category
+        self.snapshot_store = snapshot_store
+        self.run_id = run_id
+
+    def security_records(self):
+        if self.all_category is not None:
+            return SnapshotStore.security_records(self.all_category)
+        run_id = self.run_id if self.run_id is not None else self.snapshot_store.latest_run_id(workbook=self.file_path)
+        records = self.snapshot_store.securities(run_id).to_dict("records")
+        for record in records:
+            record["number_of_shares"] = None if pd.isna(record["number_of_shares"]) \
+                else int(record["number_of_shares"])
+        return records
+
+    @staticmethod
+    def __scaled(value, factor, digits):
+        return None if value is None or pd.isna(value) else round(value * factor, digits)
 
     def update_excel(self):
         try:
@@ -12,35 +35,30 @@ class ExcelWriter:
                 existing_data = {sheet_name: pd.read_excel(xls, sheet_name) for sheet_name in xls.sheet_names}
 
             # Update data
-            updated_data = {}
-            for category in self.all_category.categories:
-                securities_data = []
-                for subcategory in category.subcategories:
-                    for security in subcategory.securities:
-                        securities_data.append({
-                            'Ticker': security.ticker,
-                            'Sub Category': security.sub_category,
-                            'Sub Category Asset Weight': round(security.sub_asset_weight * 100, 2),
-                            'Name': security.name,
-                            'Category Name': security.category_name,
-                            'Exchange Name': security.exchange_name,
-                            'Traded Currency': security.traded_currency,
-                            'Expense Ratio': round(security.expense_ratio * 100, 4),
-                            'Dividend Yield': round(security.dividend_yield * 100, 2),
-                            'Average Dividend Yield': round(security.avg_dividend_yield * 100, 2),
-                            'Simple Return': round(security.geometric_mean_5y * 100, 2),
-                            'Total Return': round(security.adjusted_geometric_mean_5y * 100, 2),
-                            'Standard Deviation': round(security.standard_deviation_5y * 100, 2),
-                            'Downside Deviation': round(security.downside_deviation_5y * 100, 2),
-                            'Value at Risk 95%': round(security.var_95 * 100, 2),
-                            'Sharpe Ratio': security.sharpe_ratio,
-                            'Portfolio Asset Weight': round(security.portfolio_asset_weight * 100, 2),
-                            'Portfolio Asset Allocation': round(security.portfolio_asset_allocation, 2),
-                            'Number of Shares': security.number_of_shares,
-                        })
-
-                if securities_data:
-                    updated_data[category.name] = pd.DataFrame(securities_data)
+            securities_data = {}
+            for record in self.security_records():
+                securities_data.setdefault(record["category"], []).append({
+                    'Ticker': record["ticker"],
+                    'Sub Category': record["sub_category"],
+                    'Sub Category Asset Weight': self.__scaled(record["sub_asset_weight"], 100, 2),
+                    'Name': record["name"],
+                    'Category Name': record["category_name"],
+                    'Exchange Name': record["exchange_name"],
+                    'Traded Currency': record["traded_currency"],
+                    'Expense Ratio': self.__scaled(record["expense_ratio"], 100, 4),
+                    'Dividend Yield': self.__scaled(record["dividend_yield"], 100, 2),
+                    'Average Dividend Yield': self.__scaled(record["avg_dividend_yield"], 100, 2),
+                    'Simple Return': self.__scaled(record["geometric_mean_5y"], 100, 2),
+                    'Total Return': self.__scaled(record["adjusted_geometric_mean_5y"], 100, 2),
+                    'Standard Deviation': self.__scaled(record["standard_deviation_5y"], 100, 2),
+                    'Downside Deviation': self.__scaled(record["downside_deviation_5y"], 100, 2),
+                    'Value at Risk 95%': self.__scaled(record["var_95"], 100, 2),
+                    'Sharpe Ratio': record["sharpe_ratio"],
+                    'Portfolio Asset Weight': self.__scaled(record["portfolio_asset_weight"], 100, 2),
+                    'Portfolio Asset Allocation': self.__scaled(record["portfolio_asset_allocation"], 1, 2),
+                    'Number of Shares': record["number_of_shares"],
+                })
+            updated_data = {category_name: pd.DataFrame(rows) for category_name, rows in securities_data.items()}
 
             # Write updated data to file
             with pd.ExcelWriter(self.file_path, engine='openpyxl') as writer:
@@ -53,4 +71,4 @@ class ExcelWriter:
                         df.to_excel(writer, sheet_name=sheet_name, index=False)
 
         except Exception as e:
-            print(f"An error occurred: {e}")
+            logger.error("An error occurred: %s", e)
@@ -20,6 +20,148 @@ CATEGORY_CONSTRAINTS = {
 # RISK_FREE_RATE = None -> Automatically fetch T-Bill 3 Month rate
 RISK_FREE_RATE = 0.02
 
+# With RISK_FREE_RATE = None, the daily T-Bill 3 Month series is stored here and only the missing days are fetched
+RISK_FREE_RATE_SERIES_PATH = "risk_free_rate_series.pkl"
+
+# TIME_VARYING_RISK_FREE_RATE = True (with RISK_FREE_RATE = None) -> Optimizers, Sharpe ratios and downside
+# deviations use returns in excess of the daily T-Bill series instead of its latest value
+TIME_VARYING_RISK_FREE_RATE = False
+
 TOTAL_PORTFOLIO_VALUE = 10000
 
-DIVIDEND_TYPE = "avg"  # "avg" or "simple"
\ No newline at end of file
+# Whole shares are allocated by a greedy pass; True -> Refine it with a small integer program (scipy milp)
+DISCRETE_ALLOCATION_INTEGER_PROGRAM = True
+
+DIVIDEND_TYPE = "avg"  # "avg" or "simple"
+
+# Prices are fetched once per ticker with this yahooquery period; metrics and optimizers work on trailing windows
+# of it ("6mo", "1y", "3y", "5y", "10y", "max"), so other horizons need no further fetch
+HISTORY_PERIOD = "max"
+
+# Window of the optimization returns panels and of the data quality checks
+DEFAULT_LOOKBACK = "5y"
+
+# Horizons of AllCategory.horizon_metrics / horizon_weights
+ANALYTICS_LOOKBACKS = ("1y", "3y", "5y", "10y")
+
+# MARKET_DATA_MODE = "live" -> Fetch every response from yahooquery / forex_python
+# MARKET_DATA_MODE = "record" -> Fetch live and save every raw response to MARKET_DATA_ARCHIVE_PATH
+# MARKET_DATA_MODE = "replay" -> Serve every response from MARKET_DATA_ARCHIVE_PATH without network access
+# MARKET_DATA_MODE = "cache" -> Serve archived responses from MARKET_DATA_ARCHIVE_PATH, fetch and archive the rest
+MARKET_DATA_MODE = "live"
+
+MARKET_DATA_ARCHIVE_PATH = "market_data_archive"
+
+# Close-price checks run once on the whole panel before imputation (NaN ratio, duplicates, stale runs, jumps)
+# DATA_QUALITY_ACTION = "flag" -> Print the failing tickers; "exclude" -> Also remove them; None -> Skip the checks
+DATA_QUALITY_ACTION = "flag"
+
+# Optimizer engine per hierarchy level: "mean_variance", "resampled_mean_variance", "mean_semivariance", "hrp",
+# "nco", "riskfolio_mean_risk" or "riskfolio_hrp"
+TOP_LEVEL_OPTIMIZER = "mean_variance"
+
+DEFAULT_CATEGORY_OPTIMIZER = "mean_variance"
+
+# Overrides DEFAULT_CATEGORY_OPTIMIZER for individual categories, e.g. a cheap engine for a large category
+CATEGORY_OPTIMIZERS = {
+    # "Equity": "hrp",
+}
+
+# True -> Estimate the covariance of complete return panels with the NumPy estimators in src/covariance instead of
+# pypfopt (same results to ~1e-13, faster on wide panels); panels with missing values always go through pypfopt
+NATIVE_COVARIANCE_ESTIMATOR = False
+
+# SEMIVARIANCE_SCENARIO_REDUCTION = None -> Use every daily return as a scenario
+# "weekly" / "monthly" -> Aggregate the daily returns; "cluster" -> k-means representative scenarios
+SEMIVARIANCE_SCENARIO_REDUCTION = None
+
+# "resampled_mean_variance": max Sharpe averaged over RESAMPLED_FRONTIER_SAMPLES bootstrap resamples, seeded for
+# reproducibility, with RESAMPLED_FRONTIER_CONFIDENCE intervals. RESAMPLED_FRONTIER_MAX_WORKERS = None -> One
+# process per CPU
+RESAMPLED_FRONTIER_SAMPLES = 500
+
+RESAMPLED_FRONTIER_SEED = 42
+
+RESAMPLED_FRONTIER_MAX_WORKERS = None
+
+RESAMPLED_FRONTIER_CONFIDENCE = 0.9
+
+# Solve results are cached by a hash of their inputs, in memory and, when set, in this directory so that a re-run on
+# unchanged data skips the solves (e.g. "optimization_cache"). None -> Cache in memory only
+OPTIMIZATION_CACHE_PATH = None
+
+# Logging level of the run; QUIET_MODE = True -> Only errors, for batch runs
+LOG_LEVEL = "INFO"
+
+QUIET_MODE = False
+
+# Remote request, cache and failure counters are written here at the end of a run, e.g. "run_statistics.json"
+# (None -> Only logged)
+RUN_STATISTICS_PATH = None
+
+# Workbooks run as one batch by main.py instead of ETF.xlsx, e.g. ["client_a.xlsx", "client_b.xlsx"]; tickers they
+# share are fetched and computed once. BATCH_MAX_WORKERS = None -> One process per CPU
+BATCH_FILE_PATHS = None
+
+BATCH_MAX_WORKERS = None
+
+# Local allocation service (python -m src.service.allocation_service), bound to localhost only. Market data of the
+# tickers it has seen is refreshed in the background every SERVICE_REFRESH_INTERVAL_SECONDS
+SERVICE_HOST = "127.0.0.1"
+
+SERVICE_PORT = 8765
+
+SERVICE_REFRESH_INTERVAL_SECONDS = 6 * 60 * 60
+
+# Every run appends its metrics, weights and shares (and, with SNAPSHOT_STORE_RETURNS, the adjusted returns) to this
+# SQLite file (e.g. "snapshots.sqlite") as a new version, so past runs can be reported without recomputing them.
+# None -> Nothing is stored. SNAPSHOT_STORE_RETURNS = True stores every holding's daily returns too (about 1,800 rows
+# per ticker and run)
+SNAPSHOT_STORE_PATH = None
+
+SNAPSHOT_STORE_RETURNS = False
+
+# Charts are rendered headless to REPORT_OUTPUT_DIR by REPORT_MAX_WORKERS processes (None -> One per CPU), with at
+# most REPORT_TICKERS_PER_PAGE tickers per page and REPORT_MAX_POINTS points per line. REPORT_ENABLED = True ->
+# main.py renders the charts; batch runs (BATCH_FILE_PATHS) only render them with REPORT_IN_BATCH = True as well
+REPORT_ENABLED = False
+
+REPORT_IN_BATCH = False
+
+REPORT_OUTPUT_DIR = "reports"
+
+REPORT_MAX_WORKERS = None
+
+REPORT_MAX_POINTS = 2000
+
+REPORT_TICKERS_PER_PAGE = 12
+
+# Sub-categories of a category whose returns are all at least this correlated (e.g. ETFs tracking the same index)
+# are optimized as one composite and split back by inverse variance. None -> No screening (e.g. 0.98 to opt in;
+# src/benchmarks/correlation_screening_benchmark.py compares both)
+CORRELATION_SCREENING_THRESHOLD = None
+
+# Stress scenarios for the final allocation (src/scenario/stress_tester.py): historical windows replayed from the
+# returns history, and instant per-category returns. STRESS_TEST_ENABLED = True -> main.py also builds the
+# full-history panel and logs the stress report after the workbook is written
+STRESS_TEST_ENABLED = False
+
+HISTORICAL_STRESS_WINDOWS = {
+    "Global Financial Crisis": ("2007-10-09", "2009-03-09"),
+    "Euro Debt Crisis": ("2011-07-22", "2011-10-03"),
+    "Taper Tantrum": ("2013-05-22", "2013-06-24"),
+    "Q4 2018 Selloff": ("2018-09-20", "2018-12-24"),
+    "COVID Crash": ("2020-02-19", "2020-03-23"),
+    "2022 Rate Shock": ("2022-01-03", "2022-10-12"),
+}
+
+CATEGORY_SHOCK_SCENARIOS = {
+    "Equity Crash": {"Equity": -0.30, "Bond": 0.03, "Alternative": -0.10},
+    "Rate Spike": {"Equity": -0.10, "Bond": -0.12, "Alternative": -0.05},
+    "Stagflation": {"Equity": -0.20, "Bond": -0.08, "Alternative": 0.10},
+}
+
+# A market data fetch or metric calculation that failed is not retried for this many seconds (Security fields and
+# the lazily computed returns of sub-categories and categories). None -> Not retried until invalidated,
+# 0 -> Retried on every access
+MEMO_FAILURE_TTL_SECONDS = 3600
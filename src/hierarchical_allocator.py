@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from src.covariance.covariance_estimator import CovarianceEstimator
+from src.global_settings import TOP_LEVEL_OPTIMIZER, DEFAULT_CATEGORY_OPTIMIZER, CATEGORY_OPTIMIZERS
+from src.hierarchy_matrices import HierarchyMatrices
+from src.lookback_window import LookbackWindow
+from src.market_data.risk_free_rate_series import RiskFreeRateSeries
+from src.optimizer_engines.optimizer_engine import OptimizerEngine
+from src.optimizer_engines.optimizer_engine_registry import get_optimizer_engine
+from src.pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
+from src.screening.correlation_screener import CorrelationScreener
+
+
+# Runs the two-level Category.optimize -> AllCategory.optimize allocation directly on a security returns panel,
+# without building the Security/SubCategory/Category tree, so it can be repeated cheaply on many windows.
+# hierarchy = {
+#     "Equity": {"Traditional Equity": {"VTI": 0.6, "VXUS": 0.4}},
+#     "Bond": {"Traditional Bond": {"BND": 1.0}},
+# }
+class HierarchicalAllocator:
+    FREQUENCY = 252
+
+    def __init__(self, hierarchy, sub_category_constraints=None, category_constraints=None, risk_free_rate=0.02,
+                 top_level_optimizer=TOP_LEVEL_OPTIMIZER, category_optimizers=None,
+                 default_category_optimizer=DEFAULT_CATEGORY_OPTIMIZER, screener=None):
+        self.hierarchy = hierarchy
+        self.sub_category_constraints = sub_category_constraints or {}
+        self.category_constraints = category_constraints
+        self.risk_free_rate = risk_free_rate
+        self.top_level_optimizer = top_level_optimizer
+        self.category_optimizers = CATEGORY_OPTIMIZERS if category_optimizers is None else category_optimizers
+        self.default_category_optimizer = default_category_optimizer
+        self.screener = screener if screener is not None else CorrelationScreener.get_default()
+
+        # The fixed sub-category asset weights as a sparse (securities x sub-categories) mapping
+        hierarchy_matrices = HierarchyMatrices(hierarchy)
+        self.tickers = hierarchy_matrices.tickers
+        self.category_names = hierarchy_matrices.category_names
+        self.sub_category_names = hierarchy_matrices.sub_category_names
+        self.sub_category_index_by_category = hierarchy_matrices.sub_category_index_by_category
+        self.security_to_sub_category = hierarchy_matrices.security_to_sub_category
+
+    @classmethod
+    def from_all_category(cls, all_category, **kwargs):
+        return cls(all_category.get_hierarchy(), **kwargs)
+
+    @staticmethod
+    def restrict_hierarchy(hierarchy, available_tickers):
+        # The hierarchy without the tickers that have no returns, dropping the nodes left empty
+        restricted = {}
+        for category_name, subcategories in hierarchy.items():
+            subcategories = {subcategory_name: {ticker: weight for ticker, weight in securities.items()
+                                                if ticker in available_tickers}
+                             for subcategory_name, securities in subcategories.items()}
+            subcategories = {name: securities for name, securities in subcategories.items() if securities}
+            if subcategories:
+                restricted[category_name] = subcategories
+        return restricted
+
+    def __optimize_level(self, returns, empirical_covariance, names, constraints_dict, engine_name, index):
+        if len(names) == 1:
+            return np.ones(1), {}
+
+        if engine_name != "mean_variance":
+            engine = get_optimizer_engine(engine_name)
+            cleaned_weights, portfolio_metrics = engine.optimize(pd.DataFrame(returns, index=index, columns=names),
+                                                                 constraints_dict=constraints_dict,
+                                                                 risk_free_rate=self.risk_free_rate)
+            return np.array([cleaned_weights[name] for name in names]), portfolio_metrics
+
+        # Mean-variance fast path: the covariance comes from the (possibly rolling) moments instead of the panel
+        risk_free_rate = self.risk_free_rate
+        raw_returns = returns
+        if isinstance(risk_free_rate, pd.Series):
+            # As in OptimizerEngine.optimize: solve on the excess returns with a zero rate, then report the metrics of
+            # the raw returns against the window's average rate. Days before the rate series starts are left out.
+            if index is None:
+                raise ValueError("A risk-free rate series needs the returns index")
+            daily_rates = RiskFreeRateSeries.daily_rates(risk_free_rate, index).to_numpy()
+            covered = ~np.isnan(daily_rates)
+            raw_returns = returns[covered]
+            returns = raw_returns - daily_rates[covered, np.newaxis]
+            risk_free_rate = 0.0
+
+        expected_returns = pd.Series(self.__expected_returns(returns), index=names)
+        shrunk_covariance = CovarianceEstimator.oracle_approximating(empirical_covariance, len(returns))
+        covariance = pd.DataFrame(shrunk_covariance * HierarchicalAllocator.FREQUENCY, index=names, columns=names)
+
+        mvo = MeanVarianceOptimizer()
+        cleaned_weights, portfolio_metrics = mvo.optimize_max_sharpe_ratio(
+            expected_returns, covariance, risk_free_rate=risk_free_rate,
+            constraints_dict=OptimizerEngine.applicable_constraints(constraints_dict, names), verbose=False)
+        weights = np.array([cleaned_weights[name] for name in names])
+
+        if isinstance(self.risk_free_rate, pd.Series):
+            expected_annual_return = float(weights @ self.__expected_returns(raw_returns))
+            annual_volatility = portfolio_metrics["Annual Volatility"]
+            average_rate = RiskFreeRateSeries.average_rate(self.risk_free_rate, index[covered])
+            portfolio_metrics = {
+                "Expected Annual Return": expected_annual_return,
+                "Annual Volatility": annual_volatility,
+                "Sharp Ratio": ((expected_annual_return - average_rate) / annual_volatility
+                                if annual_volatility > 0 else 0.0)
+            }
+        return weights, portfolio_metrics
+
+    @staticmethod
+    def __expected_returns(returns):
+        # Annualised geometric mean of each column
+        return np.expm1(np.log1p(returns).sum(axis=0) * HierarchicalAllocator.FREQUENCY / len(returns))
+
+    # returns: (days x securities) array ordered like self.tickers, without NaN
+    # empirical_covariance: optional biased covariance of the same window, e.g. from rolling moments
+    # index: dates of the window, needed by engines that resample (e.g. weekly semivariance scenarios)
+    # lookback: trailing window of returns / index to allocate on (e.g. "3y"), sliced without copying
+    def allocate(self, returns, empirical_covariance=None, index=None, lookback=None):
+        if lookback is not None:
+            if index is None or empirical_covariance is not None:
+                raise ValueError("A lookback needs the returns index and no precomputed covariance")
+            start = LookbackWindow.start_position(index, lookback)
+            returns, index = returns[start:], index[start:]
+
+        if empirical_covariance is None:
+            empirical_covariance = CovarianceEstimator.empirical_covariance(returns)
+
+        # Covariances of weighted sums are exact linear maps of the security-level covariance
+        sub_category_returns = returns @ self.security_to_sub_category
+        sub_category_covariance = (self.security_to_sub_category.T @ empirical_covariance
+                                   @ self.security_to_sub_category)
+
+        sub_category_to_category = np.zeros((len(self.sub_category_names), len(self.category_names)))
+        sub_category_weights = {}
+        for column, category_name in enumerate(self.category_names):
+            columns = self.sub_category_index_by_category[category_name]
+            names = [self.sub_category_names[i] for i in columns]
+            constraints_dict = self.sub_category_constraints.get(category_name)
+            engine_name = self.category_optimizers.get(category_name, self.default_category_optimizer)
+            covariance = sub_category_covariance[np.ix_(columns, columns)]
+            # Near-duplicate sub-categories are optimized as one composite and split back down afterwards
+            screen = self.screener.screen(covariance, names, constraints_dict)
+            if screen.is_reduced:
+                weights, _ = self.__optimize_level(screen.composite_returns(sub_category_returns[:, columns]),
+                                                   screen.composite_covariance(covariance), screen.composite_names,
+                                                   screen.composite_constraints(constraints_dict), engine_name, index)
+                weights = screen.expand(weights)
+            else:
+                weights, _ = self.__optimize_level(sub_category_returns[:, columns], covariance, names,
+                                                   constraints_dict, engine_name, index)
+            sub_category_to_category[columns, column] = weights
+            sub_category_weights[category_name] = dict(zip(names, weights.tolist()))
+
+        category_returns = sub_category_returns @ sub_category_to_category
+        category_covariance = sub_category_to_category.T @ sub_category_covariance @ sub_category_to_category
+        category_weights, portfolio_metrics = self.__optimize_level(category_returns, category_covariance,
+                                                                    self.category_names, self.category_constraints,
+                                                                    self.top_level_optimizer, index)
+
+        security_weights = self.security_to_sub_category @ (sub_category_to_category @ category_weights)
+        return {
+            "security_weights": security_weights,
+            "sub_category_weights": sub_category_weights,
+            "category_weights": dict(zip(self.category_names, category_weights.tolist())),
+            "portfolio_metrics": portfolio_metrics,
+        }
@@ -0,0 +1,168 @@
+import numpy as np
+from scipy.cluster.hierarchy import linkage, leaves_list, fcluster
+from scipy.spatial.distance import squareform
+
+from src.pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
+
+
+class HierarchicalClusteringOptimizer:
+    HRP = "HRP"
+    NCO = "NCO"
+    WEIGHT_CUTOFF = 1e-4
+
+    def __init__(self, linkage_method='single', n_clusters=None):
+        self.linkage_method = linkage_method
+        self.n_clusters = n_clusters
+        # (assets, linkage method) -> (distance matrix, linkage matrix, quasi-diagonal order)
+        self.__cluster_cache = {}
+
+    def clear_cache(self):
+        self.__cluster_cache = {}
+
+    # constraints = {
+    #     "Equity_max": 0.60,
+    #     "Bond_min": 0.10
+    # }
+    def optimize(self, returns_df, risk_free_rate=0.02, constraints_dict=None, model=HRP, recluster=False):
+        mvo = MeanVarianceOptimizer()
+        expected_returns = mvo.mean_historical_returns_by_returns(returns_df)
+        covariance, correlation = mvo.covariance_correlation_matrix_by_returns(returns_df)
+
+        assets = covariance.columns
+        distance, linkage_matrix, order = self.cluster(correlation, recluster=recluster)
+
+        if model == HierarchicalClusteringOptimizer.HRP:
+            weights = self.__recursive_bisection(covariance.to_numpy(), order)
+        elif model == HierarchicalClusteringOptimizer.NCO:
+            weights = self.__nested_clustered_weights(covariance.to_numpy(), linkage_matrix)
+        else:
+            raise ValueError(f"Unknown hierarchical model '{model}'. Expected 'HRP' or 'NCO'.")
+
+        if constraints_dict is not None:
+            weights = self.__apply_constraints(weights, assets, constraints_dict)
+
+        weights[weights < HierarchicalClusteringOptimizer.WEIGHT_CUTOFF] = 0
+        weights = np.round(weights, 5)
+        cleaned_weights = dict(zip(assets, weights.tolist()))
+
+        mu = expected_returns.reindex(assets).to_numpy()
+        expected_annual_return = float(weights @ mu)
+        annual_volatility = float(np.sqrt(weights @ covariance.to_numpy() @ weights))
+        sharp_ratio = (expected_annual_return - risk_free_rate) / annual_volatility if annual_volatility > 0 else 0.0
+        portfolio_metrics = {
+            "Expected Annual Return": expected_annual_return,
+            "Annual Volatility": annual_volatility,
+            "Sharp Ratio": sharp_ratio
+        }
+        return cleaned_weights, portfolio_metrics
+
+    def cluster(self, correlation, recluster=False):
+        key = (tuple(correlation.columns), self.linkage_method)
+        if recluster or key not in self.__cluster_cache:
+            corr = np.clip(correlation.to_numpy(), -1, 1)
+            distance = np.sqrt(0.5 * (1 - corr))
+            np.fill_diagonal(distance, 0)
+            linkage_matrix = linkage(squareform(distance, checks=False), method=self.linkage_method)
+            # leaves_list gives the quasi-diagonal order directly, without the recursive seriation loop
+            order = leaves_list(linkage_matrix)
+            self.__cluster_cache[key] = (distance, linkage_matrix, order)
+        return self.__cluster_cache[key]
+
+    @staticmethod
+    def __block_ranges(starts, ends):
+        # Concatenated np.arange(start, end) for every block, without a Python loop
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return offsets + np.arange(lengths.sum())
+
+    def __recursive_bisection(self, covariance, order):
+        n = len(order)
+        sorted_cov = covariance[np.ix_(order, order)]
+        inverse_variance = 1 / np.diag(sorted_cov)
+
+        # 2-D prefix sums turn the inverse-variance variance of any contiguous block into an O(1) lookup,
+        # so every bisection at the same depth of the tree is evaluated in one vectorized step
+        weighted_cov = sorted_cov * np.outer(inverse_variance, inverse_variance)
+        cov_prefix = np.zeros((n + 1, n + 1))
+        cov_prefix[1:, 1:] = weighted_cov.cumsum(axis=0).cumsum(axis=1)
+        ivp_prefix = np.concatenate(([0.0], inverse_variance.cumsum()))
+
+        def block_variance(a, b):
+            numerator = cov_prefix[b, b] - cov_prefix[a, b] - cov_prefix[b, a] + cov_prefix[a, a]
+            return numerator / (ivp_prefix[b] - ivp_prefix[a]) ** 2
+
+        sorted_weights = np.ones(n)
+        starts, ends = np.array([0]), np.array([n])
+        while True:
+            splittable = ends - starts > 1
+            starts, ends = starts[splittable], ends[splittable]
+            if len(starts) == 0:
+                break
+            mids = starts + (ends - starts) // 2
+            left_variance = block_variance(starts, mids)
+            right_variance = block_variance(mids, ends)
+            alpha = 1 - left_variance / (left_variance + right_variance)
+
+            sorted_weights[self.__block_ranges(starts, mids)] *= np.repeat(alpha, mids - starts)
+            sorted_weights[self.__block_ranges(mids, ends)] *= np.repeat(1 - alpha, ends - mids)
+
+            starts, ends = np.concatenate((starts, mids)), np.concatenate((mids, ends))
+
+        weights = np.empty(n)
+        weights[order] = sorted_weights
+        return weights
+
+    @staticmethod
+    def __min_variance_weights(covariance):
+        # Closed-form minimum variance, projected back to long-only; falls back to inverse variance
+        try:
+            weights = np.linalg.solve(covariance, np.ones(len(covariance)))
+        except np.linalg.LinAlgError:
+            weights = 1 / np.diag(covariance)
+        weights = np.clip(weights, 0, None)
+        if weights.sum() <= 0:
+            weights = 1 / np.diag(covariance)
+        return weights / weights.sum()
+
+    def __nested_clustered_weights(self, covariance, linkage_matrix):
+        n = len(covariance)
+        n_clusters = self.n_clusters or max(2, int(np.ceil(np.sqrt(n))))
+        labels = fcluster(linkage_matrix, t=min(n_clusters, n), criterion='maxclust')
+
+        # Intra-cluster weights as the columns of an (assets x clusters) matrix
+        cluster_ids = np.unique(labels)
+        intra_weights = np.zeros((n, len(cluster_ids)))
+        for column, cluster_id in enumerate(cluster_ids):
+            members = np.flatnonzero(labels == cluster_id)
+            intra_weights[members, column] = self.__min_variance_weights(covariance[np.ix_(members, members)])
+
+        reduced_covariance = intra_weights.T @ covariance @ intra_weights
+        inter_weights = self.__min_variance_weights(reduced_covariance)
+        return intra_weights @ inter_weights
+
+    @staticmethod
+    def __apply_constraints(weights, assets, constraints_dict):
+        lower = np.zeros(len(assets))
+        upper = np.ones(len(assets))
+        for key, weight in constraints_dict.items():
+            asset, constraint_type = key.split('_')  # Splitting the key into asset name and constraint type
+            asset_index = assets.get_loc(asset)
+            if constraint_type == "max":
+                upper[asset_index] = weight
+            elif constraint_type == "min":
+                lower[asset_index] = weight
+
+        if lower.sum() > 1 or upper.sum() < 1:
+            raise ValueError("Constraints are infeasible: bounds cannot sum to a fully invested portfolio")
+
+        # Clip to the bounds and redistribute the surplus or deficit pro rata over the assets still free to move
+        weights = weights.copy()
+        for _ in range(len(weights)):
+            weights = np.clip(weights, lower, upper)
+            residual = 1 - weights.sum()
+            if abs(residual) < 1e-12:
+                break
+            free = (weights < upper) if residual > 0 else (weights > lower)
+            base = np.where(free, weights if weights[free].sum() > 0 else 1.0, 0.0)
+            weights = weights + residual * base / base.sum()
+        return weights
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# The category hierarchy as sparse mapping matrices, so aggregating returns or weights through every level is one
+# sparse product per level instead of a Python loop over nodes:
+#   security returns (days x securities) @ security_to_sub_category -> sub-category returns
+#   sub-category returns @ sub_category_to_category -> category returns
+#   category returns @ category_to_portfolio -> portfolio returns
+# hierarchy = {
+#     "Equity": {"Traditional Equity": {"VTI": 0.6, "VXUS": 0.4}},
+#     "Bond": {"Traditional Bond": {"BND": 1.0}},
+# }
+# sub_category_weights = {"Equity": {"Traditional Equity": 1.0}, "Bond": {"Traditional Bond": 1.0}}
+# category_weights = {"Equity": 0.6, "Bond": 0.4}
+class HierarchyMatrices:
+
+    def __init__(self, hierarchy, sub_category_weights=None, category_weights=None):
+        self.tickers = []
+        self.sub_category_names = []
+        self.category_names = list(hierarchy.keys())
+        self.sub_category_index_by_category = {}
+
+        security_rows, security_columns, security_weights = [], [], []
+        sub_category_rows, sub_category_columns, sub_category_data = [], [], []
+        for column, (category_name, sub_categories) in enumerate(hierarchy.items()):
+            self.sub_category_index_by_category[category_name] = []
+            for sub_category_name, securities in sub_categories.items():
+                sub_category_index = len(self.sub_category_names)
+                self.sub_category_index_by_category[category_name].append(sub_category_index)
+                self.sub_category_names.append(sub_category_name)
+                for ticker, weight in securities.items():
+                    security_rows.append(len(self.tickers))
+                    security_columns.append(sub_category_index)
+                    security_weights.append(weight)
+                    self.tickers.append(ticker)
+                if sub_category_weights is not None:
+                    sub_category_rows.append(sub_category_index)
+                    sub_category_columns.append(column)
+                    sub_category_data.append(sub_category_weights[category_name][sub_category_name])
+
+        shape = (len(self.tickers), len(self.sub_category_names))
+        self.security_to_sub_category = sparse.csr_matrix(
+            (np.array(security_weights, dtype=float), (security_rows, security_columns)), shape=shape)
+
+        # The optimized levels are only known once the categories (and the top level) have been solved
+        self.sub_category_to_category = None
+        if sub_category_weights is not None:
+            self.sub_category_to_category = sparse.csr_matrix(
+                (np.array(sub_category_data, dtype=float), (sub_category_rows, sub_category_columns)),
+                shape=(len(self.sub_category_names), len(self.category_names)))
+
+        self.category_to_portfolio = None
+        if category_weights is not None:
+            self.category_to_portfolio = np.array([category_weights[name] for name in self.category_names],
+                                                  dtype=float)
+
+    @classmethod
+    def from_all_category(cls, all_category):
+        sub_category_weights = {}
+        category_weights = {}
+        for category in all_category.categories:
+            if category.category_weight is None:
+                raise ValueError(f"Category '{category.name}' has no weight yet. Optimize the portfolio first.")
+            category_weights[category.name] = category.category_weight
+            sub_category_weights[category.name] = {}
+            for subcategory in category.subcategories:
+                if subcategory.sub_category_weight is None:
+                    raise ValueError(f"Sub-category '{subcategory.name}' has no weight yet. "
+                                     f"Optimize category '{category.name}' first.")
+                sub_category_weights[category.name][subcategory.name] = subcategory.sub_category_weight
+        return cls(all_category.get_hierarchy(), sub_category_weights, category_weights)
+
+    # returns_df: security returns panel without NaN; securities missing from it contribute nothing
+    def aggregate_returns(self, returns_df):
+        returns = returns_df.reindex(columns=self.tickers, fill_value=0.0).to_numpy(dtype=float)
+        sub_category_returns = returns @ self.security_to_sub_category
+        aggregated_returns = {
+            "sub_category": pd.DataFrame(sub_category_returns, index=returns_df.index,
+                                         columns=self.sub_category_names)}
+        if self.sub_category_to_category is not None:
+            category_returns = sub_category_returns @ self.sub_category_to_category
+            aggregated_returns["category"] = pd.DataFrame(category_returns, index=returns_df.index,
+                                                          columns=self.category_names)
+            if self.category_to_portfolio is not None:
+                aggregated_returns["portfolio"] = pd.Series(category_returns @ self.category_to_portfolio,
+                                                            index=returns_df.index, name="Portfolio")
+        return aggregated_returns
+
+    @staticmethod
+    def aggregate_panels(panels, mapping):
+        # panels: the returns of each node's members (already imputed), each on its own dates, whose columns end to
+        # end are the rows of mapping (members x nodes). Every node's returns on its own panel's dates, from one
+        # sparse product over the union of the dates: NaN outside a panel only meets the other nodes' zero entries.
+        combined = pd.concat(panels, axis=1)
+        aggregated = combined.to_numpy(dtype=float) @ mapping
+        return [pd.Series(aggregated[:, column], index=combined.index).reindex(panel.index)
+                for column, panel in enumerate(panels)]
+
+    def final_weights(self):
+        # security -> portfolio weight for every security, in self.tickers order
+        if self.sub_category_to_category is None or self.category_to_portfolio is None:
+            raise ValueError("Final weights need both the sub-category and the category weights.")
+        return self.security_to_sub_category @ (self.sub_category_to_category @ self.category_to_portfolio)
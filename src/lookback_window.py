@@ -0,0 +1,48 @@
+import re
+
+import pandas as pd
+
+from src.global_settings import DEFAULT_LOOKBACK
+
+
+# Trailing windows ("6mo", "1y", "3y", "5y", "10y", "max" / None) over date-indexed data fetched once with the
+# longest history. A window is a positional slice from the first date on or after (last date - lookback), so
+# slicing a Series or a single-dtype DataFrame returns a view, not a copy.
+class LookbackWindow:
+    MAX = "max"
+    __PATTERN = re.compile(r"^(\d+)(y|mo|d)$")
+
+    @staticmethod
+    def offset(lookback):
+        if lookback is None or lookback == LookbackWindow.MAX:
+            return None
+        match = LookbackWindow.__PATTERN.match(lookback)
+        if match is None:
+            raise ValueError(f"Invalid lookback '{lookback}', expected e.g. '6mo', '5y' or 'max'")
+        length, unit = int(match.group(1)), match.group(2)
+        if unit == "y":
+            return pd.DateOffset(years=length)
+        if unit == "mo":
+            return pd.DateOffset(months=length)
+        return pd.DateOffset(days=length)
+
+    @staticmethod
+    def start_position(index, lookback=DEFAULT_LOOKBACK):
+        offset = LookbackWindow.offset(lookback)
+        if offset is None or len(index) == 0:
+            return 0
+        return int(index.searchsorted(index[-1] - offset, side='left'))
+
+    @staticmethod
+    def slice(data, lookback=DEFAULT_LOOKBACK):
+        if data is None:
+            return None
+        return data.iloc[LookbackWindow.start_position(data.index, lookback):]
+
+    @staticmethod
+    def longest(lookbacks):
+        # The lookback whose window covers all the others, e.g. to build one panel for several horizons
+        if any(LookbackWindow.offset(lookback) is None for lookback in lookbacks):
+            return LookbackWindow.MAX
+        reference = pd.Timestamp.today().normalize()
+        return min(lookbacks, key=lambda lookback: reference - LookbackWindow.offset(lookback))
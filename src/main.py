@@ -1,51 +1,35 @@
-from matplotlib import pyplot as plt
-
-from all_category import AllCategory
-from excel.excel_reader import ExcelReader
-from excel.excel_writer import ExcelWriter
-from pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
-from categories.sub_categories.securities.security import Security
-
-
-def plot_category_historical_data(historical_data):
-    plt.figure(figsize=(10, 6))  # Set the size of the plot
-
-    # Plot each categories
-    for category in historical_data.columns:
-        plt.plot(historical_data.index, historical_data[category], label=category)
-
-    plt.title('Average Historical Data by Category')
-    plt.xlabel('Date')
-    plt.ylabel('Average Value')
-    plt.legend()  # Add a legend to distinguish categories
-    plt.grid(True)  # Add a grid for better readability
-    plt.show()
-
-def plot_returns(returns_filled_df):
-    # Number of tickers
-    num_tickers = len(returns_filled_df.columns)
-
-    # Create a figure and a set of subplots
-    fig, axs = plt.subplots(num_tickers, 1, figsize=(15, 5 * num_tickers))
-
-    # Check if there's only one subplot (in case of a single ticker)
-    if num_tickers == 1:
-        axs = [axs]
-
-    # Plot each ticker in a separate subplot
-    for i, ticker in enumerate(returns_filled_df.columns):
-        axs[i].plot(returns_filled_df.index, returns_filled_df[ticker])
-        axs[i].set_title(f'Returns of {ticker}')
-        axs[i].set_xlabel('Date')
-        axs[i].set_ylabel('Returns')
-
-    # Adjust layout to prevent overlapping
-    plt.tight_layout()
-
-    # Show the plot
-    plt.show()
-
-if __name__ == '__main__':
+import logging
+
+from src.all_category import AllCategory
+from src.batch.portfolio_batch_runner import PortfolioBatchRunner
+from src.categories.sub_categories.securities.security import Security
+from src.excel.excel_reader import ExcelReader
+from src.excel.excel_writer import ExcelWriter
+from src.global_settings import RUN_STATISTICS_PATH, BATCH_FILE_PATHS, BATCH_MAX_WORKERS, SNAPSHOT_STORE_PATH, \
+    REPORT_ENABLED, REPORT_IN_BATCH, STRESS_TEST_ENABLED
+from src.reporting.report_renderer import ReportRenderer
+from src.run_statistics import RunStatistics, configure_logging
+from src.scenario.stress_tester import StressTester
+from src.snapshots.snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+
+def plot_category_historical_data(historical_data, renderer=None):
+    # One chart with a line per category, written to the report directory
+    renderer = renderer or ReportRenderer()
+    return renderer.render([renderer.lines_job({category: historical_data[category]
+                                                for category in historical_data.columns},
+                                               'Average Historical Data by Category', 'category_historical_data',
+                                               ylabel='Average Value')])
+
+def plot_returns(returns_filled_df, renderer=None):
+    # One panel per ticker, paginated instead of one figure 5 inches high per ticker
+    renderer = renderer or ReportRenderer()
+    return renderer.render(renderer.returns_jobs({"All": {ticker: returns_filled_df[ticker]
+                                                          for ticker in returns_filled_df.columns}}))
+
+def run_workbook():
     # sm = SecurityManager()
     ac = AllCategory()
     file_path = "ETF.xlsx"
@@ -65,9 +49,11 @@ if __name__ == '__main__':
 
     # optimizer = MeanVarianceOptimizer()
 
-    print(f"Risk Free Rate: {Security.get_risk_free_rate() * 100}%")
+    logger.info("Risk Free Rate: %s%%", Security.get_risk_free_rate() * 100)
 
     ac.assign_final_asset_weights()
+    if SNAPSHOT_STORE_PATH is not None:
+        SnapshotStore.get_default().append(ac, workbook=file_path, risk_free_rate=Security.get_risk_free_rate())
 
     # adc = AggregatedDataCalculator()
     # csm = CategorySecurityManager()
@@ -110,3 +96,23 @@ if __name__ == '__main__':
     ew = ExcelWriter(file_path, ac)
     ew.update_excel()
 
+    if STRESS_TEST_ENABLED:
+        # An analytic on top of the written workbook: a failure is logged, not raised
+        try:
+            logger.info("Stress test:\n%s", StressTester.from_all_category(ac).run().round(4).to_string())
+        except Exception as e:
+            logger.error("Stress test failed: %s", e)
+
+    if REPORT_ENABLED:
+        ReportRenderer().render_portfolio(ac)
+
+if __name__ == '__main__':
+    configure_logging()
+    if BATCH_FILE_PATHS:
+        batch_summary = PortfolioBatchRunner(BATCH_FILE_PATHS, max_workers=BATCH_MAX_WORKERS).run(
+            report=REPORT_ENABLED and REPORT_IN_BATCH)
+        logger.info("Batch summary:\n%s", batch_summary.to_string())
+    else:
+        run_workbook()
+
+    RunStatistics.get_default().export(RUN_STATISTICS_PATH)
@@ -0,0 +1,52 @@
+import copy
+import os
+import pickle
+import re
+
+import pandas as pd
+
+
+class MarketDataArchiveMissError(KeyError):
+    """ Exception raised when a response is requested in replay mode but was never recorded """
+    pass
+
+
+class MarketDataArchive:
+    FILE_EXTENSION = ".pkl"
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.__responses = {}
+
+    def __file_path(self, endpoint, key):
+        safe_key = re.sub(r'[^A-Za-z0-9._-]', '_', str(key))
+        return os.path.join(self.archive_path, endpoint, safe_key + MarketDataArchive.FILE_EXTENSION)
+
+    def contains(self, endpoint, key):
+        return (endpoint, key) in self.__responses or os.path.exists(self.__file_path(endpoint, key))
+
+    def load(self, endpoint, key):
+        if (endpoint, key) not in self.__responses:
+            file_path = self.__file_path(endpoint, key)
+            if not os.path.exists(file_path):
+                raise MarketDataArchiveMissError(f"No recorded '{endpoint}' response for '{key}' in {self.archive_path}")
+            with open(file_path, 'rb') as file:
+                self.__responses[(endpoint, key)] = pickle.load(file)
+
+        # Only the frames are copied, since callers may change those (e.g. a new index); module dicts and rates are
+        # shared read-only
+        response = self.__responses[(endpoint, key)]
+        if isinstance(response, (pd.DataFrame, pd.Series)):
+            return response.copy()
+        return response
+
+    def save(self, endpoint, key, response):
+        file_path = self.__file_path(endpoint, key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'wb') as file:
+            pickle.dump(response, file, protocol=pickle.HIGHEST_PROTOCOL)
+        # Copied once, so that the caller's later changes to its own response never reach the archive
+        self.__responses[(endpoint, key)] = copy.deepcopy(response)
+
+    def clear_memory(self):
+        self.__responses = {}
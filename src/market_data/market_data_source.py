@@ -0,0 +1,138 @@
+import logging
+import time
+
+import pandas as pd
+import yahooquery as yq
+from forex_python.converter import CurrencyRates
+
+from src.global_settings import MARKET_DATA_MODE, MARKET_DATA_ARCHIVE_PATH
+from src.market_data.market_data_archive import MarketDataArchive, MarketDataArchiveMissError
+from src.run_statistics import RunStatistics
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataSource:
+    LIVE = "live"
+    RECORD = "record"
+    REPLAY = "replay"
+    CACHE = "cache"
+    MODES = (LIVE, RECORD, REPLAY, CACHE)
+    DIVIDEND_BATCH_SIZE = 50
+    MAX_ATTEMPTS = 3
+    RETRY_WAIT_SECONDS = 1
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls(MARKET_DATA_MODE, MARKET_DATA_ARCHIVE_PATH)
+        return cls._default
+
+    @classmethod
+    def set_default(cls, source):
+        cls._default = source
+
+    def __init__(self, mode=LIVE, archive_path=MARKET_DATA_ARCHIVE_PATH):
+        if mode not in MarketDataSource.MODES:
+            raise ValueError(f"Unknown market data mode '{mode}'. Expected one of {MarketDataSource.MODES}.")
+        self.mode = mode
+        self.archive = MarketDataArchive(archive_path) if mode != MarketDataSource.LIVE else None
+        self.__tickers = {}
+        self.__currency_rates = None
+        self.run_statistics = RunStatistics.get_default()
+
+    def __ticker(self, ticker):
+        if ticker not in self.__tickers:
+            self.__tickers[ticker] = yq.Ticker(ticker)
+        return self.__tickers[ticker]
+
+    def __serves_from_archive(self, endpoint, key):
+        return self.mode == MarketDataSource.REPLAY or (self.mode == MarketDataSource.CACHE
+                                                        and self.archive.contains(endpoint, key))
+
+    def __load_archived(self, endpoint, key):
+        try:
+            response = self.archive.load(endpoint, key)
+        except MarketDataArchiveMissError:
+            self.run_statistics.record_cache_miss(endpoint)
+            self.run_statistics.record_failure(endpoint)
+            raise
+        self.run_statistics.record_cache_hit(endpoint)
+        return response
+
+    def __fetch_remote(self, endpoint, fetch):
+        # Network errors are retried here, once per request, rather than around every caller
+        if self.mode == MarketDataSource.CACHE:
+            self.run_statistics.record_cache_miss(endpoint)
+        for attempt in range(1, MarketDataSource.MAX_ATTEMPTS + 1):
+            try:
+                response = fetch()
+            except Exception as e:
+                if attempt == MarketDataSource.MAX_ATTEMPTS:
+                    self.run_statistics.record_failure(endpoint)
+                    raise
+                logger.debug("Retrying '%s' request after error: %s", endpoint, e)
+                self.run_statistics.record_retry(endpoint)
+                time.sleep(MarketDataSource.RETRY_WAIT_SECONDS)
+            else:
+                self.run_statistics.record_request(endpoint, response)
+                return response
+
+    def __request(self, endpoint, key, fetch):
+        if self.__serves_from_archive(endpoint, key):
+            return self.__load_archived(endpoint, key)
+
+        response = self.__fetch_remote(endpoint, fetch)
+        if self.mode in (MarketDataSource.RECORD, MarketDataSource.CACHE):
+            self.archive.save(endpoint, key, response)
+        return response
+
+    def history(self, ticker, period="5y"):
+        return self.__request("history", f"{ticker}_{period}",
+                              lambda: self.__ticker(ticker).history(period=period))
+
+    def history_since(self, ticker, start_date):
+        # start_date: 'yyyy-mm-dd', for incremental updates of a stored series
+        return self.__request("history", f"{ticker}_since_{start_date}",
+                              lambda: self.__ticker(ticker).history(start=start_date))
+
+    def module(self, ticker, module_name):
+        # module_name is a yahooquery Ticker module such as 'quote_type', 'fund_profile', 'price' or 'summary_detail'
+        return self.__request(module_name, ticker, lambda: getattr(self.__ticker(ticker), module_name))
+
+    def dividend_history(self, ticker, start_date):
+        return self.__request("dividend_history", f"{ticker}_{start_date}",
+                              lambda: self.__ticker(ticker).dividend_history(start_date))
+
+    def dividend_histories(self, tickers, start_date):
+        # Same responses as dividend_history, but the tickers not archived yet are fetched together in
+        # DIVIDEND_BATCH_SIZE-ticker requests and archived one ticker at a time
+        histories = {}
+        missing_tickers = []
+        for ticker in tickers:
+            if self.__serves_from_archive("dividend_history", f"{ticker}_{start_date}"):
+                histories[ticker] = self.__load_archived("dividend_history", f"{ticker}_{start_date}")
+            else:
+                missing_tickers.append(ticker)
+
+        for start in range(0, len(missing_tickers), MarketDataSource.DIVIDEND_BATCH_SIZE):
+            batch = missing_tickers[start:start + MarketDataSource.DIVIDEND_BATCH_SIZE]
+            response = self.__fetch_remote("dividend_history",
+                                           lambda batch=batch: yq.Ticker(batch).dividend_history(start_date))
+            if not isinstance(response, pd.DataFrame) or response.empty:
+                response = pd.DataFrame(columns=["dividends"], index=pd.MultiIndex.from_tuples(
+                    [], names=["symbol", "date"]))
+            symbols = response.index.get_level_values("symbol")
+            for ticker in batch:
+                history = response[symbols == ticker]
+                if self.mode in (MarketDataSource.RECORD, MarketDataSource.CACHE):
+                    self.archive.save("dividend_history", f"{ticker}_{start_date}", history)
+                histories[ticker] = history
+        return histories
+
+    def exchange_rate(self, from_currency, to_currency, date):
+        if self.__currency_rates is None and self.mode != MarketDataSource.REPLAY:
+            self.__currency_rates = CurrencyRates()
+        return self.__request("exchange_rate", f"{from_currency}_{to_currency}_{date.strftime('%Y-%m-%d')}",
+                              lambda: self.__currency_rates.get_rate(from_currency, to_currency, date))
@@ -0,0 +1,125 @@
+import datetime
+import logging
+import os
+import pickle
+
+import pandas as pd
+
+from src.global_settings import RISK_FREE_RATE_SERIES_PATH, HISTORY_PERIOD
+from src.market_data.market_data_source import MarketDataSource
+from src.resample_rules import YEAR_END_RULE
+
+logger = logging.getLogger(__name__)
+
+
+# Daily annual T-Bill 3 Month rate, stored locally and extended with only the days missing since the last update.
+# The series is fetched at most once per day, so repeated runs need no network call for the rate. It covers the
+# same HISTORY_PERIOD as the prices; dates before its first quote get no rate (NaN) rather than a back-filled one.
+class RiskFreeRateSeries:
+    TBILL_3MONTHS = "^IRX"
+    FREQUENCY = 252
+    INITIAL_PERIOD = HISTORY_PERIOD
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls(RISK_FREE_RATE_SERIES_PATH)
+        return cls._default
+
+    @classmethod
+    def set_default(cls, series):
+        cls._default = series
+
+    def __init__(self, store_path=RISK_FREE_RATE_SERIES_PATH, ticker=TBILL_3MONTHS, market_data_source=None):
+        self.store_path = store_path
+        self.ticker = ticker
+        self.market_data_source = market_data_source
+        self.__series = None
+        self.__updated_on = None
+
+    def __load(self):
+        if self.store_path is not None and os.path.exists(self.store_path):
+            with open(self.store_path, 'rb') as file:
+                stored = pickle.load(file)
+            if stored.get("period") != RiskFreeRateSeries.INITIAL_PERIOD:
+                return  # Stored over another period (e.g. the former 5y): fetched again in full
+            self.__series = stored["series"]
+            self.__updated_on = stored["updated_on"]
+
+    def __save(self):
+        if self.store_path is None:
+            return
+        directory = os.path.dirname(self.store_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.store_path, 'wb') as file:
+            pickle.dump({"series": self.__series, "updated_on": self.__updated_on,
+                         "period": RiskFreeRateSeries.INITIAL_PERIOD}, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __fetch(self, start_date=None):
+        market_data_source = self.market_data_source or MarketDataSource.get_default()
+        if start_date is None:
+            data = market_data_source.history(self.ticker, period=RiskFreeRateSeries.INITIAL_PERIOD)
+        else:
+            data = market_data_source.history_since(self.ticker, start_date.strftime('%Y-%m-%d'))
+        if not isinstance(data, pd.DataFrame) or 'close' not in data.columns:
+            raise ValueError("Data not available or invalid format")
+        if isinstance(data.index, pd.MultiIndex):
+            data = data.xs(self.ticker, level='symbol')
+        # Intraday rows come back timezone-aware; keep one naive date per day
+        index = pd.to_datetime(data.index, utc=True).tz_localize(None).normalize()
+        rates = pd.Series(data['close'].to_numpy(dtype=float) / 100, index=index, name=self.ticker)
+        return rates[~rates.index.duplicated(keep='last')].dropna()
+
+    def update(self):
+        if self.__series is None:
+            self.__load()
+        if self.__series is not None and self.__updated_on == datetime.date.today():
+            return self.__series
+
+        try:
+            if self.__series is None or self.__series.empty:
+                self.__series = self.__fetch()
+            else:
+                new_rates = self.__fetch(self.__series.index[-1] + pd.Timedelta(days=1))
+                combined = pd.concat([self.__series, new_rates])
+                self.__series = combined[~combined.index.duplicated(keep='last')].sort_index()
+            self.__updated_on = datetime.date.today()
+            self.__save()
+        except Exception as e:
+            if self.__series is None:
+                raise
+            # A stale stored series is still better than no rate at all
+            logger.warning("Error updating risk-free rate series, using the stored one: %s", e)
+        return self.__series
+
+    def series(self):
+        return self.update()
+
+    def latest(self):
+        # The scalar fast path: the latest annual rate
+        return round(float(self.series().iloc[-1]), 5)
+
+    @staticmethod
+    def daily_rates(annual_rates, index):
+        # Per-period rates aligned to a returns index; days without a quote carry the previous rate, days before
+        # the first quote stay NaN
+        aligned = annual_rates.reindex(annual_rates.index.union(index)).ffill().reindex(index)
+        return (1 + aligned) ** (1 / RiskFreeRateSeries.FREQUENCY) - 1
+
+    @staticmethod
+    def average_rate(annual_rates, index):
+        # The annual rate earned over the days of index, e.g. to report metrics against one scalar rate
+        return float((1 + RiskFreeRateSeries.daily_rates(annual_rates, index).mean()) ** RiskFreeRateSeries.FREQUENCY
+                     - 1)
+
+    @staticmethod
+    def excess_returns(returns_df, annual_rates):
+        return returns_df.sub(RiskFreeRateSeries.daily_rates(annual_rates, returns_df.index), axis=0)
+
+    @staticmethod
+    def yearly_rates(annual_rates, index):
+        # Average annual rate of each calendar year, aligned to a year-end returns index (NaN before the series)
+        yearly = annual_rates.resample(YEAR_END_RULE).mean()
+        return yearly.reindex(yearly.index.union(index)).ffill().reindex(index)
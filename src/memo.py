@@ -0,0 +1,49 @@
+import time
+
+from src.global_settings import MEMO_FAILURE_TTL_SECONDS
+
+
+# Lazily computed values by name, for the tree nodes. A value is unset (never computed), set, or computed as
+# missing: a calculation that returned None is not run again until failure_ttl seconds have passed (None -> Until
+# invalidated). A calculation that raises caches nothing, so the error surfaces again on the next access.
+class Memo:
+    def __init__(self, failure_ttl=MEMO_FAILURE_TTL_SECONDS):
+        self.failure_ttl = failure_ttl
+        self.__values = {}
+        self.__missing_since = {}
+
+    def get(self, name, calculate):
+        if name in self.__values:
+            return self.__values[name]
+        if self.is_missing(name):
+            return None
+        value = calculate()
+        self.set(name, value)
+        return value
+
+    def peek(self, name):
+        # The cached value without computing it
+        return self.__values.get(name)
+
+    def set(self, name, value):
+        if value is None:
+            self.__values.pop(name, None)
+            self.__missing_since[name] = time.monotonic()
+        else:
+            self.__values[name] = value
+            self.__missing_since.pop(name, None)
+
+    def is_set(self, name):
+        return name in self.__values
+
+    def is_missing(self, name):
+        missing_since = self.__missing_since.get(name)
+        if missing_since is None:
+            return False
+        return self.failure_ttl is None or time.monotonic() - missing_since < self.failure_ttl
+
+    def invalidate(self, *names):
+        # No names -> Everything
+        for name in names or list(self.__values.keys() | self.__missing_since.keys()):
+            self.__values.pop(name, None)
+            self.__missing_since.pop(name, None)
@@ -0,0 +1,22 @@
+from src.hierarchical_optimizer.hierarchical_clustering_optimizer import HierarchicalClusteringOptimizer
+from src.optimizer_engines.optimizer_engine import OptimizerEngine
+
+
+class HierarchicalRiskParityEngine(OptimizerEngine):
+    model = HierarchicalClusteringOptimizer.HRP
+
+    def __init__(self):
+        # Kept for the engine's lifetime so linkages are reused across solves on the same assets
+        super().__init__()
+        self.hco = HierarchicalClusteringOptimizer()
+
+    def cache_parameters(self):
+        return self.name, self.model, self.hco.linkage_method, self.hco.n_clusters
+
+    def _solve(self, returns_df, constraints_dict, risk_free_rate):
+        return self.hco.optimize(returns_df, risk_free_rate=risk_free_rate, constraints_dict=constraints_dict,
+                                 model=self.model)
+
+
+class NestedClusteredEngine(HierarchicalRiskParityEngine):
+    model = HierarchicalClusteringOptimizer.NCO
@@ -0,0 +1,18 @@
+from src.global_settings import SEMIVARIANCE_SCENARIO_REDUCTION
+from src.optimizer_engines.optimizer_engine import OptimizerEngine
+from src.pypfopt_optimizer.mean_semivariance_optimizer import MeanSemivarianceOptimizer
+
+
+class MeanSemivarianceEngine(OptimizerEngine):
+
+    def __init__(self, scenario_reduction=SEMIVARIANCE_SCENARIO_REDUCTION):
+        super().__init__()
+        self.scenario_reduction = scenario_reduction
+
+    def cache_parameters(self):
+        return self.name, "mean_historical_return", "max_quadratic_utility", self.scenario_reduction
+
+    def _solve(self, returns_df, constraints_dict, risk_free_rate):
+        mso = MeanSemivarianceOptimizer()
+        return mso.optimize_by_returns(returns_df, risk_free_rate=risk_free_rate, constraints_dict=constraints_dict,
+                                       scenario_reduction=self.scenario_reduction, verbose=False)
@@ -0,0 +1,15 @@
+from src.optimizer_engines.optimizer_engine import OptimizerEngine
+from src.pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
+
+
+class MeanVarianceEngine(OptimizerEngine):
+
+    def cache_parameters(self):
+        return self.name, "mean_historical_return", "oracle_approximating", "max_sharpe"
+
+    def _solve(self, returns_df, constraints_dict, risk_free_rate):
+        mvo = MeanVarianceOptimizer()
+        expected_returns = mvo.mean_historical_returns_by_returns(returns_df)
+        covariance, correlation = mvo.covariance_correlation_matrix_by_returns(returns_df)
+        return mvo.optimize_max_sharpe_ratio(expected_returns, covariance, risk_free_rate=risk_free_rate,
+                                             constraints_dict=constraints_dict, verbose=False)
@@ -0,0 +1,77 @@
+import copy
+import hashlib
+import os
+import pickle
+
+import numpy as np
+
+from src.global_settings import OPTIMIZATION_CACHE_PATH
+from src.run_statistics import RunStatistics
+
+
+class OptimizationResultCache:
+    # Solve results keyed by the content of the inputs, so identical solves (e.g. Category.optimize called again by
+    # AllCategory.optimize_sub_category, or a re-run of main.py on unchanged data) never rebuild the optimizer
+    FILE_EXTENSION = ".pkl"
+
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls(OPTIMIZATION_CACHE_PATH)
+        return cls._default
+
+    @classmethod
+    def set_default(cls, cache):
+        cls._default = cache
+
+    # cache_path = None -> Keep results in memory only
+    def __init__(self, cache_path=OPTIMIZATION_CACHE_PATH):
+        self.cache_path = cache_path
+        self.__results = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(returns_df, engine_parameters, constraints_dict, risk_free_rate):
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(returns_df.to_numpy(dtype=float)).tobytes())
+        digest.update(repr(list(returns_df.columns)).encode())
+        # The dates matter to engines that resample the panel (e.g. weekly semivariance scenarios)
+        digest.update(np.ascontiguousarray(returns_df.index.to_numpy()).astype(str).tobytes())
+        digest.update(repr(engine_parameters).encode())
+        digest.update(repr(sorted(constraints_dict.items()) if constraints_dict else None).encode())
+        digest.update(repr(float(risk_free_rate)).encode())
+        return digest.hexdigest()
+
+    def __file_path(self, key):
+        return os.path.join(self.cache_path, key + OptimizationResultCache.FILE_EXTENSION)
+
+    def get(self, key):
+        if key not in self.__results and self.cache_path is not None and os.path.exists(self.__file_path(key)):
+            with open(self.__file_path(key), 'rb') as file:
+                self.__results[key] = pickle.load(file)
+
+        if key not in self.__results:
+            self.misses += 1
+            RunStatistics.get_default().record_cache_miss("optimization")
+            return None
+        self.hits += 1
+        RunStatistics.get_default().record_cache_hit("optimization")
+        # Callers may update the weights dict in place, so never hand out the cached object itself
+        return copy.deepcopy(self.__results[key])
+
+    def put(self, key, result):
+        self.__results[key] = copy.deepcopy(result)
+        if self.cache_path is not None:
+            os.makedirs(self.cache_path, exist_ok=True)
+            with open(self.__file_path(key), 'wb') as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def clear(self):
+        self.__results = {}
+        if self.cache_path is not None and os.path.isdir(self.cache_path):
+            for file_name in os.listdir(self.cache_path):
+                if file_name.endswith(OptimizationResultCache.FILE_EXTENSION):
+                    os.remove(os.path.join(self.cache_path, file_name))
@@ -0,0 +1,96 @@
+import logging
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from src.lookback_window import LookbackWindow
+from src.market_data.risk_free_rate_series import RiskFreeRateSeries
+from src.optimizer_engines.optimization_result_cache import OptimizationResultCache
+from src.pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
+
+logger = logging.getLogger(__name__)
+
+
+class OptimizerEngine(ABC):
+    # Common protocol for every optimizer at every hierarchy level:
+    # (returns panel, constraints, risk-free rate) -> (cleaned weights, portfolio metrics), with no printing or plotting
+    name = None
+
+    def __init__(self):
+        # None -> OptimizationResultCache.get_default(); False -> always solve
+        self.result_cache = None
+
+    def cache_parameters(self):
+        # Everything besides the inputs that changes the result: the engine plus its estimators and settings
+        return (self.name,)
+
+    # risk_free_rate: annual scalar, or a daily series of annual rates (Security.get_risk_free_rate_series), in which
+    # case the engine solves on returns in excess of the aligned daily rate with a zero risk-free rate, and the
+    # reported metrics are those of the raw returns against the window's average rate, as with a scalar rate
+    # lookback: trailing window of returns_df to solve on (e.g. "3y"), sliced without copying; None -> all of it
+    def optimize(self, returns_df, constraints_dict=None, risk_free_rate=0.02, lookback=None):
+        if lookback is not None:
+            returns_df = LookbackWindow.slice(returns_df, lookback)
+        constraints_dict = self.applicable_constraints(constraints_dict, returns_df.columns)
+
+        if len(returns_df.columns) == 1:
+            # Nothing to optimize, e.g. a category with a single sub-category
+            return {returns_df.columns[0]: 1.0}, {}
+
+        if not isinstance(risk_free_rate, pd.Series):
+            return self.__solve_cached(returns_df, constraints_dict, risk_free_rate)
+
+        excess_returns_df = RiskFreeRateSeries.excess_returns(returns_df, risk_free_rate)
+        # Days before the rate series starts have no excess return
+        uncovered = excess_returns_df.isna().all(axis=1)
+        if uncovered.any():
+            logger.warning("No risk-free rate for %s days before %s; solving without them", int(uncovered.sum()),
+                           returns_df.index[~uncovered][0].date() if (~uncovered).any() else None)
+            returns_df, excess_returns_df = returns_df[~uncovered], excess_returns_df[~uncovered]
+        cleaned_weights, _ = self.__solve_cached(excess_returns_df, constraints_dict, 0.0)
+        return cleaned_weights, self.portfolio_metrics(
+            returns_df, cleaned_weights, RiskFreeRateSeries.average_rate(risk_free_rate, returns_df.index))
+
+    def __solve_cached(self, returns_df, constraints_dict, risk_free_rate):
+        result_cache = OptimizationResultCache.get_default() if self.result_cache is None else self.result_cache
+        if result_cache is False:
+            return self._solve(returns_df, constraints_dict, risk_free_rate)
+
+        key = result_cache.key(returns_df, self.cache_parameters(), constraints_dict, risk_free_rate)
+        result = result_cache.get(key)
+        if result is None:
+            result = self._solve(returns_df, constraints_dict, risk_free_rate)
+            result_cache.put(key, result)
+        return result
+
+    @abstractmethod
+    def _solve(self, returns_df, constraints_dict, risk_free_rate):
+        # -> (cleaned weights, portfolio metrics)
+        pass
+
+    @staticmethod
+    def applicable_constraints(constraints_dict, assets):
+        # The "{asset}_{min|max}" bounds of the assets being optimized; bounds of assets removed from the universe
+        # (e.g. excluded by the data-quality check) are dropped, so the optimizers only see assets they hold
+        if constraints_dict is None:
+            return None
+        assets = set(assets)
+        return {key: weight for key, weight in constraints_dict.items() if key.split('_')[0] in assets}
+
+    @staticmethod
+    def portfolio_metrics(returns_df, cleaned_weights, risk_free_rate):
+        # Same estimators as MeanVarianceOptimizer, for engines whose library does not report them
+        mvo = MeanVarianceOptimizer()
+        expected_returns = mvo.mean_historical_returns_by_returns(returns_df)
+        covariance, correlation = mvo.covariance_correlation_matrix_by_returns(returns_df)
+
+        weights = np.array([cleaned_weights.get(asset, 0.0) for asset in covariance.columns])
+        expected_annual_return = float(weights @ expected_returns.reindex(covariance.columns).to_numpy())
+        annual_volatility = float(np.sqrt(weights @ covariance.to_numpy() @ weights))
+        sharp_ratio = (expected_annual_return - risk_free_rate) / annual_volatility if annual_volatility > 0 else 0.0
+        return {
+            "Expected Annual Return": expected_annual_return,
+            "Annual Volatility": annual_volatility,
+            "Sharp Ratio": sharp_ratio
+        }
@@ -0,0 +1,36 @@
+import importlib
+
+# Engines are imported on first use so optional libraries (e.g. riskfolio) are only needed when selected
+OPTIMIZER_ENGINES = {
+    "mean_variance": "src.optimizer_engines.mean_variance_engine.MeanVarianceEngine",
+    "resampled_mean_variance": "src.optimizer_engines.resampled_frontier_engine.ResampledMeanVarianceEngine",
+    "mean_semivariance": "src.optimizer_engines.mean_semivariance_engine.MeanSemivarianceEngine",
+    "hrp": "src.optimizer_engines.hierarchical_clustering_engine.HierarchicalRiskParityEngine",
+    "nco": "src.optimizer_engines.hierarchical_clustering_engine.NestedClusteredEngine",
+    "riskfolio_mean_risk": "src.optimizer_engines.riskfolio_engine.RiskfolioMeanRiskEngine",
+    "riskfolio_hrp": "src.optimizer_engines.riskfolio_engine.RiskfolioHierarchicalEngine",
+}
+
+_engine_instances = {}
+
+
+def register_optimizer_engine(name, engine):
+    # engine: an OptimizerEngine instance, or a dotted path to an OptimizerEngine subclass
+    if isinstance(engine, str):
+        OPTIMIZER_ENGINES[name] = engine
+        _engine_instances.pop(name, None)
+    else:
+        OPTIMIZER_ENGINES[name] = f"{type(engine).__module__}.{type(engine).__name__}"
+        _engine_instances[name] = engine
+
+
+def get_optimizer_engine(name):
+    # One instance per engine, so engine-level caches (e.g. cluster linkages) survive between solves
+    if name not in _engine_instances:
+        if name not in OPTIMIZER_ENGINES:
+            raise KeyError(f"Unknown optimizer engine '{name}'. Available: {', '.join(OPTIMIZER_ENGINES)}")
+        module_name, class_name = OPTIMIZER_ENGINES[name].rsplit('.', 1)
+        engine = getattr(importlib.import_module(module_name), class_name)()
+        engine.name = name
+        _engine_instances[name] = engine
+    return _engine_instances[name]
@@ -0,0 +1,168 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import cvxpy as cp
+import numpy as np
+import pandas as pd
+
+from src.covariance.covariance_estimator import CovarianceEstimator
+from src.global_settings import RESAMPLED_FRONTIER_SAMPLES, RESAMPLED_FRONTIER_SEED, RESAMPLED_FRONTIER_MAX_WORKERS, \
+    RESAMPLED_FRONTIER_CONFIDENCE
+from src.optimizer_engines.optimizer_engine import OptimizerEngine
+
+logger = logging.getLogger(__name__)
+
+FREQUENCY = 252
+
+_worker_returns = None
+_worker_problem = None
+
+
+def _initialize_worker(returns):
+    # The returns panel is shipped to each worker once instead of once per sample
+    global _worker_returns, _worker_problem
+    _worker_returns = returns
+    _worker_problem = None
+
+
+class MaxSharpeProblem:
+    # Max Sharpe as the convex problem min |L' y|^2 s.t. (mu - rf)' y = 1, sum(y) = k, y >= 0, with w = y / k and
+    # L the Cholesky factor of the covariance. mu - rf and L are cvxpy Parameters, so the problem is compiled once
+    # and every resample only updates them and re-solves from the previous solution.
+    def __init__(self, n_assets, lower_bounds, upper_bounds):
+        self.excess_returns = cp.Parameter(n_assets)
+        self.cholesky = cp.Parameter((n_assets, n_assets))
+        self.y = cp.Variable(n_assets)
+        self.k = cp.Variable()
+        constraints = [self.excess_returns @ self.y == 1, cp.sum(self.y) == self.k, self.y >= 0, self.k >= 0]
+        for asset, bound in lower_bounds.items():
+            constraints.append(self.y[asset] >= bound * self.k)
+        for asset, bound in upper_bounds.items():
+            constraints.append(self.y[asset] <= bound * self.k)
+        self.problem = cp.Problem(cp.Minimize(cp.sum_squares(self.cholesky.T @ self.y)), constraints)
+
+    def solve(self, expected_returns, covariance, risk_free_rate):
+        if (expected_returns <= risk_free_rate).all():
+            return None  # No portfolio beats the risk-free rate in this sample
+        self.excess_returns.value = expected_returns - risk_free_rate
+        # A small ridge keeps the factorisation defined for near-singular samples
+        self.cholesky.value = np.linalg.cholesky(covariance + 1e-10 * np.eye(len(covariance)))
+        try:
+            self.problem.solve(solver=cp.OSQP, warm_start=True, eps_abs=1e-9, eps_rel=1e-9, max_iter=20000)
+        except cp.error.SolverError:
+            return None
+        if self.problem.status not in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE) or self.k.value is None \
+                or self.k.value <= 0:
+            return None
+        weights = np.clip(self.y.value / self.k.value, 0, None)
+        return weights / weights.sum()
+
+
+def resample_weights(task):
+    # One chunk of resamples. Every sample draws from its own seed, so the result does not depend on how the
+    # samples were split between workers.
+    global _worker_problem
+    returns = _worker_returns
+    n_days, n_assets = returns.shape
+    problem_key = (n_assets, tuple(sorted(task["lower_bounds"].items())), tuple(sorted(task["upper_bounds"].items())))
+    if _worker_problem is None or _worker_problem[0] != problem_key:
+        _worker_problem = (problem_key, MaxSharpeProblem(n_assets, task["lower_bounds"], task["upper_bounds"]))
+    problem = _worker_problem[1]
+
+    block_size = task["block_size"]
+    weights = np.full((len(task["seeds"]), n_assets), np.nan)
+    for sample, seed in enumerate(task["seeds"]):
+        rng = np.random.default_rng(seed)
+        # Moving-block bootstrap of the rows (block_size = 1 -> independent days)
+        starts = rng.integers(0, n_days - block_size + 1, size=-(-n_days // block_size))
+        rows = (starts[:, np.newaxis] + np.arange(block_size)).ravel()[:n_days]
+        sample_returns = returns[rows]
+        expected_returns = np.expm1(np.log1p(sample_returns).sum(axis=0) * FREQUENCY / n_days)
+        covariance = CovarianceEstimator.oracle_approximating(
+            CovarianceEstimator.empirical_covariance(sample_returns), n_days) * FREQUENCY
+        sample_weights = problem.solve(expected_returns, covariance, task["risk_free_rate"])
+        if sample_weights is not None:
+            weights[sample] = sample_weights
+    return weights
+
+
+# Resampled efficiency: the max Sharpe portfolio solved on many bootstrap resamples of the returns panel (means and
+# shrunk covariances re-estimated on each, as MeanVarianceEngine estimates them), averaged into one allocation.
+# The spread of the resampled weights gives a confidence interval per asset. Samples are seeded from one
+# SeedSequence, so a given seed reproduces the same weights with any number of workers.
+class ResampledFrontier:
+    MIN_SAMPLES_PER_TASK = 8
+
+    def __init__(self, n_samples=RESAMPLED_FRONTIER_SAMPLES, seed=RESAMPLED_FRONTIER_SEED,
+                 max_workers=RESAMPLED_FRONTIER_MAX_WORKERS, confidence=RESAMPLED_FRONTIER_CONFIDENCE, block_size=1):
+        self.n_samples = n_samples
+        self.seed = seed
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.confidence = confidence
+        self.block_size = block_size
+
+    @staticmethod
+    def bounds(constraints_dict, assets):
+        lower_bounds, upper_bounds = {}, {}
+        for key, weight in (constraints_dict or {}).items():
+            asset, constraint_type = key.split('_')
+            if constraint_type == "max":
+                upper_bounds[assets.index(asset)] = weight
+            elif constraint_type == "min":
+                lower_bounds[assets.index(asset)] = weight
+        return lower_bounds, upper_bounds
+
+    def resample(self, returns_df, constraints_dict=None, risk_free_rate=0.02):
+        assets = list(returns_df.columns)
+        returns = returns_df.to_numpy(dtype=float)
+        lower_bounds, upper_bounds = self.bounds(constraints_dict, assets)
+        seeds = np.random.SeedSequence(self.seed).spawn(self.n_samples)
+        chunk = max(ResampledFrontier.MIN_SAMPLES_PER_TASK, -(-self.n_samples // (4 * self.max_workers)))
+        tasks = [{"seeds": seeds[start:start + chunk], "lower_bounds": lower_bounds, "upper_bounds": upper_bounds,
+                  "risk_free_rate": risk_free_rate, "block_size": self.block_size}
+                 for start in range(0, self.n_samples, chunk)]
+
+        if self.max_workers == 1 or len(tasks) == 1:
+            _initialize_worker(returns)
+            results = [resample_weights(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks)), initializer=_initialize_worker,
+                                     initargs=(returns,)) as executor:
+                results = list(executor.map(resample_weights, tasks))
+
+        samples = pd.DataFrame(np.vstack(results), columns=assets)
+        failed = int(samples.isna().any(axis=1).sum())
+        if failed:
+            logger.warning("%s of %s resamples had no max Sharpe solution and were left out", failed, self.n_samples)
+        samples = samples.dropna()
+        if samples.empty:
+            raise ValueError("No resample has a portfolio beating the risk-free rate")
+
+        tail = (1 - self.confidence) / 2
+        return {
+            "weights": samples.mean(),
+            "lower": samples.quantile(tail),
+            "upper": samples.quantile(1 - tail),
+            "std": samples.std(),
+            "samples": samples,
+        }
+
+
+# The mean resampled weights as an engine. The confidence intervals are not kept on the (shared) engine; they come
+# with ResampledFrontier.resample for callers that need them.
+class ResampledMeanVarianceEngine(OptimizerEngine):
+
+    def __init__(self, resampled_frontier=None):
+        super().__init__()
+        self.resampled_frontier = resampled_frontier if resampled_frontier is not None else ResampledFrontier()
+
+    def cache_parameters(self):
+        frontier = self.resampled_frontier
+        return (self.name, "mean_historical_return", "oracle_approximating", "max_sharpe", frontier.n_samples,
+                frontier.seed, frontier.block_size)
+
+    def _solve(self, returns_df, constraints_dict, risk_free_rate):
+        resample = self.resampled_frontier.resample(returns_df, constraints_dict, risk_free_rate)
+        cleaned_weights = {asset: round(float(weight), 5) for asset, weight in resample["weights"].items()}
+        return cleaned_weights, self.portfolio_metrics(returns_df, cleaned_weights, risk_free_rate)
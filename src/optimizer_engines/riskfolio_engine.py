@@ -0,0 +1,22 @@
+from src.optimizer_engines.optimizer_engine import OptimizerEngine
+from src.riskfolio_optimizer.mean_risk_optimizer import MeanRiskOptimizer
+from src.riskfolio_optimizer.nested_clustered_optimizer import NestedClusteredOptimizer
+
+
+class RiskfolioMeanRiskEngine(OptimizerEngine):
+
+    def _solve(self, returns_df, constraints_dict, risk_free_rate):
+        # Riskfolio works with per-period returns, so the annual risk-free rate is de-annualised
+        weights = MeanRiskOptimizer().optimize(returns_df, risk_free_rate=risk_free_rate / 252,
+                                               constraints_dict=constraints_dict)
+        cleaned_weights = {asset: round(weight, 5) for asset, weight in weights.items()}
+        return cleaned_weights, self.portfolio_metrics(returns_df, cleaned_weights, risk_free_rate)
+
+
+class RiskfolioHierarchicalEngine(OptimizerEngine):
+
+    def _solve(self, returns_df, constraints_dict, risk_free_rate):
+        weights = NestedClusteredOptimizer().optimize(returns_df, risk_free_rate=risk_free_rate / 252,
+                                                      constraints_dict=constraints_dict)
+        cleaned_weights = {asset: round(weight, 5) for asset, weight in weights.items()}
+        return cleaned_weights, self.portfolio_metrics(returns_df, cleaned_weights, risk_free_rate)
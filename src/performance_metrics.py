@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from src.market_data.risk_free_rate_series import RiskFreeRateSeries
+
+
+# Annualised Sharpe / Sortino ratios and downside deviations for every column of a daily returns panel at once.
+# risk_free_rate: annual scalar (fast path) or a daily series of annual rates, aligned to the returns index
+class PerformanceMetrics:
+    FREQUENCY = 252
+
+    @staticmethod
+    def excess_returns(returns_df, risk_free_rate=0.0):
+        if isinstance(risk_free_rate, pd.Series):
+            return RiskFreeRateSeries.excess_returns(returns_df, risk_free_rate)
+        return returns_df - ((1 + risk_free_rate) ** (1 / PerformanceMetrics.FREQUENCY) - 1)
+
+    @staticmethod
+    def downside_deviations(returns_df, risk_free_rate=0.0):
+        excess_returns = PerformanceMetrics.excess_returns(returns_df, risk_free_rate).to_numpy(dtype=float)
+        downside = np.sqrt(np.nanmean(np.square(np.fmin(excess_returns, 0)), axis=0) * PerformanceMetrics.FREQUENCY)
+        return pd.Series(downside, index=returns_df.columns)
+
+    @staticmethod
+    def sharpe_ratios(returns_df, risk_free_rate=0.0):
+        excess_returns = PerformanceMetrics.excess_returns(returns_df, risk_free_rate)
+        annual_excess_returns = excess_returns.mean() * PerformanceMetrics.FREQUENCY
+        annual_volatility = returns_df.std() * np.sqrt(PerformanceMetrics.FREQUENCY)
+        return annual_excess_returns / annual_volatility.replace(0, np.nan)
+
+    @staticmethod
+    def sortino_ratios(returns_df, risk_free_rate=0.0):
+        excess_returns = PerformanceMetrics.excess_returns(returns_df, risk_free_rate)
+        annual_excess_returns = excess_returns.mean() * PerformanceMetrics.FREQUENCY
+        downside_deviations = PerformanceMetrics.downside_deviations(returns_df, risk_free_rate)
+        return annual_excess_returns / downside_deviations.replace(0, np.nan)
+
+    @staticmethod
+    def summary(returns_df, risk_free_rate=0.0):
+        return pd.DataFrame({
+            "Sharpe Ratio": PerformanceMetrics.sharpe_ratios(returns_df, risk_free_rate),
+            "Sortino Ratio": PerformanceMetrics.sortino_ratios(returns_df, risk_free_rate),
+            "Downside Deviation": PerformanceMetrics.downside_deviations(returns_df, risk_free_rate),
+        })
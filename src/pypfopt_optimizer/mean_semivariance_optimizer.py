@@ -1,20 +1,74 @@
-
+import logging
+import numpy as np
+import pandas as pd
 from pypfopt import EfficientSemivariance, expected_returns
+from sklearn.cluster import KMeans
+
+from src.resample_rules import MONTH_END_RULE
+
+logger = logging.getLogger(__name__)
+
+
 class MeanSemivarianceOptimizer:
+    FREQUENCY = 252
+    AGGREGATION_FREQUENCIES = {"weekly": ("W", 52), "monthly": (MONTH_END_RULE, 12)}
+    DEFAULT_N_SCENARIOS = 120
+
     def __init__(self):
         pass
 
     def mean_historical_returns(self, prices):
         return expected_returns.mean_historical_return(prices)
 
+    def mean_historical_returns_by_returns(self, returns):
+        return expected_returns.mean_historical_return(returns, returns_data=True)
+
     def returns_form_prices(self, prices):
         return expected_returns.returns_from_prices(prices)
 
-    def optimize_max_quadratic_utility(self, expected_returns, returns_df, risk_free_rate=0.02, constraints_dict=None):
+    # scenario_reduction = None -> Every daily observation is a scenario (one auxiliary variable pair per day)
+    # scenario_reduction = "weekly" / "monthly" -> Compounded period returns, annualised with 52 / 12 periods
+    # scenario_reduction = "cluster" -> n_scenarios k-means centroids of the daily returns, weighted by cluster size
+    def reduce_scenarios(self, returns_df, scenario_reduction=None, n_scenarios=DEFAULT_N_SCENARIOS, random_state=0):
+        if scenario_reduction is None:
+            return returns_df, MeanSemivarianceOptimizer.FREQUENCY
+
+        if scenario_reduction in MeanSemivarianceOptimizer.AGGREGATION_FREQUENCIES:
+            rule, frequency = MeanSemivarianceOptimizer.AGGREGATION_FREQUENCIES[scenario_reduction]
+            period_returns = np.exp(np.log1p(returns_df).resample(rule).sum()) - 1
+            return period_returns, frequency
+
+        if scenario_reduction == "cluster":
+            n_observations = len(returns_df)
+            if n_scenarios >= n_observations:
+                return returns_df, MeanSemivarianceOptimizer.FREQUENCY
+            kmeans = KMeans(n_clusters=n_scenarios, n_init=1, random_state=random_state).fit(returns_df.to_numpy())
+            counts = np.bincount(kmeans.labels_, minlength=n_scenarios)
+            # With a zero benchmark, min(0, s * r @ w) ** 2 == s ** 2 * min(0, r @ w) ** 2, so scaling each centroid
+            # by sqrt(count * K / T) makes the K-row semivariance a weighted version of the T-row one
+            scale = np.sqrt(counts * n_scenarios / n_observations)
+            centroids = kmeans.cluster_centers_ * scale[:, np.newaxis]
+            return pd.DataFrame(centroids, columns=returns_df.columns), MeanSemivarianceOptimizer.FREQUENCY
+
+        raise ValueError(f"Unknown scenario reduction '{scenario_reduction}'. "
+                         f"Expected None, 'weekly', 'monthly' or 'cluster'.")
+
+    def optimize_by_returns(self, returns_df, risk_free_rate=0.02, constraints_dict=None, scenario_reduction=None,
+                            n_scenarios=DEFAULT_N_SCENARIOS, risk_aversion=1, solver=None, verbose=True):
+        expected_returns_series = self.mean_historical_returns_by_returns(returns_df)
+        reduced_returns_df, frequency = self.reduce_scenarios(returns_df, scenario_reduction, n_scenarios)
+        return self.optimize_max_quadratic_utility(expected_returns_series, reduced_returns_df,
+                                                   risk_free_rate=risk_free_rate, constraints_dict=constraints_dict,
+                                                   frequency=frequency, risk_aversion=risk_aversion, solver=solver,
+                                                   verbose=verbose)
+
+    def optimize_max_quadratic_utility(self, expected_returns, returns_df, risk_free_rate=0.02, constraints_dict=None,
+                                       frequency=FREQUENCY, risk_aversion=1, solver=None, verbose=True):
 
-        # TODO: Align the expected returns with the returns_df
+        # Align the expected returns with the returns_df
+        expected_returns = expected_returns.reindex(returns_df.columns)
 
-        es = EfficientSemivariance(expected_returns, returns_df)
+        es = EfficientSemivariance(expected_returns, returns_df, frequency=frequency, solver=solver)
 
         if constraints_dict is not None:
             for key, weight in constraints_dict.items():
@@ -25,13 +79,14 @@ class MeanSemivarianceOptimizer:
                 elif constraint_type == "min":
                     es.add_constraint(lambda w, idx=asset_index, wgt=weight: w[idx] >= wgt)
 
-        weights = es.max_quadratic_utility()
+        weights = es.max_quadratic_utility(risk_aversion=risk_aversion)
         cleaned_weights = es.clean_weights()
-        print(cleaned_weights)
-        expected_annual_return, semideviation, sortino_ratio = es.portfolio_performance(verbose=True,
+        expected_annual_return, semideviation, sortino_ratio = es.portfolio_performance(verbose=False,
                                                                                           risk_free_rate=risk_free_rate)
-        print(
-            f"Expected Annual Return: {round(expected_annual_return * 100, 2)}% Semideviation: {round(semideviation * 100, 2)}% Sortino Ratio: {round(sortino_ratio, 2)}")
+        if verbose:
+            logger.info("%s", cleaned_weights)
+            logger.info("Expected Annual Return: %.2f%% Semideviation: %.2f%% Sortino Ratio: %.2f",
+                        expected_annual_return * 100, semideviation * 100, sortino_ratio)
         portfolio_metrics = {
             "Expected Annual Return": expected_annual_return,
             "Semideviation": semideviation,
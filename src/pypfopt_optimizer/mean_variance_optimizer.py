@@ -1,5 +1,13 @@
+import logging
 import pandas as pd
 from pypfopt import EfficientFrontier, risk_models, expected_returns
+
+from src.covariance.covariance_estimator import CovarianceEstimator
+from src.global_settings import NATIVE_COVARIANCE_ESTIMATOR
+
+logger = logging.getLogger(__name__)
+
+
 class MeanVarianceOptimizer:
     def __init__(self):
         pass
@@ -16,7 +24,12 @@ class MeanVarianceOptimizer:
 
         return covariance, correlation
 
-    def covariance_correlation_matrix_by_returns(self, returns, method='oracle_approximating'):
+    def covariance_correlation_matrix_by_returns(self, returns, method='oracle_approximating', block_size=None,
+                                                 native=NATIVE_COVARIANCE_ESTIMATOR):
+        # The native estimators need a complete panel; pypfopt handles missing values pairwise / by zero-filling
+        if native and method in CovarianceEstimator.METHODS and not returns.isna().to_numpy().any():
+            return CovarianceEstimator(method, block_size=block_size).estimate(returns)
+
         covariance = risk_models.risk_matrix(returns, returns_data=True, method=method)
         correlation = risk_models.cov_to_corr(covariance)
 
@@ -27,7 +40,7 @@ class MeanVarianceOptimizer:
     #     "GOOG_min": 0.05
     # }
     def optimize_max_sharpe_ratio(self, expected_returns_series, covariance_matrix, risk_free_rate=0.02,
-                                 constraints_dict=None):
+                                 constraints_dict=None, verbose=True):
         # Verifying alignment
         asset_order = covariance_matrix.columns.tolist()
         expected_returns_series = expected_returns_series.reindex(asset_order)
@@ -45,12 +58,12 @@ class MeanVarianceOptimizer:
 
         weights = ef.max_sharpe(risk_free_rate=risk_free_rate)
         cleaned_weights = ef.clean_weights()
-        print(cleaned_weights)
-        expected_annual_return, annual_volatility, sharp_ratio = ef.portfolio_performance(verbose=True,
+        expected_annual_return, annual_volatility, sharp_ratio = ef.portfolio_performance(verbose=False,
                                                                                           risk_free_rate=risk_free_rate)
-        print(
-            f"Expected Annual Return: {round(expected_annual_return * 100, 2)}% Annual Volatility: {round(annual_volatility * 100, 2)}% Sharpe Ratio: {round(sharp_ratio, 2)}")
-        print("--------------------------------------------------")
+        if verbose:
+            logger.info("%s", cleaned_weights)
+            logger.info("Expected Annual Return: %.2f%% Annual Volatility: %.2f%% Sharpe Ratio: %.2f",
+                        expected_annual_return * 100, annual_volatility * 100, sharp_ratio)
         portfolio_metrics = {
             "Expected Annual Return": expected_annual_return,
             "Annual Volatility": annual_volatility,
@@ -59,7 +72,7 @@ class MeanVarianceOptimizer:
         return dict(cleaned_weights), portfolio_metrics
 
     def optimize_efficient_risk(self, expected_returns_series, covariance_matrix, target_volatility, risk_free_rate=0.02,
-                                 constraints_dict=None):
+                                 constraints_dict=None, verbose=True):
         # Verifying alignment
         asset_order = covariance_matrix.columns.tolist()
         expected_returns_series = expected_returns_series.reindex(asset_order)
@@ -77,11 +90,12 @@ class MeanVarianceOptimizer:
 
         weights = ef.efficient_risk(target_volatility)
         cleaned_weights = ef.clean_weights()
-        print(cleaned_weights)
-        expected_annual_return, annual_volatility, sharp_ratio = ef.portfolio_performance(verbose=True,
+        expected_annual_return, annual_volatility, sharp_ratio = ef.portfolio_performance(verbose=False,
                                                                                           risk_free_rate=risk_free_rate)
-        print(
-            f"Expected Annual Return: {round(expected_annual_return * 100, 2)}% Annual Volatility: {round(annual_volatility * 100, 2)}% Sharpe Ratio: {round(sharp_ratio, 2)}")
+        if verbose:
+            logger.info("%s", cleaned_weights)
+            logger.info("Expected Annual Return: %.2f%% Annual Volatility: %.2f%% Sharpe Ratio: %.2f",
+                        expected_annual_return * 100, annual_volatility * 100, sharp_ratio)
         portfolio_metrics = {
             "Expected Annual Return": expected_annual_return,
             "Annual Volatility": annual_volatility,
@@ -89,7 +103,7 @@ class MeanVarianceOptimizer:
         }
         return dict(cleaned_weights), portfolio_metrics
     def optimize_efficient_return(self, expected_returns_series, covariance_matrix, target_return, risk_free_rate=0.02,
-                                 constraints_dict=None):
+                                 constraints_dict=None, verbose=True):
         # Verifying alignment
         asset_order = covariance_matrix.columns.tolist()
         expected_returns_series = expected_returns_series.reindex(asset_order)
@@ -107,11 +121,12 @@ class MeanVarianceOptimizer:
 
         weights = ef.efficient_return(target_return)
         cleaned_weights = ef.clean_weights()
-        print(cleaned_weights)
-        expected_annual_return, annual_volatility, sharp_ratio = ef.portfolio_performance(verbose=True,
+        expected_annual_return, annual_volatility, sharp_ratio = ef.portfolio_performance(verbose=False,
                                                                                           risk_free_rate=risk_free_rate)
-        print(
-            f"Expected Annual Return: {round(expected_annual_return * 100, 2)}% Annual Volatility: {round(annual_volatility * 100, 2)}% Sharpe Ratio: {round(sharp_ratio, 2)}")
+        if verbose:
+            logger.info("%s", cleaned_weights)
+            logger.info("Expected Annual Return: %.2f%% Annual Volatility: %.2f%% Sharpe Ratio: %.2f",
+                        expected_annual_return * 100, annual_volatility * 100, sharp_ratio)
         portfolio_metrics = {
             "Expected Annual Return": expected_annual_return,
             "Annual Volatility": annual_volatility,
@@ -0,0 +1,152 @@
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+# Reports are written to files, never shown: select the non-interactive backend before pyplot is imported so that
+# the third-party plots saved below do not need a display (batch workers, the service, CI)
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from src.global_settings import REPORT_OUTPUT_DIR, REPORT_MAX_WORKERS, REPORT_MAX_POINTS, REPORT_TICKERS_PER_PAGE, \
+    DIVIDEND_TYPE
+
+logger = logging.getLogger(__name__)
+
+
+def render_chart(job):
+    # Figures are built with the object-oriented API, not pyplot: nothing is registered with a GUI backend, the
+    # file is drawn by the Agg canvas and the figure is freed with the job
+    n_panels = len(job["panels"])
+    figure = Figure(figsize=(job.get("width", 15), job.get("panel_height", 3) * n_panels), dpi=job.get("dpi", 100))
+    axes = figure.subplots(n_panels, 1, squeeze=False)[:, 0]
+    for axis, panel in zip(axes, job["panels"]):
+        for label, (dates, values) in panel["lines"].items():
+            axis.plot(dates, values, label=label, linewidth=0.8)
+        axis.set_title(panel["title"])
+        axis.set_ylabel(panel.get("ylabel", ""))
+        axis.grid(True)
+        if len(panel["lines"]) > 1:
+            axis.legend(loc="upper left", fontsize="small")
+    if job.get("title"):
+        figure.suptitle(job["title"])
+    figure.tight_layout()
+    figure.savefig(job["path"], format=job.get("format", "png"))
+    return job["path"]
+
+
+# Headless reports of a portfolio, written to files instead of shown. Charts are split into jobs of at most
+# tickers_per_page panels per page and category, long series are downsampled to max_points per line, and the jobs
+# are rendered in worker processes (max_workers = 1 renders in this process).
+class ReportRenderer:
+    def __init__(self, output_dir=REPORT_OUTPUT_DIR, max_workers=REPORT_MAX_WORKERS, max_points=REPORT_MAX_POINTS,
+                 tickers_per_page=REPORT_TICKERS_PER_PAGE, image_format="png", dpi=100):
+        self.output_dir = output_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_points = max_points
+        self.tickers_per_page = tickers_per_page
+        self.image_format = image_format
+        self.dpi = dpi
+
+    @staticmethod
+    def downsample(series, max_points=REPORT_MAX_POINTS):
+        # Keeps the minimum and maximum of each of max_points / 2 equal buckets, so spikes survive the reduction
+        series = series.dropna()
+        if max_points is None or len(series) <= max_points:
+            return series
+        buckets = max(max_points // 2, 1)
+        bucket_size = -(-len(series) // buckets)
+        values = np.full(buckets * bucket_size, np.nan)
+        values[:len(series)] = series.to_numpy(dtype=float)
+        values = values.reshape(buckets, bucket_size)
+        filled = ~np.isnan(values).all(axis=1)
+        offsets = np.flatnonzero(filled) * bucket_size
+        positions = np.unique(np.concatenate([offsets + np.nanargmin(values[filled], axis=1),
+                                              offsets + np.nanargmax(values[filled], axis=1)]))
+        return series.iloc[positions]
+
+    def __line(self, series):
+        series = self.downsample(series, self.max_points)
+        return series.index.to_numpy(), series.to_numpy(dtype=float)
+
+    def __path(self, *parts):
+        name = "_".join(re.sub(r"[^\w.-]+", "_", str(part)).strip("_") for part in parts if part)
+        return os.path.join(self.output_dir, f"{name}.{self.image_format}")
+
+    def __job(self, path, panels, title=None, panel_height=3):
+        return {"path": path, "panels": panels, "title": title, "panel_height": panel_height, "dpi": self.dpi,
+                "format": self.image_format}
+
+    def returns_jobs(self, returns_by_category, prefix=None):
+        # returns_by_category: {category: {ticker: daily returns Series}} -> one page per tickers_per_page tickers
+        jobs = []
+        for category_name, returns in returns_by_category.items():
+            tickers = list(returns)
+            pages = range(0, len(tickers), self.tickers_per_page)
+            for page, start in enumerate(pages, start=1):
+                panels = [{"title": f"Returns of {ticker}", "ylabel": "Returns",
+                           "lines": {ticker: self.__line(returns[ticker])}}
+                          for ticker in tickers[start:start + self.tickers_per_page]]
+                jobs.append(self.__job(self.__path(prefix, "returns", category_name, f"page{page}"), panels,
+                                       title=f"{category_name} ({page}/{len(pages)})"))
+        return jobs
+
+    def lines_job(self, series_by_label, title, name, ylabel="", prefix=None):
+        # Several series on one chart, e.g. the growth of each category
+        panel = {"title": title, "ylabel": ylabel,
+                 "lines": {label: self.__line(series) for label, series in series_by_label.items()}}
+        return self.__job(self.__path(prefix, name), [panel], panel_height=6)
+
+    def portfolio_jobs(self, all_category, dividend_type=DIVIDEND_TYPE, prefix=None):
+        # Returns per category (paginated) and the growth of each category at its final weights
+        returns_by_category, growth = {}, {}
+        for category in all_category.categories:
+            returns, weights = {}, {}
+            for subcategory in category.subcategories:
+                for security in subcategory.securities:
+                    adjusted_returns = security.adjusted_returns_in_series(dividend_type=dividend_type)
+                    if adjusted_returns is not None:
+                        returns[security.ticker] = adjusted_returns
+                        weights[security.ticker] = security.portfolio_asset_weight or 0.0
+            if not returns:
+                continue
+            returns_by_category[category.name] = returns
+            weights = pd.Series(weights, dtype=float)
+            if weights.sum() > 0:
+                category_returns = pd.DataFrame(returns).fillna(0.0) @ (weights / weights.sum())
+                growth[category.name] = (1 + category_returns).cumprod()
+
+        jobs = self.returns_jobs(returns_by_category, prefix=prefix)
+        if growth:
+            jobs.append(self.lines_job(growth, "Growth of 1 by Category", "category_growth", ylabel="Value",
+                                       prefix=prefix))
+        return jobs
+
+    def render(self, jobs):
+        if not jobs:
+            return []
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.max_workers == 1 or len(jobs) == 1:
+            paths = [render_chart(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as executor:
+                paths = list(executor.map(render_chart, jobs))
+        logger.info("Rendered %s report pages to %s", len(paths), self.output_dir)
+        return paths
+
+    def render_portfolio(self, all_category, dividend_type=DIVIDEND_TYPE, prefix=None):
+        return self.render(self.portfolio_jobs(all_category, dividend_type=dividend_type, prefix=prefix))
+
+    def save_figure(self, figure, name):
+        # For figures drawn by third-party helpers (e.g. riskfolio's plots): saved and closed instead of shown
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = self.__path(name)
+        figure.savefig(path, format=self.image_format, dpi=self.dpi)
+        plt.close(figure)
+        logger.info("Saved %s", path)
+        return path
@@ -0,0 +1,8 @@
+import pandas as pd
+
+# pandas 2.2 deprecated the period-end rules "M" and "Y" in favour of "ME" and "YE", which older versions reject
+_pandas_2_2 = tuple(int(part) for part in pd.__version__.split(".")[:2]) >= (2, 2)
+
+MONTH_END_RULE = "ME" if _pandas_2_2 else "M"
+
+YEAR_END_RULE = "YE" if _pandas_2_2 else "Y"
@@ -1,5 +1,7 @@
+import numpy as np
 import riskfolio as rp
-import matplotlib.pyplot as plt
+
+from src.reporting.report_renderer import ReportRenderer
 
 
 class MeanRiskOptimizer:
@@ -8,12 +10,38 @@ class MeanRiskOptimizer:
         pass
 
     def optimize(self, returns_in_series, risk_free_rate=0.02, constraints_dict=None, plot=False):
+        returns_in_series = returns_in_series.copy()
         returns_in_series.index = returns_in_series.index.tz_localize(None)
         port = rp.Portfolio(returns=returns_in_series)
         port.assets_stats(method_mu='JS', method_cov='oas')
+
+        if constraints_dict is not None:
+            # Riskfolio expresses linear constraints as A @ w >= b
+            assets = returns_in_series.columns
+            rows, bounds = [], []
+            for key, weight in constraints_dict.items():
+                asset, constraint_type = key.split('_')  # Splitting the key into asset name and constraint type
+                row = np.zeros(len(assets))
+                if constraint_type == "max":
+                    row[assets.get_loc(asset)] = -1
+                    bounds.append(-weight)
+                elif constraint_type == "min":
+                    row[assets.get_loc(asset)] = 1
+                    bounds.append(weight)
+                else:
+                    continue
+                rows.append(row)
+            if rows:
+                port.ainequality = np.array(rows)
+                port.binequality = np.array(bounds).reshape(-1, 1)
+
         weight = port.optimization(model='Classic', rm='MV', obj='Sharpe', rf=risk_free_rate)
+        if weight is None:
+            raise ValueError("Riskfolio could not find a solution for the mean-risk problem")
 
         if plot:
             rp.excel_report(returns_in_series, weight, rf=risk_free_rate,)
-            fig = rp.plot_table(returns_in_series, weight, MAR=risk_free_rate)
-            plt.show()
\ No newline at end of file
+            ax = rp.plot_table(returns_in_series, weight, MAR=risk_free_rate)
+            ReportRenderer().save_figure(ax.figure, "mean_risk_table")
+
+        return weight['weights'].to_dict()
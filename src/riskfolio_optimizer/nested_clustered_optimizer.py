@@ -1,7 +1,7 @@
+import pandas as pd
 import riskfolio as rp
-import matplotlib
-matplotlib.use('TkAgg')  # Example for the TkAgg backend
-import matplotlib.pyplot as plt
+
+from src.reporting.report_renderer import ReportRenderer
 
 
 class NestedClusteredOptimizer:
@@ -9,10 +9,26 @@ class NestedClusteredOptimizer:
     def __init__(self):
         pass
 
-    def optimize(self, returns_in_series, risk_free_rate=0.02, constraints_dict=None):
-        hcp = rp.HCPortfolio(returns_in_series)
-        weight = hcp.optimization(model='HRP', covariance='ledoit', obj='MinRisk', rm='CVaR', rf=risk_free_rate)
+    def optimize(self, returns_in_series, risk_free_rate=0.02, constraints_dict=None, plot=False):
+        returns_in_series = returns_in_series.copy()
         returns_in_series.index = returns_in_series.index.tz_localize(None)
-        # rp.excel_report(returns_in_series, weight, rf=risk_free_rate,)
-        fig = rp.plot_table(returns_in_series, weight, MAR=risk_free_rate)
-        plt.show()
\ No newline at end of file
+
+        w_max = pd.Series(1.0, index=returns_in_series.columns)
+        w_min = pd.Series(0.0, index=returns_in_series.columns)
+        if constraints_dict is not None:
+            for key, weight in constraints_dict.items():
+                asset, constraint_type = key.split('_')  # Splitting the key into asset name and constraint type
+                if constraint_type == "max":
+                    w_max[asset] = weight
+                elif constraint_type == "min":
+                    w_min[asset] = weight
+
+        hcp = rp.HCPortfolio(returns_in_series, w_max=w_max, w_min=w_min)
+        weight = hcp.optimization(model='HRP', covariance='ledoit', obj='MinRisk', rm='CVaR', rf=risk_free_rate)
+
+        if plot:
+            # rp.excel_report(returns_in_series, weight, rf=risk_free_rate,)
+            ax = rp.plot_table(returns_in_series, weight, MAR=risk_free_rate)
+            ReportRenderer().save_figure(ax.figure, "nested_clustered_table")
+
+        return weight['weights'].to_dict()
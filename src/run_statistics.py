@@ -0,0 +1,84 @@
+import json
+import logging
+import pickle
+from collections import defaultdict
+
+import pandas as pd
+
+from src.global_settings import LOG_LEVEL, QUIET_MODE
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure_logging(level=LOG_LEVEL, quiet=QUIET_MODE):
+    # Called once by the entry point; library modules only create their loggers.
+    # quiet -> Only errors, e.g. for batch runs over thousands of securities
+    logging.basicConfig(level=logging.ERROR if quiet else level, format=LOG_FORMAT, force=True)
+
+
+# Per-run counters of remote requests, response bytes, retries, cache hits / misses and failures, by endpoint
+class RunStatistics:
+    COUNTERS = ("requests", "bytes", "retries", "cache_hits", "cache_misses", "failures")
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def set_default(cls, run_statistics):
+        cls._default = run_statistics
+
+    def __init__(self):
+        self.__counters = defaultdict(lambda: dict.fromkeys(RunStatistics.COUNTERS, 0))
+
+    @staticmethod
+    def response_size(response):
+        # In-memory size of the payload, a cheap stand-in for the bytes on the wire
+        if isinstance(response, (pd.DataFrame, pd.Series)):
+            return int(pd.Series(response.memory_usage(index=True, deep=False)).sum())
+        try:
+            return len(pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return 0
+
+    def record_request(self, endpoint, response=None):
+        self.__counters[endpoint]["requests"] += 1
+        self.__counters[endpoint]["bytes"] += self.response_size(response)
+
+    def record_retry(self, endpoint):
+        self.__counters[endpoint]["retries"] += 1
+
+    def record_cache_hit(self, endpoint):
+        self.__counters[endpoint]["cache_hits"] += 1
+
+    def record_cache_miss(self, endpoint):
+        self.__counters[endpoint]["cache_misses"] += 1
+
+    def record_failure(self, endpoint):
+        self.__counters[endpoint]["failures"] += 1
+
+    def counters(self):
+        return {endpoint: dict(counters) for endpoint, counters in sorted(self.__counters.items())}
+
+    def totals(self):
+        return {counter: sum(counters[counter] for counters in self.__counters.values())
+                for counter in RunStatistics.COUNTERS}
+
+    def to_dataframe(self):
+        return pd.DataFrame.from_dict(self.counters(), orient="index", columns=list(RunStatistics.COUNTERS))
+
+    def export(self, path=None):
+        statistics = {"totals": self.totals(), "endpoints": self.counters()}
+        logger.info("Run statistics: %s", statistics["totals"])
+        if path is not None:
+            with open(path, 'w') as file:
+                json.dump(statistics, file, indent=2)
+        return statistics
+
+    def reset(self):
+        self.__counters.clear()
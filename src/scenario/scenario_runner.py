@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.global_settings import CATEGORY_CONSTRAINTS, SUB_CATEGORY_CONSTRAINTS, DIVIDEND_TYPE
+from src.hierarchical_allocator import HierarchicalAllocator
+from src.categories.sub_categories.securities.security import Security
+
+_worker_hierarchy = None
+_worker_panels = None
+_worker_index = None
+
+
+def _initialize_worker(hierarchy, panels, index):
+    # The returns panels are shipped to each worker once instead of once per scenario
+    global _worker_hierarchy, _worker_panels, _worker_index
+    _worker_hierarchy = hierarchy
+    _worker_panels = panels
+    _worker_index = index
+
+
+def run_scenario(settings):
+    allocator = HierarchicalAllocator(_worker_hierarchy,
+                                      sub_category_constraints=settings["SUB_CATEGORY_CONSTRAINTS"],
+                                      category_constraints=settings["CATEGORY_CONSTRAINTS"],
+                                      risk_free_rate=settings["RISK_FREE_RATE"])
+    try:
+        allocation = allocator.allocate(_worker_panels[settings["DIVIDEND_TYPE"]], index=_worker_index)
+    except Exception as e:
+        return {"error": str(e)}
+    allocation["security_weights"] = dict(zip(allocator.tickers, allocation["security_weights"].tolist()))
+    return allocation
+
+
+# scenarios = [
+#     {"name": "Base"},
+#     {"name": "High rates", "RISK_FREE_RATE": 0.05},
+#     {"name": "Less alternative", "CATEGORY_CONSTRAINTS": {"Alternative_max": 0.1}, "DIVIDEND_TYPE": "simple"},
+# ]
+# Any setting not overridden keeps its global_settings value; overrides replace the whole setting.
+class ScenarioRunner:
+    OVERRIDABLE_SETTINGS = ("CATEGORY_CONSTRAINTS", "SUB_CATEGORY_CONSTRAINTS", "RISK_FREE_RATE", "DIVIDEND_TYPE")
+
+    def __init__(self, all_category, max_workers=None):
+        self.all_category = all_category
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.hierarchy = all_category.get_hierarchy()
+        self.tickers = HierarchicalAllocator(self.hierarchy).tickers
+        self.__panels = {}
+        self.__index = None
+        self.__fetched_risk_free_rate = None
+
+    def __returns_panel(self, dividend_type):
+        # Fetching and imputation happen once per dividend type, however many scenarios use it
+        if dividend_type not in self.__panels:
+            returns_df = self.all_category.create_security_returns_dataframe(dividend_type)
+            self.__panels[dividend_type] = returns_df[self.tickers].to_numpy(dtype=float)
+            self.__index = returns_df.index
+        return self.__panels[dividend_type]
+
+    def __resolve_settings(self, scenario):
+        unknown = set(scenario) - set(ScenarioRunner.OVERRIDABLE_SETTINGS) - {"name"}
+        if unknown:
+            raise KeyError(f"Unknown scenario settings: {', '.join(sorted(unknown))}")
+
+        settings = {
+            "CATEGORY_CONSTRAINTS": CATEGORY_CONSTRAINTS,
+            "SUB_CATEGORY_CONSTRAINTS": SUB_CATEGORY_CONSTRAINTS,
+            "DIVIDEND_TYPE": DIVIDEND_TYPE,
+        }
+        settings.update({key: value for key, value in scenario.items() if key != "name"})
+        # The global rate is only resolved for scenarios that do not override it
+        if "RISK_FREE_RATE" not in settings:
+            settings["RISK_FREE_RATE"] = Security.get_risk_free_rate()
+
+        # RISK_FREE_RATE = None -> T-Bill 3 Month rate, fetched once for all scenarios
+        if settings["RISK_FREE_RATE"] is None:
+            if self.__fetched_risk_free_rate is None:
+                self.__fetched_risk_free_rate = Security.fetch_risk_free_rate()
+            settings["RISK_FREE_RATE"] = self.__fetched_risk_free_rate
+        return settings
+
+    def run(self, scenarios):
+        names = [scenario.get("name", f"Scenario {i + 1}") for i, scenario in enumerate(scenarios)]
+        settings = [self.__resolve_settings(scenario) for scenario in scenarios]
+        panels = {dividend_type: self.__returns_panel(dividend_type)
+                  for dividend_type in {setting["DIVIDEND_TYPE"] for setting in settings}}
+
+        if self.max_workers == 1 or len(settings) == 1:
+            _initialize_worker(self.hierarchy, panels, self.__index)
+            results = [run_scenario(setting) for setting in settings]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_initialize_worker,
+                                     initargs=(self.hierarchy, panels, self.__index)) as executor:
+                results = list(executor.map(run_scenario, settings,
+                                            chunksize=max(1, len(settings) // (4 * self.max_workers))))
+
+        return self.comparison_table(names, settings, results)
+
+    def comparison_table(self, names, settings, results):
+        rows = []
+        for setting, result in zip(settings, results):
+            row = {("Settings", "Risk Free Rate"): setting["RISK_FREE_RATE"],
+                   ("Settings", "Dividend Type"): setting["DIVIDEND_TYPE"],
+                   ("Metrics", "Error"): result.get("error")}
+            for metric, value in result.get("portfolio_metrics", {}).items():
+                row[("Metrics", metric)] = value
+            for category_name, weight in result.get("category_weights", {}).items():
+                row[("Category Weights", category_name)] = weight
+            for ticker, weight in result.get("security_weights", {}).items():
+                row[("Security Weights", ticker)] = weight
+            rows.append(row)
+
+        table = pd.DataFrame(rows, index=pd.Index(names, name="Scenario"))
+        table.columns = pd.MultiIndex.from_tuples(table.columns)
+        return table
@@ -0,0 +1,143 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.global_settings import HISTORICAL_STRESS_WINDOWS, CATEGORY_SHOCK_SCENARIOS, TOTAL_PORTFOLIO_VALUE, \
+    DIVIDEND_TYPE
+from src.hierarchy_matrices import HierarchyMatrices
+from src.lookback_window import LookbackWindow
+
+logger = logging.getLogger(__name__)
+
+
+# What the final allocation would have done under a library of scenarios, for the portfolio and each category:
+#   historical windows {name: (start, end)}: the stored returns panel replayed over the window, with the final
+#   weights held constant (rebalanced daily)
+#   category shocks {name: {category: return}}: an instant return per category, 0 for the categories not named
+# The panel is mapped to portfolio / category returns with one product against the (securities x levels) exposure
+# matrix, every window's return is a difference of cumulative log-returns, and drawdowns come from one running
+# maximum over all windows at once, in chunks of scenarios.
+# The panel is not imputed: a window that starts before (or ends after) the price history of a held security is
+# reported as not covered, with NaN results and the share of the portfolio weight that does have prices there.
+class StressTester:
+    PORTFOLIO = "Portfolio"
+    CHUNK_SIZE = 2 ** 22  # Scenario-days x levels per chunk of the drawdown computation
+
+    def __init__(self, returns_df, hierarchy_matrices, total_portfolio_value=TOTAL_PORTFOLIO_VALUE):
+        self.hierarchy_matrices = hierarchy_matrices
+        self.total_portfolio_value = total_portfolio_value
+        self.levels = [StressTester.PORTFOLIO] + hierarchy_matrices.category_names
+
+        # Security weights within each category, and in the whole portfolio
+        security_to_category = np.asarray((hierarchy_matrices.security_to_sub_category
+                                           @ hierarchy_matrices.sub_category_to_category).todense())
+        self.exposures = np.column_stack([hierarchy_matrices.final_weights(), security_to_category])
+        self.level_weights = np.concatenate([[1.0], hierarchy_matrices.category_to_portfolio])
+
+        panel = returns_df.reindex(columns=hierarchy_matrices.tickers)
+        self.index = returns_df.index
+        # First and last row of each held security's history
+        available = panel.notna().to_numpy()
+        has_history = available.any(axis=0)
+        first_rows = np.where(has_history, available.argmax(axis=0), len(self.index))
+        last_rows = np.where(has_history, len(self.index) - 1 - available[::-1].argmax(axis=0), -1)
+        held = self.exposures[:, 0] > 0
+        self.held_tickers = np.array(hierarchy_matrices.tickers, dtype=object)[held]
+        self.held_weights = self.exposures[held, 0] / self.exposures[held, 0].sum() if held.any() else np.zeros(0)
+        self.first_rows, self.last_rows = first_rows[held], last_rows[held]
+        # Outside its history a security contributes 0; those windows are masked as not covered
+        returns = panel.fillna(0.0).to_numpy(dtype=float)
+        # Cumulative log growth of each level, with a leading 0 so that a window [s, e] is log_growth[e + 1] - [s]
+        self.log_growth = np.vstack([np.zeros(len(self.levels)), np.cumsum(np.log1p(returns @ self.exposures),
+                                                                           axis=0)])
+
+    @classmethod
+    def from_all_category(cls, all_category, dividend_type=DIVIDEND_TYPE, lookback=LookbackWindow.MAX, **kwargs):
+        # The longest stored history, so that past crises fall inside the panel. Not imputed, so that a security
+        # younger than a crisis gets no fabricated returns for it
+        returns_df = all_category.create_security_returns_dataframe(dividend_type, lookback=lookback, impute=False)
+        return cls(returns_df, HierarchyMatrices.from_all_category(all_category), **kwargs)
+
+    @staticmethod
+    def rolling_windows(index, length=21, step=1):
+        # Every window of length trading days, e.g. all monthly windows of the panel as a scenario library
+        starts = range(0, len(index) - length + 1, step)
+        return {f"{index[start]:%Y-%m-%d} +{length}d": (index[start], index[start + length - 1]) for start in starts}
+
+    def __dates(self, dates):
+        dates = pd.DatetimeIndex(pd.to_datetime(list(dates)))
+        if dates.tz is None and self.index.tz is not None:
+            return dates.tz_localize(self.index.tz)
+        return dates
+
+    def __positions(self, windows):
+        # Window dates to [start, end) rows of the panel, all windows at once
+        names = list(windows)
+        starts = self.index.searchsorted(self.__dates(start for start, _ in windows.values()), side='left')
+        ends = self.index.searchsorted(self.__dates(end for _, end in windows.values()), side='right')
+        inside = ends > starts
+        for name in np.array(names, dtype=object)[~inside]:
+            logger.warning("Stress window %s is outside the returns history (%s to %s)", name,
+                           self.index[0].date(), self.index[-1].date())
+        return [name for name, keep in zip(names, inside) if keep], starts[inside].astype(np.int64), \
+            ends[inside].astype(np.int64)
+
+    def __max_drawdowns(self, starts, ends):
+        # Running maximum of each window's growth path, padded to the longest window with its last value
+        drawdowns = np.empty((len(starts), len(self.levels)))
+        max_length = int((ends - starts).max()) + 1
+        chunk = max(1, StressTester.CHUNK_SIZE // (max_length * len(self.levels)))
+        for first in range(0, len(starts), chunk):
+            chunk_starts, chunk_ends = starts[first:first + chunk], ends[first:first + chunk]
+            positions = np.minimum(chunk_starts[:, np.newaxis] + np.arange(max_length), chunk_ends[:, np.newaxis])
+            paths = self.log_growth[positions]
+            drawdowns[first:first + chunk] = np.expm1((paths - np.maximum.accumulate(paths, axis=1)).min(axis=1))
+        return drawdowns
+
+    def __covered(self, names, starts, ends):
+        # The weight share of the held securities with prices over each window, and the windows not fully covered
+        covering = (self.first_rows <= starts[:, np.newaxis]) & (self.last_rows >= ends[:, np.newaxis] - 1)
+        coverage = covering @ self.held_weights
+        uncovered = ~covering.all(axis=1)
+        if uncovered.any():
+            tickers = self.held_tickers[~covering[uncovered].all(axis=0)]
+            logger.warning("%s of %s stress windows fall outside the price history of %s; reported as not covered",
+                           int(uncovered.sum()), len(names), ", ".join(tickers))
+        return coverage, uncovered
+
+    def __report(self, names, returns, drawdowns, kind, starts=None, ends=None, coverage=1.0):
+        losses = -returns * self.level_weights * self.total_portfolio_value
+        report = pd.concat({"Return": pd.DataFrame(returns, index=names, columns=self.levels),
+                            "Max Drawdown": pd.DataFrame(drawdowns, index=names, columns=self.levels),
+                            "Loss": pd.DataFrame(losses, index=names, columns=self.levels)}, axis=1)
+        report.insert(0, ("Scenario", "Type"), kind)
+        report.insert(1, ("Scenario", "Start"), None if starts is None else self.index[starts].date)
+        report.insert(2, ("Scenario", "End"), None if ends is None else self.index[ends - 1].date)
+        report.insert(3, ("Scenario", "Coverage"), coverage)
+        return report
+
+    def historical(self, windows=HISTORICAL_STRESS_WINDOWS):
+        names, starts, ends = self.__positions(windows)
+        if not names:
+            return self.__report([], np.empty((0, len(self.levels))), np.empty((0, len(self.levels))), "Historical")
+        returns = np.expm1(self.log_growth[ends] - self.log_growth[starts])
+        drawdowns = self.__max_drawdowns(starts, ends)
+        coverage, uncovered = self.__covered(names, starts, ends)
+        returns[uncovered] = drawdowns[uncovered] = np.nan
+        return self.__report(names, returns, drawdowns, "Historical", starts, ends, coverage)
+
+    def shocks(self, category_shocks=CATEGORY_SHOCK_SCENARIOS):
+        names = list(category_shocks)
+        categories = self.hierarchy_matrices.category_names
+        unknown = {category for shocks in category_shocks.values() for category in shocks} - set(categories)
+        if unknown:
+            raise KeyError(f"Shocks for unknown categories: {', '.join(sorted(unknown))}")
+        shocks = np.array([[category_shocks[name].get(category, 0.0) for category in categories] for name in names],
+                          dtype=float).reshape(len(names), len(categories))
+        # Portfolio return = category weights @ shocks; each category's return is its own shock
+        returns = shocks @ np.column_stack([self.hierarchy_matrices.category_to_portfolio, np.eye(len(categories))])
+        return self.__report(names, returns, np.minimum(returns, 0.0), "Shock")
+
+    def run(self, windows=HISTORICAL_STRESS_WINDOWS, category_shocks=CATEGORY_SHOCK_SCENARIOS):
+        return pd.concat([self.historical(windows), self.shocks(category_shocks)])
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import squareform
+
+from src.global_settings import CORRELATION_SCREENING_THRESHOLD
+
+
+class CorrelationScreen:
+    # The outcome of a screening: each composite is a fixed blend of its members (members x composites matrix with
+    # columns summing to 1), so composite returns and covariances are exact linear maps of the members' and the
+    # composite weights map back down to member weights the same way.
+    COMPOSITE_SEPARATOR = "+"
+
+    def __init__(self, names, groups, member_weights):
+        self.names = list(names)
+        self.groups = [list(group) for group in groups]
+        self.member_to_composite = np.zeros((len(self.names), len(self.groups)))
+        for column, group in enumerate(self.groups):
+            self.member_to_composite[group, column] = member_weights[group] / member_weights[group].sum()
+        self.composite_names = [CorrelationScreen.COMPOSITE_SEPARATOR.join(self.names[member] for member in group)
+                                for group in self.groups]
+
+    @property
+    def is_reduced(self):
+        return len(self.groups) < len(self.names)
+
+    def composite_returns(self, returns):
+        # returns: (days x members) array or DataFrame with the members as columns
+        if isinstance(returns, pd.DataFrame):
+            return pd.DataFrame(returns[self.names].to_numpy(dtype=float) @ self.member_to_composite,
+                                index=returns.index, columns=self.composite_names)
+        return returns @ self.member_to_composite
+
+    def composite_covariance(self, covariance):
+        return self.member_to_composite.T @ covariance @ self.member_to_composite
+
+    def composite_constraints(self, constraints_dict):
+        # Members with their own bounds are never merged, so their bounds carry over under their own name
+        if constraints_dict is None:
+            return None
+        composite_names = set(self.composite_names)
+        return {key: weight for key, weight in constraints_dict.items() if key.split('_')[0] in composite_names}
+
+    def expand(self, composite_weights):
+        # Composite weights (array or {composite: weight}) to member weights of the same type
+        if isinstance(composite_weights, dict):
+            weights = np.array([composite_weights[name] for name in self.composite_names], dtype=float)
+            return dict(zip(self.names, (self.member_to_composite @ weights).tolist()))
+        return self.member_to_composite @ composite_weights
+
+
+# Collapses near-duplicate assets (e.g. ETFs tracking the same index) before an optimization: assets whose
+# pairwise return correlations are all at least threshold (complete linkage) become one composite, blended by
+# inverse variance, which is how a minimum-variance portfolio would split near-identical assets anyway. This keeps
+# the covariance the optimizer sees well conditioned and its problem small. Assets named in the constraints stay
+# on their own, so their bounds still hold after the weights are mapped back.
+class CorrelationScreener:
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls(CORRELATION_SCREENING_THRESHOLD)
+        return cls._default
+
+    @classmethod
+    def set_default(cls, screener):
+        cls._default = screener
+
+    def __init__(self, threshold=CORRELATION_SCREENING_THRESHOLD):
+        self.threshold = threshold
+
+    def screen(self, covariance, names, constraints_dict=None):
+        covariance = np.asarray(covariance, dtype=float)
+        n_assets = len(names)
+        variances = np.diag(covariance)
+        singletons = [[asset] for asset in range(n_assets)]
+        if self.threshold is None or n_assets < 2 or not (variances > 0).all():
+            return CorrelationScreen(names, singletons, np.ones(n_assets))
+
+        standard_deviations = np.sqrt(variances)
+        correlation = np.clip(covariance / np.outer(standard_deviations, standard_deviations), -1, 1)
+        constrained = {key.split('_')[0] for key in (constraints_dict or {})}
+        distance = 1 - correlation
+        # Constrained assets are pushed out of every cluster
+        for asset, name in enumerate(names):
+            if name in constrained:
+                distance[asset, :] = distance[:, asset] = 2
+        np.fill_diagonal(distance, 0)
+        labels = fcluster(linkage(squareform(distance, checks=False), method='complete'),
+                          t=1 - self.threshold, criterion='distance')
+
+        groups = {}
+        for asset, label in enumerate(labels):
+            groups.setdefault(label, []).append(asset)
+        # Composites keep the position of their first member
+        groups = sorted(groups.values(), key=lambda group: group[0])
+        return CorrelationScreen(names, groups, 1 / variances)
+
+    def screen_returns(self, returns_df, constraints_dict=None):
+        if self.threshold is None:
+            return CorrelationScreen(list(returns_df.columns), [[asset] for asset in range(len(returns_df.columns))],
+                                     np.ones(len(returns_df.columns)))
+        return self.screen(np.cov(returns_df.to_numpy(dtype=float), rowvar=False, ddof=0).reshape(
+            len(returns_df.columns), len(returns_df.columns)), list(returns_df.columns), constraints_dict)
@@ -0,0 +1,322 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from src.all_category import AllCategory
+from src.categories.sub_categories.securities.security import Security
+from src.categories.sub_categories.securities.security_store import SecurityStore
+from src.covariance.covariance_estimator import CovarianceEstimator
+from src.data_quality.data_quality_validator import DataQualityValidator
+from src.fill_nan_dataframe_knn import fill_nan_dataframe_knn
+from src.global_settings import CATEGORY_CONSTRAINTS, SUB_CATEGORY_CONSTRAINTS, DIVIDEND_TYPE, DATA_QUALITY_ACTION, \
+    DEFAULT_LOOKBACK, SERVICE_HOST, SERVICE_PORT, SERVICE_REFRESH_INTERVAL_SECONDS
+from src.hierarchical_allocator import HierarchicalAllocator
+from src.lookback_window import LookbackWindow
+from src.run_statistics import RunStatistics, configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+class _UniverseSnapshot:
+    # The market data of the service's universe at one point in time: the imputed returns panel per dividend type
+    # and the empirical covariance per (dividend type, lookback), built on first use. Built panels and covariances
+    # never change, so requests read them without waiting for a refresh; a refresh publishes a new snapshot.
+    # The store is shared with the later snapshots that add new tickers to it, and reading it can write to it
+    # (lazily computed fields, buffer compaction), so every access to it holds store_lock.
+    def __init__(self, version, store, store_lock, securities, data_quality_report, risk_free_rate):
+        self.version = version
+        self.created_at = pd.Timestamp.now(tz="UTC")
+        self.store = store
+        self.store_lock = store_lock
+        self.securities = securities
+        self.data_quality_report = data_quality_report
+        self.risk_free_rate = risk_free_rate
+        self.__panels = {}
+        self.__covariances = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def tickers(self):
+        return list(self.securities)
+
+    @property
+    def excluded_tickers(self):
+        if DATA_QUALITY_ACTION != "exclude" or self.data_quality_report is None:
+            return []
+        return DataQualityValidator.failed_tickers(self.data_quality_report)
+
+    def panel(self, dividend_type):
+        # (panel, index, {ticker: column}) of the securities with returns, imputed over the whole universe
+        with self.__lock:
+            if dividend_type not in self.__panels:
+                excluded = set(self.excluded_tickers)
+                returns_df = pd.DataFrame()
+                with self.store_lock:
+                    for ticker, security in self.securities.items():
+                        if ticker in excluded:
+                            continue
+                        adjusted_returns = security.adjusted_returns_in_series(dividend_type=dividend_type)
+                        if adjusted_returns is not None:
+                            returns_df[ticker] = adjusted_returns
+                returns_df = fill_nan_dataframe_knn(returns_df).round(5)
+                self.__panels[dividend_type] = (returns_df.to_numpy(dtype=float), returns_df.index,
+                                                {ticker: column for column, ticker in enumerate(returns_df.columns)})
+            return self.__panels[dividend_type]
+
+    def covariance(self, dividend_type, lookback):
+        # The covariance of any subset of tickers is the matching block of the universe covariance
+        panel, index, _ = self.panel(dividend_type)
+        with self.__lock:
+            key = (dividend_type, lookback)
+            if key not in self.__covariances:
+                start = LookbackWindow.start_position(index, lookback)
+                self.__covariances[key] = CovarianceEstimator.empirical_covariance(panel[start:])
+            return self.__covariances[key]
+
+
+# Keeps the market data, returns panels, covariances and recent results of every ticker it has been asked about in
+# memory, so an allocation request only pays for the optimization itself. Tickers not seen before are fetched on
+# the request that first needs them. A background thread rebuilds the whole universe every refresh_interval
+# seconds into a new store and swaps it in when it is ready; requests keep using the previous snapshot meanwhile.
+class AllocationService:
+    RESPONSE_CACHE_SIZE = 256
+
+    def __init__(self, refresh_interval=SERVICE_REFRESH_INTERVAL_SECONDS, dividend_type=DIVIDEND_TYPE):
+        self.refresh_interval = refresh_interval
+        self.dividend_type = dividend_type
+        self.__snapshot = None
+        self.__version = 0
+        self.__build_lock = threading.Lock()  # One universe build at a time: a refresh or new tickers
+        self.__responses = OrderedDict()
+        self.__responses_lock = threading.Lock()
+        self.__refresh_requested = threading.Event()
+        self.__stopped = False
+        self.__refresh_thread = None
+
+    @property
+    def snapshot(self):
+        return self.__snapshot
+
+    def __build_snapshot(self, tickers, store, store_lock, securities, risk_free_rate):
+        # Fetches and prepares the tickers missing from securities into store, then publishes a snapshot
+        previous_report = None if self.__snapshot is None or self.__snapshot.store is not store \
+            else self.__snapshot.data_quality_report
+        report = previous_report
+        with store_lock:
+            new_securities = [Security(ticker, "Service", 100, store=store) for ticker in tickers
+                              if ticker not in securities]
+            if new_securities:
+                if DATA_QUALITY_ACTION is not None:
+                    new_report = AllCategory.validate_close_prices(new_securities)
+                    for ticker in DataQualityValidator.failed_tickers(new_report):
+                        logger.warning("Data quality check failed for %s: %s", ticker,
+                                       new_report.at[ticker, DataQualityValidator.ISSUES])
+                    report = new_report if report is None else pd.concat([report, new_report])
+                if self.dividend_type == "avg":
+                    AllCategory.fetch_dividend_yields_for(new_securities)
+                store.compact()
+
+        securities = {**securities, **{security.ticker: security for security in new_securities}}
+        self.__version += 1
+        snapshot = _UniverseSnapshot(self.__version, store, store_lock, securities, report, risk_free_rate)
+        snapshot.panel(self.dividend_type)
+        self.__snapshot = snapshot
+        logger.info("Published market data version %s for %s tickers", snapshot.version, len(securities))
+        return snapshot
+
+    def ensure_tickers(self, tickers):
+        snapshot = self.__snapshot
+        if snapshot is not None and all(ticker in snapshot.securities for ticker in tickers):
+            return snapshot
+        with self.__build_lock:
+            snapshot = self.__snapshot
+            if snapshot is None:
+                return self.__build_snapshot(tickers, SecurityStore(), threading.Lock(), {},
+                                             Security.get_risk_free_rate())
+            if all(ticker in snapshot.securities for ticker in tickers):
+                return snapshot
+            # Only the new tickers are fetched; the others keep their rows in the current store, under its lock
+            return self.__build_snapshot(tickers, snapshot.store, snapshot.store_lock, snapshot.securities,
+                                         snapshot.risk_free_rate)
+
+    def refresh(self):
+        # Refetches the whole universe into a fresh store, so the published snapshot is untouched until the swap
+        with self.__build_lock:
+            snapshot = self.__snapshot
+            if snapshot is None:
+                return None
+            risk_free_rate = Security.refresh_risk_free_rate()
+            if risk_free_rate is None:
+                risk_free_rate = snapshot.risk_free_rate
+            started = time.perf_counter()
+            snapshot = self.__build_snapshot(snapshot.tickers, SecurityStore(), threading.Lock(), {}, risk_free_rate)
+            logger.info("Refreshed market data in %.1fs", time.perf_counter() - started)
+            return snapshot
+
+    def __refresh_loop(self):
+        while not self.__stopped:
+            self.__refresh_requested.wait(self.refresh_interval)
+            self.__refresh_requested.clear()
+            if self.__stopped:
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Market data refresh failed, keeping version %s: %s",
+                             None if self.__snapshot is None else self.__snapshot.version, e)
+
+    def start(self):
+        self.__stopped = False
+        self.__refresh_thread = threading.Thread(target=self.__refresh_loop, name="market-data-refresh",
+                                                 daemon=True)
+        self.__refresh_thread.start()
+
+    def request_refresh(self):
+        self.__refresh_requested.set()
+
+    def stop(self):
+        self.__stopped = True
+        self.__refresh_requested.set()
+
+    def __cached_response(self, key):
+        with self.__responses_lock:
+            response = self.__responses.get(key)
+            if response is not None:
+                self.__responses.move_to_end(key)
+            return response
+
+    def __cache_response(self, key, response):
+        with self.__responses_lock:
+            self.__responses[key] = response
+            while len(self.__responses) > AllocationService.RESPONSE_CACHE_SIZE:
+                self.__responses.popitem(last=False)
+
+    # request: {"holdings": {category: {sub-category: {ticker: weight}}} with weights in fractions like
+    # HierarchicalAllocator's hierarchy, and optionally "category_constraints", "sub_category_constraints",
+    # "risk_free_rate", "lookback", "dividend_type", "top_level_optimizer" and "category_optimizers"}
+    def allocate(self, request):
+        holdings = request.get("holdings")
+        if not holdings:
+            raise ValueError("The request has no holdings")
+        tickers = list(dict.fromkeys(ticker for subcategories in holdings.values()
+                                     for securities in subcategories.values() for ticker in securities))
+        snapshot = self.ensure_tickers(tickers)
+
+        key = (snapshot.version, json.dumps(request, sort_keys=True))
+        response = self.__cached_response(key)
+        if response is not None:
+            RunStatistics.get_default().record_cache_hit("allocation_service")
+            return response
+        RunStatistics.get_default().record_cache_miss("allocation_service")
+
+        dividend_type = request.get("dividend_type", self.dividend_type)
+        lookback = request.get("lookback", DEFAULT_LOOKBACK)
+        panel, index, columns = snapshot.panel(dividend_type)
+        hierarchy = HierarchicalAllocator.restrict_hierarchy(holdings, columns)
+        if not hierarchy:
+            raise ValueError("None of the holdings have returns")
+        allocator_kwargs = {name: request[name] for name in ("top_level_optimizer", "category_optimizers")
+                            if name in request}
+        allocator = HierarchicalAllocator(
+            hierarchy, sub_category_constraints=request.get("sub_category_constraints", SUB_CATEGORY_CONSTRAINTS),
+            category_constraints=request.get("category_constraints", CATEGORY_CONSTRAINTS),
+            risk_free_rate=request.get("risk_free_rate", snapshot.risk_free_rate), **allocator_kwargs)
+
+        positions = [columns[ticker] for ticker in allocator.tickers]
+        start = LookbackWindow.start_position(index, lookback)
+        covariance = snapshot.covariance(dividend_type, lookback)[np.ix_(positions, positions)]
+        allocation = allocator.allocate(panel[start:, positions], empirical_covariance=covariance,
+                                        index=index[start:])
+
+        response = {
+            "security_weights": dict(zip(allocator.tickers, allocation["security_weights"].tolist())),
+            "sub_category_weights": allocation["sub_category_weights"],
+            "category_weights": allocation["category_weights"],
+            "portfolio_metrics": {metric: float(value) for metric, value in allocation["portfolio_metrics"].items()},
+            "excluded_tickers": [ticker for ticker in tickers if ticker not in columns],
+            "risk_free_rate": allocator.risk_free_rate,
+            "data_version": snapshot.version,
+            "data_as_of": snapshot.created_at.isoformat(),
+        }
+        self.__cache_response(key, response)
+        return response
+
+    def health(self):
+        snapshot = self.__snapshot
+        return {
+            "status": "ok",
+            "tickers": 0 if snapshot is None else len(snapshot.securities),
+            "data_version": None if snapshot is None else snapshot.version,
+            "data_as_of": None if snapshot is None else snapshot.created_at.isoformat(),
+            "run_statistics": RunStatistics.get_default().totals(),
+        }
+
+
+class AllocationRequestHandler(BaseHTTPRequestHandler):
+    # POST /allocate with a JSON request body, POST /refresh to refresh the market data now, GET /health
+    service = None
+
+    def __send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.__send_json(200, self.service.health())
+        else:
+            self.__send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path == "/refresh":
+            self.service.request_refresh()
+            self.__send_json(202, {"status": "refresh scheduled"})
+            return
+        if self.path != "/allocate":
+            self.__send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        started = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            response = self.service.allocate(request)
+        except (ValueError, KeyError, TypeError) as e:
+            self.__send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            logger.error("Allocation request failed: %s", e)
+            self.__send_json(500, {"error": str(e)})
+            return
+        self.__send_json(200, {**response, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)})
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, service=None):
+    service = service if service is not None else AllocationService()
+    handler = type("BoundAllocationRequestHandler", (AllocationRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    service.start()
+    logger.info("Allocation service listening on http://%s:%s", host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    configure_logging()
+    serve()
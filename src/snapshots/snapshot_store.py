@@ -0,0 +1,235 @@
+import logging
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from src.global_settings import SNAPSHOT_STORE_PATH, SNAPSHOT_STORE_RETURNS, DIVIDEND_TYPE, TOTAL_PORTFOLIO_VALUE
+
+logger = logging.getLogger(__name__)
+
+
+# Versioned history of the pipeline's results in one SQLite file. Every run appends a new version (run_id) with
+# its as-of date (the last market data date), the per-holding metrics, weights and shares as computed by Security,
+# the category and sub-category weights and, optionally, the adjusted returns the optimization used. Past runs
+# are read back as DataFrames without recomputing anything, queried by run, as-of date, workbook, ticker or
+# category through indexes on those columns.
+class SnapshotStore:
+    SECURITY_FIELDS = ("sub_asset_weight", "name", "category_name", "exchange_name", "traded_currency",
+                       "expense_ratio", "dividend_yield", "avg_dividend_yield", "trailing_dividend_yield",
+                       "geometric_mean_5y", "adjusted_geometric_mean_5y", "standard_deviation_5y",
+                       "downside_deviation_5y", "var_95", "sharpe_ratio", "portfolio_asset_weight",
+                       "portfolio_asset_allocation", "number_of_shares")
+    TEXT_FIELDS = ("name", "category_name", "exchange_name", "traded_currency")
+    __SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            as_of_date TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            workbook TEXT,
+            dividend_type TEXT,
+            risk_free_rate REAL,
+            total_portfolio_value REAL,
+            leftover_cash REAL
+        );
+        CREATE INDEX IF NOT EXISTS runs_by_date ON runs (workbook, as_of_date);
+        CREATE TABLE IF NOT EXISTS securities (
+            run_id INTEGER NOT NULL REFERENCES runs (run_id),
+            ticker TEXT NOT NULL,
+            category TEXT NOT NULL,
+            sub_category TEXT NOT NULL,
+            {security_columns},
+            PRIMARY KEY (run_id, category, sub_category, ticker)
+        );
+        CREATE INDEX IF NOT EXISTS securities_by_ticker ON securities (ticker, run_id);
+        CREATE INDEX IF NOT EXISTS securities_by_category ON securities (category, run_id);
+        CREATE TABLE IF NOT EXISTS weights (
+            run_id INTEGER NOT NULL REFERENCES runs (run_id),
+            category TEXT NOT NULL,
+            sub_category TEXT NOT NULL,  -- '' for the category weight itself
+            weight REAL,
+            PRIMARY KEY (run_id, category, sub_category)
+        );
+        CREATE TABLE IF NOT EXISTS returns (
+            run_id INTEGER NOT NULL REFERENCES runs (run_id),
+            ticker TEXT NOT NULL,
+            date TEXT NOT NULL,
+            value REAL,
+            PRIMARY KEY (run_id, ticker, date)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS returns_by_ticker ON returns (ticker, date);
+    """
+    _default = None
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    @classmethod
+    def set_default(cls, store):
+        cls._default = store
+
+    def __init__(self, path=SNAPSHOT_STORE_PATH, store_returns=SNAPSHOT_STORE_RETURNS):
+        if path is None:
+            raise ValueError("No snapshot store path. Set SNAPSHOT_STORE_PATH to store run snapshots.")
+        self.path = path
+        self.store_returns = store_returns
+        with closing(self.__connect()) as connection:
+            connection.executescript(SnapshotStore.__SCHEMA.format(security_columns=", ".join(
+                f"{field} {'TEXT' if field in SnapshotStore.TEXT_FIELDS else 'REAL'}"
+                for field in SnapshotStore.SECURITY_FIELDS)))
+
+    def __connect(self):
+        return sqlite3.connect(self.path)
+
+    @staticmethod
+    def __value(value):
+        # Plain Python values for sqlite3, which rejects numpy integers
+        if value is None or isinstance(value, str):
+            return value
+        value = float(value)
+        return None if np.isnan(value) else value
+
+    @staticmethod
+    def security_records(all_category):
+        # The values ExcelWriter reports for each holding, computed (or read from the cache) by Security
+        records = []
+        for category in all_category.categories:
+            for subcategory in category.subcategories:
+                for security in subcategory.securities:
+                    record = {"ticker": security.ticker, "category": category.name,
+                              "sub_category": security.sub_category}
+                    for field in SnapshotStore.SECURITY_FIELDS:
+                        record[field] = getattr(security, field)
+                    records.append(record)
+        return records
+
+    @staticmethod
+    def __as_of_date(all_category):
+        last_dates = [security.historical_data.index[-1] for category in all_category.categories
+                      for subcategory in category.subcategories for security in subcategory.securities
+                      if security.historical_data is not None and len(security.historical_data)]
+        return (max(last_dates) if last_dates else pd.Timestamp.today()).strftime("%Y-%m-%d")
+
+    def append(self, all_category, workbook=None, as_of_date=None, risk_free_rate=None,
+               dividend_type=DIVIDEND_TYPE, total_portfolio_value=TOTAL_PORTFOLIO_VALUE):
+        records = self.security_records(all_category)
+        as_of_date = self.__as_of_date(all_category) if as_of_date is None \
+            else pd.Timestamp(as_of_date).strftime("%Y-%m-%d")
+        columns = ("run_id", "ticker", "category", "sub_category") + SnapshotStore.SECURITY_FIELDS
+
+        with closing(self.__connect()) as connection, connection:
+            run_id = connection.execute(
+                "INSERT INTO runs (as_of_date, created_at, workbook, dividend_type, risk_free_rate, "
+                "total_portfolio_value, leftover_cash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (as_of_date, pd.Timestamp.now(tz="UTC").isoformat(), workbook, dividend_type,
+                 self.__value(risk_free_rate), self.__value(total_portfolio_value),
+                 self.__value(getattr(all_category, "leftover_cash", None)))).lastrowid
+            connection.executemany(
+                f"INSERT INTO securities ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [(run_id, record["ticker"], record["category"], record["sub_category"])
+                 + tuple(self.__value(record[field]) for field in SnapshotStore.SECURITY_FIELDS)
+                 for record in records])
+
+            weights = []
+            for category in all_category.categories:
+                weights.append((run_id, category.name, "", self.__value(category.category_weight)))
+                weights.extend((run_id, category.name, subcategory.name, self.__value(subcategory.sub_category_weight))
+                               for subcategory in category.subcategories)
+            connection.executemany("INSERT INTO weights VALUES (?, ?, ?, ?)", weights)
+
+            if self.store_returns:
+                stored = set()
+                for category in all_category.categories:
+                    for subcategory in category.subcategories:
+                        for security in subcategory.securities:
+                            if security.ticker in stored:
+                                continue
+                            stored.add(security.ticker)
+                            returns = security.adjusted_returns_in_series(dividend_type=dividend_type)
+                            if returns is None:
+                                continue
+                            connection.executemany(
+                                "INSERT INTO returns VALUES (?, ?, ?, ?)",
+                                zip([run_id] * len(returns), [security.ticker] * len(returns),
+                                    returns.index.strftime("%Y-%m-%d"), returns.astype(float).tolist()))
+
+        logger.info("Saved snapshot %s (as of %s) with %s holdings to %s", run_id, as_of_date, len(records),
+                    self.path)
+        return run_id
+
+    def __query(self, sql, parameters=()):
+        with closing(self.__connect()) as connection:
+            return pd.read_sql_query(sql, connection, params=list(parameters))
+
+    def runs(self, workbook=None, start_date=None, end_date=None):
+        conditions, parameters = self.__conditions(workbook=workbook, start_date=start_date, end_date=end_date)
+        return self.__query(f"SELECT * FROM runs {conditions} ORDER BY as_of_date, run_id",
+                            parameters).set_index("run_id")
+
+    @staticmethod
+    def __conditions(workbook=None, start_date=None, end_date=None, prefix=""):
+        conditions, parameters = [], []
+        if workbook is not None:
+            conditions.append(f"{prefix}workbook = ?")
+            parameters.append(workbook)
+        if start_date is not None:
+            conditions.append(f"{prefix}as_of_date >= ?")
+            parameters.append(pd.Timestamp(start_date).strftime("%Y-%m-%d"))
+        if end_date is not None:
+            conditions.append(f"{prefix}as_of_date <= ?")
+            parameters.append(pd.Timestamp(end_date).strftime("%Y-%m-%d"))
+        return ("WHERE " + " AND ".join(conditions)) if conditions else "", parameters
+
+    def latest_run_id(self, workbook=None, as_of_date=None):
+        # The last run on or before as_of_date (the last run overall without one)
+        conditions, parameters = self.__conditions(workbook=workbook, end_date=as_of_date)
+        runs = self.__query(f"SELECT run_id FROM runs {conditions} ORDER BY as_of_date DESC, run_id DESC LIMIT 1",
+                            parameters)
+        if runs.empty:
+            raise KeyError(f"No snapshot for workbook {workbook} on or before {as_of_date}")
+        return int(runs.at[0, "run_id"])
+
+    @staticmethod
+    def __in(column, values):
+        return f"{column} IN ({', '.join('?' * len(values))})", list(values)
+
+    def securities(self, run_id=None, tickers=None, categories=None, workbook=None, as_of_date=None):
+        # One row per holding of a run (by default the latest one on or before as_of_date)
+        if run_id is None:
+            run_id = self.latest_run_id(workbook=workbook, as_of_date=as_of_date)
+        conditions, parameters = ["run_id = ?"], [run_id]
+        for column, values in (("ticker", tickers), ("category", categories)):
+            if values is not None:
+                condition, values = self.__in(column, values)
+                conditions.append(condition)
+                parameters.extend(values)
+        return self.__query(f"SELECT * FROM securities WHERE {' AND '.join(conditions)} ORDER BY rowid", parameters)
+
+    def history(self, ticker, fields=("portfolio_asset_weight",), workbook=None, start_date=None, end_date=None):
+        # A ticker's stored values across runs, indexed by as-of date and run
+        conditions, parameters = self.__conditions(workbook=workbook, start_date=start_date, end_date=end_date,
+                                                   prefix="runs.")
+        conditions = (conditions + " AND" if conditions else "WHERE") + " securities.ticker = ?"
+        columns = ", ".join(f"securities.{field}" for field in ("category", "sub_category") + tuple(fields))
+        return self.__query(f"SELECT runs.as_of_date, runs.run_id, {columns} FROM securities "
+                            f"JOIN runs ON runs.run_id = securities.run_id {conditions} "
+                            f"ORDER BY runs.as_of_date, runs.run_id", parameters + [ticker]) \
+            .set_index(["as_of_date", "run_id"])
+
+    def weights(self, run_id):
+        return self.__query("SELECT category, sub_category, weight FROM weights WHERE run_id = ?", [run_id])
+
+    def returns(self, run_id, tickers=None):
+        # (date x ticker) adjusted returns as stored by the run
+        conditions, parameters = "run_id = ?", [run_id]
+        if tickers is not None:
+            condition, values = self.__in("ticker", tickers)
+            conditions, parameters = f"{conditions} AND {condition}", parameters + values
+        returns = self.__query(f"SELECT ticker, date, value FROM returns WHERE {conditions}", parameters)
+        returns = returns.pivot(index="date", columns="ticker", values="value")
+        returns.index = pd.to_datetime(returns.index)
+        return returns
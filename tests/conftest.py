@@ -0,0 +1,76 @@
+import os
+import sys
+
+# The modules import each other through the src package, while the entry-point modules (main.py, all_category.py)
+# use the bare module paths of src
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.categories.sub_categories.securities.security import Security
+from src.categories.sub_categories.securities.security_store import SecurityStore
+from src.global_settings import HISTORY_PERIOD
+from src.market_data.market_data_archive import MarketDataArchive
+from src.market_data.market_data_source import MarketDataSource
+from src.optimizer_engines.optimization_result_cache import OptimizationResultCache
+
+# (ticker, sub-category, category, weight in the sub-category in %), as ExcelReader reads them
+ROWS = [
+    ("E1", "Traditional Equity", "Equity", 50), ("E2", "Traditional Equity", "Equity", 50),
+    ("E3", "Tech", "Equity", 100),
+    ("B1", "Traditional Bond", "Bond", 50), ("B2", "Traditional Bond", "Bond", 50),
+    ("B3", "HY", "Bond", 100),
+    ("A1", "Metal", "Alternative", 100),
+    ("A2", "RE", "Alternative", 50), ("A3", "RE", "Alternative", 50),
+]
+
+
+def record_archive(archive_path, tickers, days=1300, seed=0, end="2024-06-28"):
+    # Synthetic responses in the layout MarketDataSource records, so that whole runs replay offline
+    rng = np.random.default_rng(seed)
+    archive = MarketDataArchive(archive_path)
+    dates = pd.bdate_range(end=end, periods=days)
+    for ticker in tickers:
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.01, days)))
+        history = pd.DataFrame({"close": close},
+                               index=pd.MultiIndex.from_product([[ticker], dates.date], names=["symbol", "date"]))
+        archive.save("history", f"{ticker}_{HISTORY_PERIOD}", history)
+        archive.save("quote_type", ticker, {ticker: {"longName": f"{ticker} ETF"}})
+        archive.save("fund_profile", ticker, {ticker: {"categoryName": "Test",
+                                                       "feesExpensesInvestment": {"annualReportExpenseRatio": 0.001}}})
+        archive.save("price", ticker, {ticker: {"exchangeName": "NYSE", "currency": "USD"}})
+        archive.save("summary_detail", ticker, {ticker: {"dividendYield": 0.02}})
+        payment_dates = pd.bdate_range(dates[0], dates[-1], freq="Q")
+        dividends = pd.DataFrame({"dividends": np.full(len(payment_dates), 0.5)},
+                                 index=pd.MultiIndex.from_product([[ticker], payment_dates.date],
+                                                                  names=["symbol", "date"]))
+        archive.save("dividend_history", f"{ticker}_{dates[0]:%Y-%m-%d}", dividends)
+    return dates
+
+
+@pytest.fixture
+def replay_source(tmp_path, monkeypatch):
+    # Every run in the test replays the synthetic archive, with fresh in-memory stores and caches
+    record_archive(str(tmp_path / "archive"), [row[0] for row in ROWS])
+    source = MarketDataSource(MarketDataSource.REPLAY, str(tmp_path / "archive"))
+    monkeypatch.setattr(MarketDataSource, "_default", source)
+    monkeypatch.setattr(SecurityStore, "_default", SecurityStore())
+    monkeypatch.setattr(OptimizationResultCache, "_default", OptimizationResultCache(None))
+    monkeypatch.setattr(Security, "_risk_free_rate", None)
+    return source
+
+
+@pytest.fixture
+def build_portfolio(replay_source):
+    from all_category import AllCategory
+
+    def build(rows=ROWS):
+        all_category = AllCategory()
+        all_category.add_securities(rows)
+        return all_category
+    return build
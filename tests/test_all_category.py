@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ROWS
+from src.categories.sub_categories.securities.security_store import SecurityStore
+
+
+def test_remove_securities_recomputes_only_the_touched_category(build_portfolio):
+    all_category = build_portfolio()
+    all_category.update()
+    equity, bond = all_category.find_category("Equity"), all_category.find_category("Bond")
+    bond_weights = bond.cleaned_weights
+
+    all_category.remove_securities(["E2"])
+
+    assert all_category.is_dirty
+    assert equity.is_dirty and equity.find_subcategory("Traditional Equity").is_dirty
+    assert not bond.is_dirty
+    assert not equity.find_subcategory("Tech").is_dirty
+    weights = all_category.update()
+    assert bond.cleaned_weights is bond_weights
+
+    fresh = build_portfolio([row for row in ROWS if row[0] != "E2"])
+    assert weights == pytest.approx(fresh.update(), abs=1e-5)
+
+
+def test_remove_securities_drops_empty_nodes_and_releases_rows(build_portfolio):
+    all_category = build_portfolio()
+    all_category.update()
+    store = SecurityStore.get_default()
+
+    all_category.remove_securities(["E3", "A1"])
+
+    assert all_category.find_category("Equity").find_subcategory("Tech") is None
+    assert all_category.find_category("Alternative").find_subcategory("Metal") is None
+    assert "E3" not in store and "A1" not in store
+    assert "E1" in store
+    assert set(all_category.update()) == {"Equity", "Bond", "Alternative"}
+
+
+def test_moving_a_security_invalidates_both_sub_categories(build_portfolio):
+    all_category = build_portfolio()
+    all_category.update()
+
+    all_category.add_securities([("B3", "Traditional Bond", "Bond", 100)])
+
+    bond = all_category.find_category("Bond")
+    assert bond.find_subcategory("HY") is None
+    assert [security.ticker for security in bond.find_subcategory("Traditional Bond").securities] == \
+        ["B1", "B2", "B3"]
+    assert bond.is_dirty and not all_category.find_category("Equity").is_dirty
+
+
+def test_security_invalidation_propagates_to_its_ancestors_only(build_portfolio):
+    all_category = build_portfolio()
+    all_category.update()
+    _, subcategory, security = all_category.find_security("A2")
+
+    security.invalidate("close_prices")
+
+    assert subcategory.is_dirty and all_category.find_category("Alternative").is_dirty and all_category.is_dirty
+    assert not all_category.find_category("Equity").is_dirty
+    assert security.close_prices is not None
+
+
+def test_bulk_aggregation_matches_the_per_node_path(build_portfolio):
+    all_category = build_portfolio()
+    all_category.update()
+
+    for category in all_category.categories:
+        pd.testing.assert_frame_equal(category.aggregated_returns, category.calculate_aggregated_returns(),
+                                      atol=1e-12, rtol=0)
+        for subcategory in category.subcategories:
+            pd.testing.assert_frame_equal(subcategory.aggregated_returns, subcategory.calculate_aggregated_returns(),
+                                          atol=1e-12, rtol=0)
+    assert np.isfinite(all_category.category_df.to_numpy()).all()
+
+
+def test_final_shares_report_their_tracking_error(build_portfolio):
+    all_category = build_portfolio()
+    all_category.update()
+
+    all_category.assign_final_asset_weights()
+
+    securities = [security for category in all_category.categories for subcategory in category.subcategories
+                  for security in subcategory.securities]
+    spent = sum(security.number_of_shares * security.historical_data.iloc[-1] for security in securities)
+    total_portfolio_value = spent + all_category.leftover_cash
+    # The leftover cash alone is part of the tracking error
+    assert all_category.leftover_cash / total_portfolio_value <= all_category.tracking_error < 1
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.screening.correlation_screener import CorrelationScreen, CorrelationScreener
+
+
+@pytest.fixture
+def returns_df():
+    # A and B track the same index, C is unrelated
+    rng = np.random.default_rng(0)
+    base = rng.normal(0, 0.01, 500)
+    return pd.DataFrame({"A": base + rng.normal(0, 0.0005, 500), "B": base * 1.1 + rng.normal(0, 0.0005, 500),
+                         "C": rng.normal(0, 0.01, 500)})
+
+
+def test_near_duplicates_become_one_composite(returns_df):
+    screen = CorrelationScreener(threshold=0.98).screen_returns(returns_df)
+
+    assert screen.is_reduced
+    assert screen.composite_names == ["A+B", "C"]
+    # Blended by inverse variance, each composite's columns summing to 1
+    np.testing.assert_allclose(screen.member_to_composite.sum(axis=0), 1.0)
+    variances = returns_df.var(ddof=0)
+    assert screen.member_to_composite[0, 0] == pytest.approx((1 / variances["A"]) / (1 / variances[["A", "B"]]).sum())
+
+
+def test_expand_maps_composite_weights_back_to_members(returns_df):
+    screen = CorrelationScreener(threshold=0.98).screen_returns(returns_df)
+
+    weights = screen.expand({"A+B": 0.7, "C": 0.3})
+
+    assert list(weights) == ["A", "B", "C"]
+    assert sum(weights.values()) == pytest.approx(1.0)
+    assert weights["C"] == pytest.approx(0.3)
+    assert weights["A"] + weights["B"] == pytest.approx(0.7)
+    np.testing.assert_allclose(screen.expand(np.array([0.7, 0.3])), list(weights.values()))
+
+
+def test_composite_returns_and_covariance_are_linear_maps(returns_df):
+    screen = CorrelationScreener(threshold=0.98).screen_returns(returns_df)
+
+    composite_returns = screen.composite_returns(returns_df)
+    covariance = np.cov(returns_df.to_numpy(), rowvar=False, ddof=0)
+
+    np.testing.assert_allclose(np.cov(composite_returns.to_numpy(), rowvar=False, ddof=0),
+                               screen.composite_covariance(covariance), atol=1e-15)
+
+
+def test_constrained_assets_are_never_merged(returns_df):
+    screen = CorrelationScreener(threshold=0.98).screen_returns(returns_df, {"A_max": 0.2})
+
+    assert not screen.is_reduced
+    assert screen.composite_constraints({"A_max": 0.2}) == {"A_max": 0.2}
+
+
+def test_no_threshold_means_no_screening(returns_df):
+    screen = CorrelationScreener(threshold=None).screen_returns(returns_df)
+
+    assert not screen.is_reduced
+    assert screen.expand({"A": 0.2, "B": 0.3, "C": 0.5}) == pytest.approx({"A": 0.2, "B": 0.3, "C": 0.5})
+
+
+def test_composite_constraints_keep_only_the_surviving_names():
+    screen = CorrelationScreen(["A", "B", "C"], [[0, 1], [2]], np.ones(3))
+
+    assert screen.composite_constraints({"C_min": 0.1, "A_max": 0.5}) == {"C_min": 0.1}
+    assert screen.composite_constraints(None) is None
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pypfopt import risk_models
+
+from src.covariance.covariance_estimator import CovarianceEstimator
+from src.pypfopt_optimizer.mean_variance_optimizer import MeanVarianceOptimizer
+
+
+@pytest.fixture
+def returns_df():
+    rng = np.random.default_rng(0)
+    mixing = rng.normal(size=(6, 6))
+    return pd.DataFrame(rng.normal(0.0003, 0.01, (750, 6)) @ mixing / 3, columns=list("ABCDEF"),
+                        index=pd.bdate_range(end="2024-06-28", periods=750))
+
+
+@pytest.mark.parametrize("method", CovarianceEstimator.METHODS)
+@pytest.mark.parametrize("block_size", [None, 4])
+def test_estimators_match_pypfopt(returns_df, method, block_size):
+    covariance, correlation = CovarianceEstimator(method, block_size=block_size).estimate(returns_df)
+    expected = risk_models.risk_matrix(returns_df, returns_data=True, method=method)
+
+    np.testing.assert_allclose(covariance.to_numpy(), expected.to_numpy(), rtol=1e-10, atol=1e-13)
+    np.testing.assert_allclose(correlation.to_numpy(), risk_models.cov_to_corr(expected).to_numpy(), atol=1e-12)
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        CovarianceEstimator("semicovariance")
+
+
+@pytest.mark.parametrize("method", CovarianceEstimator.METHODS)
+def test_optimizer_uses_pypfopt_unless_native_is_requested(returns_df, method, monkeypatch):
+    mvo = MeanVarianceOptimizer()
+    native_covariance, _ = mvo.covariance_correlation_matrix_by_returns(returns_df, method=method, native=True)
+
+    monkeypatch.setattr(CovarianceEstimator, "estimate", lambda *args: pytest.fail("native estimator used"))
+    covariance, _ = mvo.covariance_correlation_matrix_by_returns(returns_df, method=method)
+
+    pd.testing.assert_frame_equal(covariance, risk_models.risk_matrix(returns_df, returns_data=True, method=method))
+    np.testing.assert_allclose(native_covariance.to_numpy(), covariance.to_numpy(), rtol=1e-10, atol=1e-13)
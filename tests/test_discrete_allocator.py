@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.discrete_allocation.discrete_allocator import DiscreteAllocator
+
+
+def portfolio(n_securities, seed):
+    rng = np.random.default_rng(seed)
+    tickers = [f"T{i}" for i in range(n_securities)]
+    weights = pd.Series(rng.dirichlet(np.ones(n_securities)), index=tickers)
+    prices = pd.Series(rng.uniform(5, 600, n_securities), index=tickers)
+    return weights, prices
+
+
+@pytest.mark.parametrize("use_integer_program", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_allocation_stays_within_the_budget(use_integer_program, seed):
+    weights, prices = portfolio(30, seed)
+    allocator = DiscreteAllocator(total_portfolio_value=10000, use_integer_program=use_integer_program)
+
+    shares, leftover_cash = allocator.allocate(weights, prices)
+
+    spent = float(shares @ prices)
+    assert shares.dtype == np.int64 and (shares >= 0).all()
+    assert spent <= 10000 + 1e-9
+    assert leftover_cash == pytest.approx(10000 - spent)
+    # Every holding is its floored share count or one more
+    extra = shares - np.floor(weights * 10000 / prices)
+    assert extra.isin([0, 1]).all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_greedy_leaves_no_affordable_missing_value(seed):
+    weights, prices = portfolio(30, seed)
+    shares, leftover_cash = DiscreteAllocator(10000, use_integer_program=False).allocate(weights, prices)
+
+    deficits = weights * 10000 - shares * prices
+    assert not ((deficits > 0) & (prices <= leftover_cash)).any()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_integer_program_covers_at_least_the_greedy_value(seed):
+    weights, prices = portfolio(30, seed)
+    greedy_shares, _ = DiscreteAllocator(10000, use_integer_program=False).allocate(weights, prices)
+    exact_shares, _ = DiscreteAllocator(10000, use_integer_program=True).allocate(weights, prices)
+
+    assert (DiscreteAllocator.tracking_error(weights, prices, exact_shares, 10000)
+            <= DiscreteAllocator.tracking_error(weights, prices, greedy_shares, 10000) + 1e-12)
+
+
+def test_weights_above_one_do_not_overspend():
+    weights = pd.Series({"A": 0.6, "B": 0.5})
+    prices = pd.Series({"A": 10.0, "B": 10.0})
+
+    shares, leftover_cash = DiscreteAllocator(1000, use_integer_program=False).allocate(weights, prices)
+
+    assert float(shares @ prices) <= 1000
+    assert leftover_cash >= 0
+
+
+def test_missing_prices_are_rejected():
+    with pytest.raises(ValueError):
+        DiscreteAllocator(1000).allocate(pd.Series({"A": 0.5, "B": 0.5}), pd.Series({"A": 10.0}))
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.hierarchical_allocator import HierarchicalAllocator
+
+HIERARCHY = {
+    "Equity": {"Traditional Equity": {"E1": 0.6, "E2": 0.4}, "Tech": {"E3": 1.0}},
+    "Bond": {"Traditional Bond": {"B1": 1.0}},
+}
+
+
+def synthetic_returns(days=750, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end="2024-06-28", periods=days)
+    returns = rng.normal([0.0006, 0.0004, 0.0008, 0.0002], [0.012, 0.010, 0.018, 0.004], size=(days, 4))
+    return returns, index
+
+
+def test_allocate_with_a_risk_free_rate_series():
+    returns, index = synthetic_returns()
+    rates = pd.Series(0.03, index=index)
+    allocation = HierarchicalAllocator(HIERARCHY, risk_free_rate=rates).allocate(returns, index=index)
+
+    assert allocation["security_weights"].sum() == pytest.approx(1.0)
+    assert (allocation["security_weights"] >= -1e-9).all()
+    metrics = allocation["portfolio_metrics"]
+    # Reported on the raw returns, against the window's average rate
+    assert metrics["Sharp Ratio"] == pytest.approx(
+        (metrics["Expected Annual Return"] - 0.03) / metrics["Annual Volatility"], rel=1e-6)
+
+
+def test_allocate_with_a_constant_series_matches_the_scalar_rate():
+    returns, index = synthetic_returns()
+    scalar = HierarchicalAllocator(HIERARCHY, risk_free_rate=0.03).allocate(returns, index=index)
+    series = HierarchicalAllocator(HIERARCHY, risk_free_rate=pd.Series(0.03, index=index)).allocate(returns,
+                                                                                                    index=index)
+
+    np.testing.assert_allclose(series["security_weights"], scalar["security_weights"], atol=0.02)
+    assert series["portfolio_metrics"]["Annual Volatility"] == pytest.approx(
+        scalar["portfolio_metrics"]["Annual Volatility"], rel=0.05)
+
+
+def test_allocate_skips_days_before_the_rate_series():
+    returns, index = synthetic_returns()
+    rates = pd.Series(0.03, index=index[250:])
+    allocation = HierarchicalAllocator(HIERARCHY, risk_free_rate=rates).allocate(returns, index=index)
+
+    assert np.isfinite(allocation["security_weights"]).all()
+    assert allocation["security_weights"].sum() == pytest.approx(1.0)
+
+
+def test_allocate_with_a_rate_series_needs_the_index():
+    returns, _ = synthetic_returns()
+    rates = pd.Series(0.03, index=pd.bdate_range(end="2024-06-28", periods=len(returns)))
+    with pytest.raises(ValueError):
+        HierarchicalAllocator(HIERARCHY, risk_free_rate=rates).allocate(returns)
+
+
+def test_constraints_of_removed_sub_categories_are_ignored():
+    returns, index = synthetic_returns()
+    constraints = {"Equity": {"Tech_max": 0.3, "Crypto_max": 0.1}}
+    allocator = HierarchicalAllocator(HIERARCHY, sub_category_constraints=constraints,
+                                      category_constraints={"Bond_min": 0.2, "Alternative_max": 0.1})
+
+    allocation = allocator.allocate(returns, index=index)
+
+    assert allocation["sub_category_weights"]["Equity"]["Tech"] <= 0.3 + 1e-6
+    assert allocation["category_weights"]["Bond"] >= 0.2 - 1e-6
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.hierarchy_matrices import HierarchyMatrices
+
+HIERARCHY = {
+    "Equity": {"Traditional Equity": {"E1": 0.6, "E2": 0.4}, "Tech": {"E3": 1.0}},
+    "Bond": {"Traditional Bond": {"B1": 0.5, "B2": 0.5}},
+}
+SUB_CATEGORY_WEIGHTS = {"Equity": {"Traditional Equity": 0.7, "Tech": 0.3}, "Bond": {"Traditional Bond": 1.0}}
+CATEGORY_WEIGHTS = {"Equity": 0.55, "Bond": 0.45}
+
+
+def returns_panel(tickers, days=300, seed=0, end="2024-06-28"):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.normal(0.0004, 0.01, (days, len(tickers))), columns=tickers,
+                        index=pd.bdate_range(end=end, periods=days))
+
+
+def test_aggregate_returns_matches_the_pandas_loop():
+    returns_df = returns_panel(["E1", "E2", "E3", "B1", "B2"])
+    aggregated = HierarchyMatrices(HIERARCHY, SUB_CATEGORY_WEIGHTS, CATEGORY_WEIGHTS).aggregate_returns(returns_df)
+
+    # The per-node weighted sums the tree used to build one Series at a time
+    sub_category_returns = pd.DataFrame({
+        sub_category_name: sum(returns_df[ticker] * weight for ticker, weight in securities.items())
+        for sub_categories in HIERARCHY.values() for sub_category_name, securities in sub_categories.items()})
+    category_returns = pd.DataFrame({
+        category_name: sum(sub_category_returns[name] * weight for name, weight in weights.items())
+        for category_name, weights in SUB_CATEGORY_WEIGHTS.items()})
+    portfolio_returns = sum(category_returns[name] * weight for name, weight in CATEGORY_WEIGHTS.items())
+
+    pd.testing.assert_frame_equal(aggregated["sub_category"], sub_category_returns, atol=1e-15, rtol=0)
+    pd.testing.assert_frame_equal(aggregated["category"], category_returns, atol=1e-15, rtol=0)
+    pd.testing.assert_series_equal(aggregated["portfolio"], portfolio_returns.rename("Portfolio"), atol=1e-15,
+                                   rtol=0)
+
+
+def test_aggregate_returns_ignores_missing_securities():
+    returns_df = returns_panel(["E1", "E3", "B1", "B2"])
+    aggregated = HierarchyMatrices(HIERARCHY).aggregate_returns(returns_df)
+
+    np.testing.assert_allclose(aggregated["sub_category"]["Traditional Equity"], returns_df["E1"] * 0.6)
+    assert "category" not in aggregated
+
+
+def test_aggregate_panels_keeps_each_node_on_its_own_dates():
+    equity = returns_panel(["E1", "E2"], days=200, seed=1)
+    bond = returns_panel(["B1", "B2"], days=150, seed=2, end="2024-05-31")
+    hierarchy = {"Equity": {"Traditional Equity": {"E1": 0.6, "E2": 0.4}},
+                 "Bond": {"Traditional Bond": {"B1": 0.5, "B2": 0.5}}}
+    matrices = HierarchyMatrices(hierarchy)
+
+    equity_returns, bond_returns = HierarchyMatrices.aggregate_panels([equity, bond],
+                                                                      matrices.security_to_sub_category)
+
+    pd.testing.assert_series_equal(equity_returns, equity["E1"] * 0.6 + equity["E2"] * 0.4, check_names=False,
+                                   atol=1e-15, rtol=0)
+    pd.testing.assert_series_equal(bond_returns, bond["B1"] * 0.5 + bond["B2"] * 0.5, check_names=False,
+                                   atol=1e-15, rtol=0)
+
+
+def test_final_weights_are_the_products_of_the_levels():
+    matrices = HierarchyMatrices(HIERARCHY, SUB_CATEGORY_WEIGHTS, CATEGORY_WEIGHTS)
+    final_weights = dict(zip(matrices.tickers, matrices.final_weights()))
+
+    assert final_weights["E1"] == pytest.approx(0.6 * 0.7 * 0.55)
+    assert final_weights["E3"] == pytest.approx(1.0 * 0.3 * 0.55)
+    assert sum(final_weights.values()) == pytest.approx(1.0)
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from conftest import ROWS, record_archive
+from src.market_data.market_data_archive import MarketDataArchive, MarketDataArchiveMissError
+from src.market_data.market_data_source import MarketDataSource
+
+
+def test_archive_round_trip(tmp_path):
+    dates = record_archive(str(tmp_path), ["E1"], days=50)
+    archive = MarketDataArchive(str(tmp_path))
+
+    history = archive.load("history", "E1_max")
+    assert list(history.index.get_level_values("date")) == list(dates.date)
+    assert archive.load("price", "E1") == {"E1": {"exchangeName": "NYSE", "currency": "USD"}}
+    assert archive.contains("quote_type", "E1")
+    assert not archive.contains("quote_type", "E2")
+
+
+def test_archive_hands_out_copies_of_frames(tmp_path):
+    record_archive(str(tmp_path), ["E1"], days=50)
+    archive = MarketDataArchive(str(tmp_path))
+
+    history = archive.load("history", "E1_max")
+    history["close"] = 0.0
+    history.index = range(len(history))
+    assert (archive.load("history", "E1_max")["close"] > 0).all()
+
+
+def test_replay_serves_the_archive_and_fails_on_a_miss(tmp_path):
+    record_archive(str(tmp_path), ["E1"], days=50)
+    source = MarketDataSource(MarketDataSource.REPLAY, str(tmp_path))
+
+    assert source.module("E1", "quote_type") == {"E1": {"longName": "E1 ETF"}}
+    assert isinstance(source.history("E1", period="max"), pd.DataFrame)
+    with pytest.raises(MarketDataArchiveMissError):
+        source.history("E2", period="max")
+
+
+def test_replayed_runs_are_reproducible(build_portfolio):
+    first = build_portfolio()
+    first_weights = first.update()
+    first.assign_final_asset_weights()
+
+    second = build_portfolio()
+    assert second.update() == first_weights
+    second.assign_final_asset_weights()
+
+    assert sum(first_weights.values()) == pytest.approx(1.0, abs=1e-4)
+    for ticker, *_ in ROWS:
+        assert (second.find_security(ticker)[2].portfolio_asset_weight
+                == first.find_security(ticker)[2].portfolio_asset_weight)
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.optimizer_engines.optimization_result_cache import OptimizationResultCache
+from src.optimizer_engines.optimizer_engine import OptimizerEngine
+from src.optimizer_engines.optimizer_engine_registry import get_optimizer_engine
+
+
+@pytest.fixture
+def returns_df(monkeypatch):
+    monkeypatch.setattr(OptimizationResultCache, "_default", OptimizationResultCache(None))
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(rng.normal([0.0006, 0.0004, 0.0005], [0.012, 0.006, 0.009], (750, 3)),
+                        columns=["Equity", "Bond", "Alternative"], index=pd.bdate_range(end="2024-06-28", periods=750))
+
+
+def test_applicable_constraints():
+    constraints = {"Equity_max": 0.6, "Crypto_max": 0.1, "Bond_min": 0.2}
+
+    assert OptimizerEngine.applicable_constraints(constraints, ["Equity", "Bond"]) == {"Equity_max": 0.6,
+                                                                                       "Bond_min": 0.2}
+    assert OptimizerEngine.applicable_constraints(None, ["Equity"]) is None
+
+
+@pytest.mark.parametrize("engine_name", ["mean_variance", "mean_semivariance", "hrp", "nco", "riskfolio_mean_risk",
+                                         "riskfolio_hrp"])
+def test_engines_skip_bounds_of_assets_not_in_the_panel(returns_df, engine_name):
+    cleaned_weights, _ = get_optimizer_engine(engine_name).optimize(
+        returns_df, constraints_dict={"Equity_max": 0.5, "Crypto_max": 0.1}, risk_free_rate=0.02)
+
+    assert set(cleaned_weights) == {"Equity", "Bond", "Alternative"}
+    assert sum(cleaned_weights.values()) == pytest.approx(1.0, abs=1e-3)
+    assert cleaned_weights["Equity"] <= 0.5 + 1e-4
@@ -0,0 +1,16 @@
+import os
+
+import matplotlib
+
+from src.reporting.report_renderer import ReportRenderer, plt
+
+
+def test_third_party_figures_are_saved_without_a_display(tmp_path):
+    assert matplotlib.get_backend().lower() == "agg"
+    figure, ax = plt.subplots()
+    ax.plot([1, 2, 3])
+
+    path = ReportRenderer(output_dir=str(tmp_path)).save_figure(figure, "table")
+
+    assert os.path.getsize(path) > 0
+    assert not plt.fignum_exists(figure.number)
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pypfopt import EfficientFrontier
+
+from src.covariance.covariance_estimator import CovarianceEstimator
+from src.optimizer_engines.resampled_frontier_engine import MaxSharpeProblem, ResampledFrontier
+
+
+def moments(seed=0, days=750, n_assets=5):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(np.linspace(0.0002, 0.0008, n_assets), np.linspace(0.006, 0.02, n_assets),
+                         (days, n_assets))
+    expected_returns = np.expm1(np.log1p(returns).sum(axis=0) * 252 / days)
+    covariance = CovarianceEstimator.oracle_approximating(CovarianceEstimator.empirical_covariance(returns),
+                                                          days) * 252
+    return returns, expected_returns, covariance
+
+
+def test_max_sharpe_problem_matches_pypfopt():
+    _, expected_returns, covariance = moments()
+    upper_bounds = {4: 0.3}
+
+    weights = MaxSharpeProblem(len(expected_returns), {}, upper_bounds).solve(expected_returns, covariance, 0.02)
+
+    ef = EfficientFrontier(pd.Series(expected_returns), pd.DataFrame(covariance))
+    ef.add_constraint(lambda w: w[4] <= 0.3)
+    expected = np.array(list(ef.max_sharpe(risk_free_rate=0.02).values()))
+    np.testing.assert_allclose(weights, expected, atol=1e-5)
+
+
+def test_resampling_does_not_depend_on_the_chunking(monkeypatch):
+    returns, _, _ = moments(seed=1, days=300, n_assets=4)
+    returns_df = pd.DataFrame(returns, columns=list("ABCD"))
+    frontier = ResampledFrontier(n_samples=32, seed=7, max_workers=1)
+
+    monkeypatch.setattr(ResampledFrontier, "MIN_SAMPLES_PER_TASK", 32)
+    one_chunk = frontier.resample(returns_df)
+    monkeypatch.setattr(ResampledFrontier, "MIN_SAMPLES_PER_TASK", 3)
+    many_chunks = frontier.resample(returns_df)  # Four chunks of eight samples
+
+    pd.testing.assert_series_equal(one_chunk["weights"], many_chunks["weights"], atol=1e-9, rtol=0)
+    assert one_chunk["weights"].sum() == pytest.approx(1.0)
+    assert (one_chunk["lower"] <= one_chunk["weights"] + 1e-12).all()
+    assert (one_chunk["weights"] <= one_chunk["upper"] + 1e-12).all()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+from src.categories.sub_categories.securities.security_store import SecurityStore
+
+
+def series(length, start="2020-01-01", seed=0, name=None):
+    rng = np.random.default_rng(seed)
+    return pd.Series(rng.normal(size=length), index=pd.bdate_range(start, periods=length), name=name)
+
+
+def test_rows_are_reference_counted():
+    store = SecurityStore(initial_rows=2)
+    row = store.add("VTI")
+    assert store.add("VTI") == row
+    store.set(row, "expense_ratio", 0.0003)
+
+    store.remove("VTI")
+    assert "VTI" in store and store.get(row, "expense_ratio") == 0.0003
+
+    store.remove("VTI")
+    assert "VTI" not in store and len(store) == 0
+    # A freed row is reused empty
+    assert store.add("BND") == row
+    assert store.get(row, "expense_ratio") is None
+
+
+def test_rows_grow_past_the_initial_capacity():
+    store = SecurityStore(initial_rows=1)
+    rows = [store.add(f"T{i}") for i in range(10)]
+
+    assert len(set(rows)) == 10
+    for i, row in enumerate(rows):
+        store.set(row, "name", f"T{i}")
+    assert [store.get(row, "name") for row in rows] == [f"T{i}" for i in range(10)]
+
+
+def test_series_survive_replacement_growth_and_compaction():
+    store = SecurityStore(initial_rows=4, initial_series_capacity=100)
+    rows = {ticker: store.add(ticker) for ticker in ("A", "B", "C")}
+    expected = {ticker: series(80, seed=seed, name=ticker) for seed, ticker in enumerate(rows)}
+    for ticker, row in rows.items():
+        store.set(row, "close_prices", expected[ticker])
+    # Replacing and removing leave gaps in the buffer
+    expected["A"] = series(120, seed=10, name="A")
+    store.set(rows["A"], "close_prices", expected["A"])
+    store.remove("C")
+    before = store.nbytes()
+
+    store.compact()
+
+    assert store.nbytes() <= before
+    for ticker in ("A", "B"):
+        pd.testing.assert_series_equal(store.get(rows[ticker], "close_prices"), expected[ticker], check_freq=False)
+
+
+def test_rows_share_one_calendar():
+    store = SecurityStore()
+    first, second = store.add("A"), store.add("B")
+    store.set(first, "close_prices", series(50, seed=1))
+    store.set(second, "close_prices", series(50, seed=2))
+
+    assert store.get(first, "close_prices").index is store.get(second, "close_prices").index
+
+
+def test_missing_and_unset_fields():
+    store = SecurityStore()
+    row = store.add("VTI")
+    assert not store.is_missing(row, "dividend_yield")
+
+    store.set(row, "dividend_yield", None)
+    assert store.is_missing(row, "dividend_yield")
+    assert not store.is_missing(row, "dividend_yield", ttl=0)
+
+    store.unset(row, "dividend_yield")
+    assert not store.is_missing(row, "dividend_yield")
+    assert store.get(row, "dividend_yield") is None
+
+
+def test_scalar_frame():
+    store = SecurityStore()
+    for value, ticker in enumerate(("A", "B")):
+        store.set(store.add(ticker), "sharpe_ratio", float(value))
+
+    frame = store.scalar_frame(("sharpe_ratio",))
+
+    assert frame.to_dict() == {"sharpe_ratio": {"A": 0.0, "B": 1.0}}
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.hierarchy_matrices import HierarchyMatrices
+from src.scenario.stress_tester import StressTester
+
+HIERARCHY = {
+    "Equity": {"Traditional Equity": {"E1": 0.6, "E2": 0.4}, "Tech": {"E3": 1.0}},
+    "Bond": {"Traditional Bond": {"B1": 1.0}},
+}
+SUB_CATEGORY_WEIGHTS = {"Equity": {"Traditional Equity": 0.7, "Tech": 0.3}, "Bond": {"Traditional Bond": 1.0}}
+CATEGORY_WEIGHTS = {"Equity": 0.6, "Bond": 0.4}
+E3_LISTING_ROW = 100
+
+
+@pytest.fixture
+def stress_tester():
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range(end="2024-06-28", periods=400)
+    returns_df = pd.DataFrame(rng.normal(0.0003, 0.012, (len(index), 4)), index=index,
+                              columns=["E1", "E2", "E3", "B1"])
+    # E3 has no history before this row: the windows starting earlier are not covered
+    returns_df.iloc[:E3_LISTING_ROW, 2] = np.nan
+    matrices = HierarchyMatrices(HIERARCHY, SUB_CATEGORY_WEIGHTS, CATEGORY_WEIGHTS)
+    return StressTester(returns_df, matrices, total_portfolio_value=10000), returns_df, matrices
+
+
+def window_loop(returns):
+    # The growth path of one window, from its start value of 1
+    path = np.concatenate([[1.0], np.cumprod(1 + returns)])
+    return path[-1] - 1, (path / np.maximum.accumulate(path)).min() - 1
+
+
+def test_historical_windows_match_a_per_window_loop(stress_tester):
+    tester, returns_df, matrices = stress_tester
+    windows = StressTester.rolling_windows(returns_df.index, length=21, step=7)
+
+    report = tester.historical(windows)
+
+    portfolio_returns = returns_df.fillna(0.0)[matrices.tickers].to_numpy() @ matrices.final_weights()
+    for position, (name, (start, end)) in enumerate(windows.items()):
+        start_row, end_row = returns_df.index.get_loc(start), returns_df.index.get_loc(end) + 1
+        if start_row < E3_LISTING_ROW:
+            assert np.isnan(report.loc[name, ("Return", "Portfolio")])
+            assert report.loc[name, ("Scenario", "Coverage")] < 1
+            continue
+        expected_return, expected_drawdown = window_loop(portfolio_returns[start_row:end_row])
+        assert report.loc[name, ("Return", "Portfolio")] == pytest.approx(expected_return, abs=1e-12)
+        assert report.loc[name, ("Max Drawdown", "Portfolio")] == pytest.approx(expected_drawdown, abs=1e-12)
+        assert report.loc[name, ("Loss", "Portfolio")] == pytest.approx(-expected_return * 10000, abs=1e-8)
+        assert report.loc[name, ("Scenario", "Coverage")] == 1
+
+
+def test_category_levels_match_a_per_window_loop(stress_tester):
+    tester, returns_df, _ = stress_tester
+    start, end = returns_df.index[150], returns_df.index[220]
+
+    report = tester.historical({"Window": (start, end)})
+
+    bond_return, bond_drawdown = window_loop(returns_df["B1"].to_numpy()[150:221])
+    assert report.loc["Window", ("Return", "Bond")] == pytest.approx(bond_return, abs=1e-12)
+    assert report.loc["Window", ("Max Drawdown", "Bond")] == pytest.approx(bond_drawdown, abs=1e-12)
+
+
+def test_windows_outside_the_history_are_dropped(stress_tester):
+    tester, _, _ = stress_tester
+
+    report = tester.historical({"Before": ("2000-01-03", "2000-03-01")})
+
+    assert report.empty
+
+
+def test_category_shocks(stress_tester):
+    tester, _, _ = stress_tester
+
+    report = tester.shocks({"Equity crash": {"Equity": -0.3}})
+
+    assert report.loc["Equity crash", ("Return", "Portfolio")] == pytest.approx(-0.3 * 0.6)
+    assert report.loc["Equity crash", ("Return", "Bond")] == 0
+    with pytest.raises(KeyError):
+        tester.shocks({"Unknown": {"Crypto": -0.5}})